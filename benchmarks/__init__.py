@@ -0,0 +1,23 @@
+"""
+Benchmarks
+~~~~~~~~~~
+
+Micro-benchmarks of the request dispatch hot path.
+
+Run the suite from the root of the repository::
+
+    $ python -m benchmarks --output results.json
+
+Results (operations per second and memory allocated per operation) are
+written as JSON, a later run can be compared against stored results::
+
+    $ python -m benchmarks --compare results.json
+
+Use ``--filter`` to run a subset of benchmarks and ``--list`` to list the
+available benchmarks.
+
+An end-to-end load generator is provided by :py:mod:`benchmarks.loadtest`::
+
+    $ python -m benchmarks.loadtest --resources 10 --requests 20000 --workers 4
+
+"""
@@ -0,0 +1,44 @@
+"""
+Benchmarks of data structures used while dispatching requests.
+"""
+from odinweb.data_structures import MultiValueDict, UrlPath
+
+from .runner import benchmark
+
+PATH = '/api/v1/user/{user_id:Integer}/group/{group_id:String}/members'
+
+
+@benchmark('url_path.parse')
+def url_path_parse():
+    return lambda: UrlPath.parse(PATH)
+
+
+@benchmark('url_path.format')
+def url_path_format():
+    path = UrlPath.parse(PATH)
+    return path.format
+
+
+@benchmark('url_path.join')
+def url_path_join():
+    base = UrlPath.parse('/api/v1')
+    path = UrlPath.parse('user/{user_id:Integer}')
+    return lambda: base + path
+
+
+@benchmark('multi_value_dict.build')
+def multi_value_dict_build():
+    query = {'offset': ['0'], 'limit': ['50'], 'tag': ['a', 'b', 'c'], 'bare': ['yes']}
+    return lambda: MultiValueDict(query)
+
+
+@benchmark('multi_value_dict.get')
+def multi_value_dict_get():
+    query = MultiValueDict({'offset': ['0'], 'limit': ['50'], 'tag': ['a', 'b', 'c']})
+
+    def run():
+        query.get('offset')
+        query.get('limit')
+        query.getlist('tag')
+        query.get('bare')
+    return run
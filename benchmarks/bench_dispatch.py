@@ -0,0 +1,69 @@
+"""
+Benchmarks of dispatching requests to operations.
+"""
+from odinweb import api
+from odinweb.constants import Method
+from odinweb.containers import ApiInterfaceBase
+from odinweb.decorators import Operation
+from odinweb.testing import MockRequest
+
+from .resources import User, make_users
+from .runner import benchmark
+
+
+def noop(request, **path_args):
+    return None
+
+
+@benchmark('dispatch.noop')
+def dispatch_noop():
+    target = ApiInterfaceBase(Operation(noop, 'noop'))
+    operation, path_args = target.router.resolve(Method.GET, '/api/noop')
+    request = MockRequest(path='/api/noop')
+
+    def run():
+        response = target.dispatch(operation, request, **path_args)
+        assert response.status == 204
+    return run
+
+
+@benchmark('dispatch.noop_resolve')
+def dispatch_noop_resolve():
+    target = ApiInterfaceBase(Operation(noop, 'noop/{item_id:Integer}'))
+    request = MockRequest(path='/api/noop/42')
+
+    def run():
+        operation, path_args = target.router.resolve(Method.GET, '/api/noop/42')
+        target.dispatch(operation, request, **path_args)
+    return run
+
+
+@benchmark('dispatch.mock_request')
+def dispatch_mock_request():
+    target = ApiInterfaceBase(Operation(noop, 'noop'))
+    operation, path_args = target.router.resolve(Method.GET, '/api/noop')
+
+    def run():
+        target.dispatch(operation, MockRequest(path='/api/noop', headers={'Accept': 'application/json'}), **path_args)
+    return run
+
+
+@benchmark('dispatch.wrapped_listing', params=(10, 1000, 10000))
+def dispatch_wrapped_listing(count):
+    users = make_users(count)
+
+    class UserApi(api.ResourceApi):
+        resource = User
+
+        @api.listing(default_limit=count)
+        def list_users(self, request, offset, limit):
+            return users[offset:offset + limit], len(users)
+
+    target = ApiInterfaceBase(UserApi())
+    operation, path_args = target.router.resolve(Method.GET, '/api/user')
+    request = MockRequest(path='/api/user')
+
+    def run():
+        response = target.dispatch(operation, request, **path_args)
+        assert response.status == 200
+    return run
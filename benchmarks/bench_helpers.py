@@ -0,0 +1,34 @@
+"""
+Benchmarks of helpers used by operations.
+"""
+from odin.codecs import json_codec
+
+from odinweb.constants import Method
+from odinweb.helpers import create_response, get_resource
+from odinweb.testing import MockRequest
+
+from .resources import User, make_users
+from .runner import benchmark
+
+
+@benchmark('helpers.get_resource', params=(1, 1000, 10000))
+def helpers_get_resource(count):
+    users = make_users(count)
+    body = json_codec.dumps(users if count > 1 else users[0])
+    request = MockRequest(method=Method.POST, body=body, request_codec=json_codec,
+                          headers={'Content-Type': 'application/json'})
+
+    def run():
+        get_resource(request, User, allow_multiple=count > 1)
+    return run
+
+
+@benchmark('helpers.create_response', params=(1, 1000))
+def helpers_create_response(count):
+    users = make_users(count)
+    data = users if count > 1 else users[0]
+    request = MockRequest(response_codec=json_codec)
+
+    def run():
+        create_response(request, data)
+    return run
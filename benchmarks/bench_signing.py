@@ -0,0 +1,23 @@
+"""
+Benchmarks of URL signing.
+"""
+from odinweb.signing import sign_url_path, verify_url
+
+from .runner import benchmark
+
+SECRET_KEY = b'benchmark-secret-key'
+URL = '/api/v1/user/42/export?format=csv&fields=id&fields=name&fields=email'
+
+
+@benchmark('signing.sign_url_path')
+def signing_sign_url_path():
+    return lambda: sign_url_path(URL, SECRET_KEY, expire_in=3600)
+
+
+@benchmark('signing.verify_url')
+def signing_verify_url():
+    signed_url = sign_url_path(URL, SECRET_KEY, expire_in=3600)
+
+    def run():
+        assert verify_url(signed_url, SECRET_KEY)
+    return run
@@ -0,0 +1,106 @@
+"""
+Benchmarks of generating Swagger specs.
+"""
+import odin
+
+from odinweb import api
+from odinweb.containers import ApiInterfaceBase
+from odinweb.swagger import SwaggerSpec
+from odinweb.testing import MockRequest
+
+from .runner import benchmark
+
+RESOURCE_COUNT = 100
+"""
+Number of resources in the synthetic API; 5 operations are defined for each
+resource (500 operations).
+"""
+
+
+def _make_resource(idx):
+    class Meta:
+        namespace = 'benchmarks.swagger'
+        name = 'Item{}'.format(idx)
+
+    return type(odin.Resource)('Item{}'.format(idx), (odin.Resource, ), {
+        '__module__': __name__,
+        'Meta': Meta,
+        'id': odin.IntegerField(),
+        'name': odin.StringField(),
+        'description': odin.StringField(null=True),
+        'tags': odin.TypedListField(odin.StringField(), null=True),
+        'created': odin.DateTimeField(null=True),
+    })
+
+
+def _make_resource_api(idx):
+    resource = _make_resource(idx)
+
+    def list_items(self, request, offset, limit):
+        return []
+
+    def create_item(self, request, item):
+        return item
+
+    def get_item(self, request, resource_id):
+        return None
+
+    def update_item(self, request, resource_id, item):
+        return item
+
+    def delete_item(self, request, resource_id):
+        return None
+
+    return type(api.ResourceApi)('Item{}Api'.format(idx), (api.ResourceApi, ), {
+        '__module__': __name__,
+        'resource': resource,
+        'api_name': 'item{}'.format(idx),
+        'list_items': api.listing(list_items),
+        'create_item': api.create(create_item),
+        'get_item': api.detail(get_item),
+        'update_item': api.update(update_item),
+        'delete_item': api.delete(delete_item),
+    })()
+
+
+_resource_apis = []
+
+
+def synthetic_spec():
+    # type: () -> SwaggerSpec
+    """
+    Swagger spec of a synthetic API with 500 operations.
+    """
+    # Resources are only defined once (they are registered by Odin)
+    if not _resource_apis:
+        _resource_apis.extend(_make_resource_api(idx) for idx in range(RESOURCE_COUNT))
+
+    spec = SwaggerSpec("Benchmark API")
+    ApiInterfaceBase(api.ApiVersion(spec, *_resource_apis))
+    return spec
+
+
+@benchmark('swagger.get_swagger')
+def swagger_get_swagger():
+    spec = synthetic_spec()
+    request = MockRequest()
+
+    def run():
+        # Flag the API as changed so the entire spec is generated
+        spec.cenancestor.changed()
+        spec.get_swagger(request)
+    return run
+
+
+@benchmark('swagger.get_swagger_cached')
+def swagger_get_swagger_cached():
+    spec = synthetic_spec()
+    request = MockRequest()
+    return lambda: spec.get_swagger(request)
+
+
+@benchmark('swagger.spec_response_cached')
+def swagger_spec_response_cached():
+    spec = synthetic_spec()
+    request = MockRequest()
+    return lambda: spec.spec_response(request)
@@ -0,0 +1,535 @@
+"""
+Load Test
+~~~~~~~~~
+
+End-to-end load generator that drives an in-process API interface with
+synthetic traffic; no server or network is required.
+
+An API is built from a declarative spec of resources, each resource is served
+by a :py:class:`odinweb.containers.ResourceApi` (backed by an in-memory store)
+with list, detail, create and patch operations. A weighted mix of requests is
+generated from the spec and replayed through ``dispatch`` by a pool of
+threads or processes; latency percentiles and throughput are reported for
+each operation::
+
+    $ python -m benchmarks.loadtest --resources 10 --requests 20000 --workers 4
+
+The spec can also be supplied as a JSON file::
+
+    {
+        "resources": [
+            {"name": "user", "fields": 8, "records": 500},
+            {"name": "order", "fields": 20, "records": 5000}
+        ],
+        "mix": {"list": 50, "detail": 35, "create": 10, "patch": 5},
+        "page_size": 20
+    }
+
+Threads share a single API interface (as threads of a WSGI server do), with
+processes each worker builds its own interface. Thread workers are limited by
+the GIL, compare results of both executors to size workers.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+import threading
+from multiprocessing.pool import ThreadPool
+
+import odin
+from odin.codecs import json_codec
+from odin.utils import getmeta
+
+from odinweb import api
+from odinweb._compat import perf_counter
+from odinweb.constants import Method
+from odinweb.containers import ApiInterfaceBase
+from odinweb.testing import MockRequest
+
+# Imports for typing support
+from typing import Any, Dict, List, Optional, Sequence, Tuple  # noqa
+
+OPERATIONS = ('list', 'detail', 'create', 'patch')
+
+DEFAULT_MIX = {'list': 40, 'detail': 40, 'create': 10, 'patch': 10}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class ResourceSpec(object):
+    """
+    Spec of a synthetic resource.
+
+    :param name: Name of the resource (used as the API name).
+    :param fields: Number of (string) fields in addition to the ID.
+    :param records: Number of records the store is populated with.
+
+    """
+    __slots__ = ('name', 'fields', 'records')
+
+    def __init__(self, name, fields=5, records=100):
+        # type: (str, int, int) -> None
+        self.name = name
+        self.fields = fields
+        self.records = records
+
+    def __repr__(self):
+        return 'ResourceSpec({!r}, {!r}, {!r})'.format(self.name, self.fields, self.records)
+
+    def to_dict(self):
+        # type: () -> Dict[str, Any]
+        return {'name': self.name, 'fields': self.fields, 'records': self.records}
+
+
+class LoadSpec(object):
+    """
+    Declarative spec of an API and the traffic it receives.
+
+    :param resources: Resources served by the API.
+    :param mix: Relative weights of each type of operation.
+    :param page_size: Number of results requested by list operations.
+
+    """
+    __slots__ = ('resources', 'mix', 'page_size')
+
+    def __init__(self, resources, mix=None, page_size=20):
+        # type: (Sequence[ResourceSpec], Dict[str, int], int) -> None
+        mix = DEFAULT_MIX if mix is None else mix
+        unknown = set(mix) - set(OPERATIONS)
+        if unknown:
+            raise ValueError("Unknown operations in mix: {}".format(', '.join(sorted(unknown))))
+        if not resources:
+            raise ValueError("At least one resource is required.")
+
+        self.resources = list(resources)
+        self.mix = dict(mix)
+        self.page_size = page_size
+
+    @classmethod
+    def generate(cls, count, fields=5, records=100, **kwargs):
+        # type: (int, int, int, **Any) -> LoadSpec
+        """
+        Spec of `count` resources of the same shape.
+        """
+        return cls([ResourceSpec('resource{}'.format(idx), fields, records) for idx in range(count)], **kwargs)
+
+    @classmethod
+    def from_dict(cls, data):
+        # type: (Dict[str, Any]) -> LoadSpec
+        """
+        Spec from a dict (eg loaded from JSON); ``resources`` is either a list
+        of resource specs or the number of resources to generate.
+        """
+        data = dict(data)
+        resources = data.pop('resources')
+        if isinstance(resources, int):
+            return cls.generate(resources, **data)
+        return cls([ResourceSpec(**r) for r in resources], **data)
+
+    def to_dict(self):
+        # type: () -> Dict[str, Any]
+        return {
+            'resources': [r.to_dict() for r in self.resources],
+            'mix': self.mix,
+            'page_size': self.page_size,
+        }
+
+
+_resource_cache = {}  # type: Dict[Tuple[str, int], type]
+_resource_lock = threading.Lock()
+
+
+def make_resource(name, fields):
+    # type: (str, int) -> type
+    """
+    Define a resource with an integer ID and `fields` string fields.
+
+    Resources are registered with Odin, so definitions are cached and reused.
+    """
+    key = (name, fields)
+    with _resource_lock:
+        resource = _resource_cache.get(key)
+        if resource is None:
+            class_name = '{}{}'.format(name.title().replace('_', ''), fields)
+
+            class Meta:
+                namespace = 'benchmarks.loadtest'
+                name = class_name
+
+            attrs = {'__module__': __name__, 'Meta': Meta, 'id': odin.IntegerField(null=True)}
+            for idx in range(fields):
+                attrs['field{}'.format(idx)] = odin.StringField(null=True)
+            resource = _resource_cache[key] = type(odin.Resource)(class_name, (odin.Resource, ), attrs)
+    return resource
+
+
+def make_record(resource, record_id, fields):
+    # type: (type, Optional[int], int) -> odin.Resource
+    return resource(record_id, *('value {} of {}'.format(idx, record_id) for idx in range(fields)))
+
+
+class MemoryStoreApi(api.ResourceApi):
+    """
+    Resource API backed by an in-memory store of records.
+    """
+    def __init__(self, resource_spec):
+        # type: (ResourceSpec) -> None
+        self.api_name = resource_spec.name
+        self.resource = make_resource(resource_spec.name, resource_spec.fields)
+        super(MemoryStoreApi, self).__init__()
+
+        self._lock = threading.Lock()
+        self._records = dict(
+            (idx, make_record(self.resource, idx, resource_spec.fields))
+            for idx in range(1, resource_spec.records + 1)
+        )
+        self._next_id = resource_spec.records + 1
+
+        # Operations are bound to the instance to provide access to the store
+        operations = [
+            api.listing(MemoryStoreApi.list_records, resource=self.resource),
+            api.detail(MemoryStoreApi.get_record, resource=self.resource),
+            api.create(MemoryStoreApi.create_record, resource=self.resource),
+            api.patch(MemoryStoreApi.patch_record, resource=self.resource),
+        ]
+        for operation in operations:
+            operation.bind_to_instance(self)
+        self._operations = operations
+
+    def list_records(self, request, offset, limit):
+        with self._lock:
+            records = [self._records[key] for key in sorted(self._records)[offset:offset + limit]]
+            return records, len(self._records)
+
+    def get_record(self, request, resource_id):
+        record = self._records.get(resource_id)
+        if record is None:
+            raise api.HttpError(api.HTTPStatus.NOT_FOUND, 40, "Record not found.")
+        return record
+
+    def create_record(self, request, item):
+        with self._lock:
+            item.id = self._next_id
+            self._next_id += 1
+            self._records[item.id] = item
+        return item
+
+    def patch_record(self, request, item, resource_id):
+        with self._lock:
+            record = self.get_record(request, resource_id)
+            for field in getmeta(item).fields:
+                value = field.value_from_object(item)
+                # Skip fields not supplied by the client (None or the not supplied marker)
+                if value is not None and not isinstance(value, type):
+                    field.value_to_object(record, value)
+        return record
+
+
+def build_interface(spec, **options):
+    # type: (LoadSpec, **Any) -> ApiInterfaceBase
+    """
+    Build an API interface from a spec, resources are served at
+    ``/api/v1/<name>``.
+
+    :param options: Options (eg middleware) passed to the API interface.
+
+    """
+    return ApiInterfaceBase(
+        api.ApiVersion(*(MemoryStoreApi(resource_spec) for resource_spec in spec.resources)),
+        **options
+    )
+
+
+class RequestPlan(object):
+    """
+    A request to replay.
+
+    :param label: Label results are reported under (``<resource>.<operation>``).
+    :param method: HTTP method.
+    :param path: Path of the request.
+    :param query: Query string arguments.
+    :param body: Body of the request.
+
+    """
+    __slots__ = ('label', 'method', 'path', 'query', 'body')
+
+    def __init__(self, label, method, path, query=None, body=''):
+        # type: (str, Method, str, Dict[str, List[str]], str) -> None
+        self.label = label
+        self.method = method
+        self.path = path
+        self.query = query
+        self.body = body
+
+    def __repr__(self):
+        return '<RequestPlan {} {} {}>'.format(self.label, self.method.value, self.path)
+
+    def __getstate__(self):
+        return self.label, self.method, self.path, self.query, self.body
+
+    def __setstate__(self, state):
+        self.label, self.method, self.path, self.query, self.body = state
+
+    def build_request(self):
+        # type: () -> MockRequest
+        return MockRequest(path=self.path, query=self.query, method=self.method, body=self.body,
+                           headers={'Content-Type': 'application/json', 'Accept': 'application/json'})
+
+
+def generate_requests(spec, count, seed=None):
+    # type: (LoadSpec, int, int) -> List[RequestPlan]
+    """
+    Generate a reproducible mix of requests.
+
+    Detail and patch requests target records the store is populated with,
+    list requests page through the records.
+
+    :param spec: Spec of the API and traffic.
+    :param count: Number of requests to generate.
+    :param seed: Seed of the random number generator.
+
+    """
+    rnd = random.Random(seed)
+    kinds, weights = zip(*sorted((k, w) for k, w in spec.mix.items() if w > 0))
+    cumulative = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+
+    plans = []
+    for _ in range(count):
+        resource_spec = rnd.choice(spec.resources)
+        point = rnd.random() * total
+        kind = next(k for k, c in zip(kinds, cumulative) if point < c)
+
+        label = '{}.{}'.format(resource_spec.name, kind)
+        path = '/api/v1/{}'.format(resource_spec.name)
+        record_id = rnd.randint(1, max(resource_spec.records, 1))
+
+        if kind == 'list':
+            pages = max(resource_spec.records // spec.page_size, 1)
+            query = {'offset': [str(rnd.randrange(pages) * spec.page_size)], 'limit': [str(spec.page_size)]}
+            plans.append(RequestPlan(label, Method.GET, path, query))
+
+        elif kind == 'detail':
+            plans.append(RequestPlan(label, Method.GET, '{}/{}'.format(path, record_id)))
+
+        elif kind == 'create':
+            resource = make_resource(resource_spec.name, resource_spec.fields)
+            body = json_codec.dumps(make_record(resource, None, resource_spec.fields))
+            plans.append(RequestPlan(label, Method.POST, path, body=body))
+
+        else:
+            resource = make_resource(resource_spec.name, resource_spec.fields)
+            body = json.dumps({'$': getmeta(resource).resource_name, 'field0': 'patched {}'.format(rnd.random())})
+            plans.append(RequestPlan(label, Method.PATCH, '{}/{}'.format(path, record_id), body=body))
+
+    return plans
+
+
+def replay(interface, plans):
+    # type: (ApiInterfaceBase, Sequence[RequestPlan]) -> List[Tuple[str, int, float]]
+    """
+    Replay requests through an API interface.
+
+    Routing and dispatch (including encoding of the response) are timed,
+    building of the request is not.
+
+    :returns: Label, response status and latency (in seconds) of each request.
+
+    """
+    resolve = interface.router.resolve
+    dispatch = interface.dispatch
+    results = []
+    for plan in plans:
+        request = plan.build_request()
+        start = perf_counter()
+        try:
+            operation, path_args = resolve(plan.method, plan.path)
+            status = dispatch(operation, request, **path_args).status
+        except api.ImmediateHttpResponse as e:
+            status = e.status.value
+        results.append((plan.label, status, perf_counter() - start))
+    return results
+
+
+_process_interface = None  # type: Optional[ApiInterfaceBase]
+
+
+def _init_process(spec_data):
+    global _process_interface
+    _process_interface = build_interface(LoadSpec.from_dict(spec_data))
+
+
+def _replay_process(plans):
+    return replay(_process_interface, plans)
+
+
+def percentile(sorted_values, pct):
+    # type: (Sequence[float], float) -> float
+    """
+    Percentile (using the nearest rank) of sorted values.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = int(math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def summarise(results, duration):
+    # type: (Sequence[Tuple[str, int, float]], float) -> Dict[str, Dict[str, Any]]
+    """
+    Summarise results by label; an ``all`` entry summarises every request.
+
+    :param results: Label, status and latency of each request.
+    :param duration: Wall clock time taken to replay the requests.
+
+    """
+    grouped = {}  # type: Dict[str, List[Tuple[int, float]]]
+    for label, status, latency in results:
+        grouped.setdefault(label, []).append((status, latency))
+    grouped['all'] = [(status, latency) for _, status, latency in results]
+
+    summary = {}
+    for label, items in grouped.items():
+        latencies = sorted(latency for _, latency in items)
+        statuses = {}
+        for status, _ in items:
+            statuses[status] = statuses.get(status, 0) + 1
+
+        entry = summary[label] = {
+            'requests': len(items),
+            'errors': sum(count for status, count in statuses.items() if status >= 400),
+            'statuses': statuses,
+            'throughput': len(items) / duration if duration else None,
+            'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+            'max': latencies[-1] if latencies else 0.0,
+        }
+        for pct in PERCENTILES:
+            entry['p{}'.format(pct)] = percentile(latencies, pct)
+    return summary
+
+
+def run(spec, requests=10000, workers=4, executor='thread', seed=None, warmup=100, chunk_size=100,
+        interface=None):
+    # type: (LoadSpec, int, int, str, int, int, int, ApiInterfaceBase) -> Dict[str, Any]
+    """
+    Run a load test.
+
+    :param spec: Spec of the API and traffic.
+    :param requests: Number of requests to replay.
+    :param workers: Number of worker threads/processes.
+    :param executor: Either ``thread`` or ``process``.
+    :param seed: Seed used to generate requests (for reproducible runs).
+    :param warmup: Number of requests replayed (by each worker) before
+        measuring, to populate caches.
+    :param chunk_size: Number of requests handed to a worker at a time.
+    :param interface: API interface to replay requests through (thread
+        executor only); built from the spec if not supplied.
+    :returns: Summary of the results.
+
+    """
+    if executor not in ('thread', 'process'):
+        raise ValueError("Unknown executor: {}".format(executor))
+    if interface is not None and executor != 'thread':
+        raise ValueError("An interface can only be supplied to the thread executor.")
+
+    plans = generate_requests(spec, requests, seed)
+    chunks = [plans[idx:idx + chunk_size] for idx in range(0, len(plans), chunk_size)]
+    warmup_plans = generate_requests(spec, warmup, seed)
+
+    if executor == 'thread':
+        interface = build_interface(spec) if interface is None else interface
+        pool = ThreadPool(workers)
+        task = lambda chunk: replay(interface, chunk)  # noqa
+    else:
+        pool = multiprocessing.Pool(workers, _init_process, (spec.to_dict(), ))
+        task = _replay_process
+
+    try:
+        if warmup_plans:
+            pool.map(task, [warmup_plans] * workers, chunksize=1)
+
+        start = perf_counter()
+        results = [r for chunk in pool.imap_unordered(task, chunks) for r in chunk]
+        duration = perf_counter() - start
+    finally:
+        pool.close()
+        pool.join()
+
+    return {
+        'spec': spec.to_dict(),
+        'executor': executor,
+        'workers': workers,
+        'requests': len(results),
+        'duration': duration,
+        'operations': summarise(results, duration),
+    }
+
+
+def format_report(report):
+    # type: (Dict[str, Any]) -> str
+    """
+    Format a report as a table; latencies are in milliseconds.
+    """
+    columns = ['p{}'.format(pct) for pct in PERCENTILES] + ['max']
+    lines = [
+        '{} requests in {:.2f}s with {} {} worker(s)'.format(
+            report['requests'], report['duration'], report['workers'], report['executor']),
+        '',
+        '{:<32} {:>8} {:>7} {:>10} {}'.format(
+            'operation', 'requests', 'errors', 'req/s', ' '.join('{:>8}'.format(c) for c in columns)),
+    ]
+    operations = report['operations']
+    for label in sorted(operations, key=lambda name: (name == 'all', name)):
+        entry = operations[label]
+        lines.append('{:<32} {:>8} {:>7} {:>10.1f} {}'.format(
+            label, entry['requests'], entry['errors'], entry['throughput'] or 0,
+            ' '.join('{:>8.2f}'.format(entry[c] * 1000) for c in columns)))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    # type: (List[str]) -> int
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.loadtest',
+                                     description="Replay synthetic traffic through an in-process API.")
+    parser.add_argument('--spec', metavar='FILE', help="Load the spec of the API and traffic from a JSON file.")
+    parser.add_argument('--resources', type=int, default=5,
+                        help="Number of resources to generate if no spec is supplied (default: %(default)s).")
+    parser.add_argument('--fields', type=int, default=5, help="Fields of generated resources (default: %(default)s).")
+    parser.add_argument('--records', type=int, default=100,
+                        help="Records of generated resources (default: %(default)s).")
+    parser.add_argument('-n', '--requests', type=int, default=10000,
+                        help="Number of requests (default: %(default)s).")
+    parser.add_argument('-w', '--workers', type=int, default=4, help="Number of workers (default: %(default)s).")
+    parser.add_argument('--executor', choices=('thread', 'process'), default='thread',
+                        help="Run workers in threads or processes (default: %(default)s).")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: %(default)s).")
+    parser.add_argument('--warmup', type=int, default=100,
+                        help="Warm-up requests per worker (default: %(default)s).")
+    parser.add_argument('-o', '--output', metavar='FILE', help="Write the report to FILE as JSON.")
+    args = parser.parse_args(argv)
+
+    if args.spec:
+        with open(args.spec) as f:
+            spec = LoadSpec.from_dict(json.load(f))
+    else:
+        spec = LoadSpec.generate(args.resources, args.fields, args.records)
+
+    report = run(spec, args.requests, args.workers, args.executor, args.seed, args.warmup)
+    print(format_report(report))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
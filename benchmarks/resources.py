@@ -0,0 +1,22 @@
+"""
+Resources used by benchmarks.
+"""
+import odin
+
+
+class User(odin.Resource):
+    class Meta:
+        namespace = 'benchmarks'
+
+    id = odin.IntegerField()
+    name = odin.StringField()
+    email = odin.EmailField(null=True)
+    role = odin.StringField(null=True, choices=(
+        ('admin', 'Admin'),
+        ('user', 'User'),
+    ))
+    is_active = odin.BooleanField(default=True)
+
+
+def make_users(count):
+    return [User(idx, 'User {}'.format(idx), 'user{}@example.com'.format(idx), 'user') for idx in range(count)]
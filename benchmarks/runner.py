@@ -0,0 +1,363 @@
+"""
+Benchmark Runner
+~~~~~~~~~~~~~~~~
+
+Registry of benchmarks, measurement and storage/comparison of results.
+
+A benchmark is a setup function that returns the callable to be measured,
+setup is not included in the measurement::
+
+    @benchmark('url_path.parse')
+    def url_path_parse():
+        return lambda: UrlPath.parse('/api/user/{user_id:Integer}')
+
+Parametrised benchmarks are registered once per parameter, the parameter is
+supplied to the setup function.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import gc
+import importlib
+import json
+import platform
+import subprocess
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from odinweb._compat import perf_counter
+
+# Imports for typing support
+from typing import Any, Callable, Dict, List, Optional, Sequence  # noqa
+
+RESULTS_VERSION = 1
+
+MODULES = (
+    'benchmarks.bench_dispatch',
+    'benchmarks.bench_helpers',
+    'benchmarks.bench_data_structures',
+    'benchmarks.bench_signing',
+    'benchmarks.bench_swagger',
+)
+"""
+Modules that define benchmarks.
+"""
+
+
+class Benchmark(object):
+    """
+    Registered benchmark.
+
+    :param name: Name of the benchmark.
+    :param setup: Function that prepares and returns the callable to measure.
+    :param param: Parameter supplied to the setup function.
+
+    """
+    __slots__ = ('name', 'setup', 'param')
+
+    def __init__(self, name, setup, param=None):
+        # type: (str, Callable[..., Callable[[], Any]], Any) -> None
+        self.name = name
+        self.setup = setup
+        self.param = param
+
+    def __repr__(self):
+        return '<Benchmark {!r}>'.format(self.name)
+
+    def prepare(self):
+        # type: () -> Callable[[], Any]
+        return self.setup() if self.param is None else self.setup(self.param)
+
+
+REGISTRY = []  # type: List[Benchmark]
+
+
+def benchmark(name, params=None):
+    # type: (str, Sequence[Any]) -> Callable
+    """
+    Register a benchmark setup function.
+
+    :param name: Name of the benchmark; for parametrised benchmarks the
+        parameter is appended to the name, eg ``listing[10]``.
+    :param params: Parameters to register the benchmark with.
+
+    """
+    def inner(setup):
+        if params is None:
+            REGISTRY.append(Benchmark(name, setup))
+        else:
+            for param in params:
+                REGISTRY.append(Benchmark('{}[{}]'.format(name, param), setup, param))
+        return setup
+    return inner
+
+
+def load_benchmarks(patterns=None):
+    # type: (Sequence[str]) -> List[Benchmark]
+    """
+    Load registered benchmarks; optionally only benchmarks with a name that
+    contains one of `patterns`.
+    """
+    for module in MODULES:
+        importlib.import_module(module)
+
+    if not patterns:
+        return list(REGISTRY)
+    return [b for b in REGISTRY if any(p in b.name for p in patterns)]
+
+
+def _time(func, number):
+    # type: (Callable[[], Any], int) -> float
+    loops = range(number)
+    start = perf_counter()
+    for _ in loops:
+        func()
+    return perf_counter() - start
+
+
+def time_callable(func, min_time=0.2, repeat=5):
+    # type: (Callable[[], Any], float, int) -> Dict[str, Any]
+    """
+    Time a callable.
+
+    The number of calls in each round is increased until a round takes at
+    least `min_time` seconds, the best, median and mean time per call of
+    `repeat` rounds is reported. The garbage collector is disabled while
+    timing (as is done by :py:mod:`timeit`).
+
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        number = 1
+        while True:
+            elapsed = _time(func, number)
+            if elapsed >= min_time:
+                break
+            # Aim a little over the minimum to avoid an extra round
+            number = max(number * 2, int(number * min_time * 1.2 / max(elapsed, 1e-9)))
+
+        timings = [elapsed / number]
+        for _ in range(repeat - 1):
+            timings.append(_time(func, number) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    median = timings[len(timings) // 2]
+    return {
+        'number': number,
+        'repeat': repeat,
+        'best': timings[0],
+        'median': median,
+        'mean': mean,
+        'stdev': (sum((t - mean) ** 2 for t in timings) / len(timings)) ** 0.5,
+        'ops_per_sec': 1 / median if median else None,
+    }
+
+
+def trace_allocations(func):
+    # type: (Callable[[], Any]) -> Optional[Dict[str, int]]
+    """
+    Memory allocated by a single call of a callable.
+
+    Reports the peak memory allocated during the call and memory still
+    allocated after the call (eg caches); `None` if :py:mod:`tracemalloc`
+    is not available.
+
+    """
+    if tracemalloc is None or tracemalloc.is_tracing():
+        return None
+
+    tracemalloc.start()
+    try:
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'peak_bytes': peak, 'retained_bytes': current}
+
+
+def run_benchmark(bench, min_time=0.2, repeat=5, allocations=True):
+    # type: (Benchmark, float, int, bool) -> Dict[str, Any]
+    """
+    Run a benchmark.
+    """
+    func = bench.prepare()
+    func()  # Warm up (populate any caches)
+
+    result = time_callable(func, min_time, repeat)
+    if allocations:
+        result['allocations'] = trace_allocations(func)
+    return result
+
+
+def _revision():
+    # type: () -> Optional[str]
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.STDOUT
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(benchmarks, min_time=0.2, repeat=5, allocations=True, out=sys.stdout):
+    # type: (List[Benchmark], float, int, bool, Any) -> Dict[str, Any]
+    """
+    Run benchmarks and collect the results.
+    """
+    results = {}
+    for bench in benchmarks:
+        result = results[bench.name] = run_benchmark(bench, min_time, repeat, allocations)
+        if out is not None:
+            print(format_result(bench.name, result), file=out)
+
+    return {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'revision': _revision(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def _format_time(value):
+    # type: (float) -> str
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if value >= scale:
+            return '{:.2f}{}'.format(value / scale, unit)
+    return '{:.0f}ns'.format(value / 1e-9)
+
+
+def _format_bytes(value):
+    # type: (int) -> str
+    for unit, scale in (('MiB', 1 << 20), ('KiB', 1 << 10)):
+        if value >= scale:
+            return '{:.1f}{}'.format(value / scale, unit)
+    return '{}B'.format(value)
+
+
+def format_result(name, result):
+    # type: (str, Dict[str, Any]) -> str
+    line = '{:<40} {:>14.1f} ops/s {:>10} per op (+/- {})'.format(
+        name, result['ops_per_sec'], _format_time(result['median']), _format_time(result['stdev'])
+    )
+    allocations = result.get('allocations')
+    if allocations:
+        line += '  peak {}'.format(_format_bytes(allocations['peak_bytes']))
+    return line
+
+
+def compare(baseline, current, threshold=0.1):
+    # type: (Dict[str, Any], Dict[str, Any], float) -> List[Dict[str, Any]]
+    """
+    Compare results against a baseline.
+
+    :param baseline: Baseline results.
+    :param current: Results to compare.
+    :param threshold: Relative change in median time (or peak memory) that
+        is reported as a regression or an improvement.
+    :returns: Comparison of each benchmark in both results.
+
+    """
+    comparison = []
+    baseline_results = baseline['results']
+    for name, result in sorted(current['results'].items()):
+        base = baseline_results.get(name)
+        if base is None:
+            continue
+
+        change = result['median'] / base['median'] - 1
+        status = 'regression' if change > threshold else 'improvement' if change < -threshold else 'same'
+
+        memory_change = None
+        allocations, base_allocations = result.get('allocations'), base.get('allocations')
+        if allocations and base_allocations and base_allocations['peak_bytes']:
+            memory_change = allocations['peak_bytes'] / base_allocations['peak_bytes'] - 1
+            if memory_change > threshold:
+                status = 'regression'
+
+        comparison.append({
+            'name': name,
+            'baseline': base['median'],
+            'current': result['median'],
+            'change': change,
+            'memory_change': memory_change,
+            'status': status,
+        })
+    return comparison
+
+
+def format_comparison(comparison):
+    # type: (List[Dict[str, Any]]) -> str
+    lines = ['{:<40} {:>10} {:>10} {:>8} {:>8}'.format('benchmark', 'baseline', 'current', 'time', 'memory')]
+    for item in comparison:
+        memory_change = item['memory_change']
+        lines.append('{:<40} {:>10} {:>10} {:>+7.1%} {:>8} {}'.format(
+            item['name'], _format_time(item['baseline']), _format_time(item['current']), item['change'],
+            '-' if memory_change is None else '{:+.1%}'.format(memory_change),
+            '' if item['status'] == 'same' else item['status'].upper()
+        ).rstrip())
+    return '\n'.join(lines)
+
+
+def load_results(file_name):
+    # type: (str) -> Dict[str, Any]
+    with open(file_name) as f:
+        results = json.load(f)
+    if results.get('version') != RESULTS_VERSION:
+        raise ValueError("Unsupported results version in {}".format(file_name))
+    return results
+
+
+def main(argv=None):
+    # type: (List[str]) -> int
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Run OdinWeb micro-benchmarks.")
+    parser.add_argument('-f', '--filter', action='append', metavar='PATTERN',
+                        help="Only run benchmarks with a name containing PATTERN (can be repeated).")
+    parser.add_argument('-o', '--output', metavar='FILE', help="Write results to FILE as JSON.")
+    parser.add_argument('-c', '--compare', metavar='FILE', help="Compare results against baseline results in FILE.")
+    parser.add_argument('--load', metavar='FILE', help="Load results from FILE instead of running benchmarks.")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="Relative change reported as a regression (default: %(default)s).")
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help="Minimum time (in seconds) of each timing round (default: %(default)s).")
+    parser.add_argument('--repeat', type=int, default=5, help="Number of timing rounds (default: %(default)s).")
+    parser.add_argument('--no-allocations', dest='allocations', action='store_false',
+                        help="Do not trace memory allocations.")
+    parser.add_argument('--list', action='store_true', help="List benchmarks and exit.")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for bench in load_benchmarks(args.filter):
+            print(bench.name)
+        return 0
+
+    if args.load:
+        results = load_results(args.load)
+    else:
+        results = run(load_benchmarks(args.filter), args.min_time, args.repeat, args.allocations)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        comparison = compare(load_results(args.compare), results, args.threshold)
+        print()
+        print(format_comparison(comparison))
+        if any(item['status'] == 'regression' for item in comparison):
+            return 1
+
+    return 0
@@ -10,15 +10,18 @@ this point onwards Python 3.5+ will be required.
 from __future__ import absolute_import
 
 import sys
+import time
 
 __all__ = (
-    'PY2', 'PY3',
+    'PY2', 'PY3', 'PY35',
     'string_types', 'integer_types', 'text_type', 'binary_type',
-    'range', 'with_metaclass'
+    'range', 'with_metaclass',
+    'isawaitable', 'then', 'perf_counter', 'monotonic',
 )
 
 PY2 = sys.version_info[0] == 2
 PY3 = sys.version_info[0] == 3
+PY35 = sys.version_info >= (3, 5)
 
 if PY2:
     string_types = basestring,
@@ -27,12 +30,25 @@ if PY2:
     binary_type = str
 
     range = xrange
+    perf_counter = time.time
+    monotonic = time.time
 else:
     string_types = str,
     integer_types = int,
     text_type = str
     binary_type = bytes
     range = range
+    perf_counter = time.perf_counter
+    monotonic = time.monotonic
+
+if PY35:
+    from inspect import isawaitable
+    from .aio import then
+else:
+    def isawaitable(_):
+        return False
+
+    then = None
 
 
 def with_metaclass(meta, *bases):
@@ -0,0 +1,55 @@
+"""
+Async helpers, these require Python 3.5+ so are only imported on supported
+versions of Python.
+"""
+import asyncio
+
+
+async def then(awaitable, callback):
+    """
+    Await a result and apply a callback to the value.
+    """
+    return callback(await awaitable)
+
+
+class AsyncSingleFlight(object):
+    """
+    Execute a coroutine function once for concurrent calls with the same key;
+    callers that arrive while a call is in flight await and share the result
+    (or exception) of that call.
+
+    :param share: Function applied to the result of the leader to generate
+        the value shared with followers; by default the result itself is shared.
+
+    """
+    def __init__(self, share=None):
+        self.share = share
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, func, *args):
+        """
+        Execute (or await) a call.
+
+        :returns: Tuple of the result and if the result is shared (this call
+            was a follower).
+
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            return (await asyncio.shield(future))[1], True
+
+        future = self._calls[key] = asyncio.ensure_future(self._call(func, args))
+        try:
+            # Shield the call so followers are not affected if the leader is cancelled
+            return (await asyncio.shield(future))[0], False
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    async def _call(self, func, args):
+        # The shared value is generated before followers are resumed
+        result = await func(*args)
+        return result, result if self.share is None else self.share(result)
@@ -22,11 +22,12 @@ from .containers import (
     ApiVersion,
 )  # noqa
 from .decorators import (
-    Operation, ListOperation, ResourceOperation, security,
+    Operation, ListOperation, ResourceOperation, BulkResourceOperation, security,
     # Basic routes
     collection, collection_action, action, operation,
     # Shortcuts
     listing, create, detail, update, patch, delete,
+    bulk_create, bulk_update,
 )  # noqa
 from .exceptions import (
     ImmediateHttpResponse,
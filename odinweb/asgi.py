@@ -0,0 +1,531 @@
+# -*- coding: utf-8 -*-
+"""
+ASGI Interface
+~~~~~~~~~~~~~~
+
+An ASGI interface with async aware dispatch (requires Python 3.5+)::
+
+    >>> from odinweb import api
+    >>> from odinweb.asgi import AsgiApiInterface
+    >>> application = AsgiApiInterface(
+    ...     api.ApiVersion(
+    ...         UserApi(),
+    ...     )
+    ... )
+
+Operation callbacks can be either ``async def`` coroutine functions or
+standard functions; standard functions are executed in a thread pool so the
+event loop is not blocked.
+
+Middleware hooks (``pre_request``, ``pre_dispatch``, ``post_dispatch``,
+``post_request``, ``request_finished`` and ``handle_500``) can also be
+coroutine functions, any coroutine returned by a hook is awaited.
+
+"""
+import asyncio
+import functools
+import inspect
+import logging
+
+try:
+    from urllib.parse import parse_qsl
+    from http.cookies import SimpleCookie, CookieError
+except ImportError:
+    from urlparse import parse_qsl
+    from Cookie import SimpleCookie, CookieError
+
+from odin.utils import lazy_property
+
+from . import _compat
+from .constants import HTTPStatus, Method
+from .cache import copy_response
+from .containers import ApiInterfaceBase
+from .data_structures import BaseHttpRequest, HttpResponse, MultiValueDict
+from .exceptions import ImmediateHttpResponse
+from .resources import Error
+from .tracing import body_size, child_span
+from .wsgi import encode_body, FORM_CONTENT_TYPES
+
+# Imports for typing support
+from typing import Dict, Any, Callable, List, Optional, Tuple  # noqa
+from odin import Resource  # noqa
+from .decorators import Operation  # noqa
+
+logger = logging.getLogger(__name__)
+
+
+async def maybe_await(value):
+    """
+    Await a value if it is awaitable (eg the result of a coroutine function).
+    """
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+def is_async_operation(operation):
+    # type: (Operation) -> bool
+    """
+    Operation callback is a coroutine function.
+    """
+    return asyncio.iscoroutinefunction(operation.callback)
+
+
+class AsgiRequest(BaseHttpRequest):
+    """
+    Request object wrapping an ASGI connection scope.
+    """
+    def __init__(self, scope, body=b''):
+        # type: (Dict[str, Any], bytes) -> None
+        self._scope = scope
+        self._body = body
+
+    @property
+    def environ(self):
+        return self._scope
+
+    @lazy_property
+    def method(self):
+        return Method(self._scope['method'].upper())
+
+    @property
+    def scheme(self):
+        return self._scope.get('scheme', 'http')
+
+    @lazy_property
+    def host(self):
+        host = self.headers.get('HOST')
+        if not host:
+            server = self._scope.get('server')
+            if server:
+                host, port = server
+                if port and port != {'https': 443}.get(self.scheme, 80):
+                    host = '{}:{}'.format(host, port)
+        return host
+
+    @property
+    def path(self):
+        return self._scope.get('root_path', '') + self._scope['path']
+
+    @lazy_property
+    def query(self):
+        query_string = self._scope.get('query_string', b'').decode('latin-1')
+        return MultiValueDict(parse_qsl(query_string, keep_blank_values=True))
+
+    @lazy_property
+    def headers(self):
+        return MultiValueDict(
+            (name.decode('latin-1').upper().replace('-', '_'), value.decode('latin-1'))
+            for name, value in self._scope.get('headers', ())
+        )
+
+    @property
+    def accepts(self):
+        return self.headers.get('ACCEPT')
+
+    @lazy_property
+    def cookies(self):
+        cookies = MultiValueDict()
+        value = self.headers.get('COOKIE')
+        if value:
+            cookie = SimpleCookie()
+            try:
+                cookie.load(value)
+            except CookieError:
+                pass
+            else:
+                for key, morsel in cookie.items():
+                    cookies[key] = morsel.value
+        return cookies
+
+    @lazy_property
+    def session(self):
+        # Sessions are not supported by ASGI
+        return MultiValueDict()
+
+    @property
+    def body(self):
+        return self._body
+
+    @lazy_property
+    def form(self):
+        content_type = (self.content_type or '').split(';')[0].strip()
+        if content_type in FORM_CONTENT_TYPES:
+            return MultiValueDict(parse_qsl(self._body.decode('latin-1'), keep_blank_values=True))
+        return MultiValueDict()
+
+
+class AsgiApiInterface(ApiInterfaceBase):
+    """
+    API interface that is an ASGI application.
+    """
+    request_type = AsgiRequest
+    """
+    Request wrapper class.
+    """
+
+    executor = None
+    """
+    Executor used to run synchronous operations; the default executor of
+    the event loop is used if not specified.
+    """
+
+    async def handle_500_async(self, request, exception):
+        # type: (BaseHttpRequest, BaseException) -> Resource
+        """
+        Handle an *un-handled* exception (awaiting any middleware).
+        """
+        # Let middleware attempt to handle exception
+        try:
+            for middleware in self.middleware.handle_500:
+                resource = await maybe_await(middleware(request, exception))
+                if resource:
+                    return resource
+
+        except Exception as ex:  # noqa - This is a top level handler
+            exception = ex
+
+        # Fallback to generic error
+        logger.exception('Internal Server Error: %s', exception, extra={
+            'status_code': 500,
+            'request': request
+        })
+        return Error.from_status(HTTPStatus.INTERNAL_SERVER_ERROR, 0,
+                                 "An unhandled error has been caught.")
+
+    async def call_operation(self, operation, request, path_args):
+        # type: (Operation, BaseHttpRequest, Dict[str, Any]) -> Any
+        """
+        Call an operation callback, synchronous callbacks are executed in a thread pool.
+        """
+        if is_async_operation(operation):
+            return await maybe_await(operation.execute(request, **path_args))
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(
+            operation.execute, request, **path_args
+        ))
+
+    async def execute_operation(self, operation, request, path_args, marks=None):
+        # type: (Operation, BaseHttpRequest, Dict[str, Any], Optional[list]) -> Any
+        """
+        Execute an operation (after pre-dispatch hooks have been run); calls
+        the operation callback and the operation and global post-dispatch hooks.
+
+        This matches the execute stage of the compiled (synchronous) pipeline
+        and is used for both cached and uncached operations.
+        """
+        if request.trace_span is None:
+            resource = await self.call_operation(operation, request, path_args)
+        else:
+            with child_span(request, 'odinweb.operation', {'operation_id': operation.operation_id}):
+                resource = await self.call_operation(operation, request, path_args)
+        if marks:
+            marks[4] = _compat.perf_counter()
+
+        for middleware in operation.middleware.post_dispatch + self.middleware.post_dispatch:
+            resource = await maybe_await(middleware(request, resource))
+        if marks:
+            marks[5] = _compat.perf_counter()
+
+        return resource
+
+    async def execute_response(self, operation, request, path_args):
+        # type: (Operation, BaseHttpRequest, Dict[str, Any]) -> HttpResponse
+        """
+        Execute an operation (see :py:meth:`execute_operation`) and generate a response.
+        """
+        resource = await self.execute_operation(operation, request, path_args)
+        return self.operation_response(request, resource, None, None)
+
+    async def cached_response(self, operation, request, path_args, marks=None):
+        # type: (Operation, BaseHttpRequest, Dict[str, Any], Optional[list]) -> HttpResponse
+        """
+        Generate a response for an operation with response caching and/or
+        request coalescing enabled (after pre-dispatch hooks have been run).
+
+        Cached responses are served without executing the operation,
+        identical concurrent requests share the (encoded) response of the
+        leader. Cached and coalesced responses are timed as the callback.
+        """
+        cache = operation.cache
+        cache_key = cache.key(operation, request, path_args) if cache else None
+        if cache_key:
+            response = cache.get(cache_key)
+            if response is not None:
+                if marks:
+                    marks[4] = _compat.perf_counter()
+                return response
+
+        coalesce = operation.coalesce
+        flight_key = coalesce.key(operation, request, path_args) if coalesce else None
+        if flight_key:
+            response, shared = await coalesce.async_flight.do(
+                flight_key, self.execute_response, operation, request, path_args
+            )
+            if shared:
+                response = copy_response(response)
+            if marks:
+                marks[4] = _compat.perf_counter()
+        else:
+            resource = await self.execute_operation(operation, request, path_args, marks)
+            response = self.operation_response(request, resource, None, None)
+
+        if cache_key:
+            cache.set(cache_key, response)
+        return response
+
+    async def dispatch_operation_async(self, operation, request, path_args, marks=None):
+        # type: (Operation, BaseHttpRequest, Dict[str, Any], list) -> Tuple[Any, Optional[HTTPStatus], Optional[dict]]
+        """
+        Dispatch and handle exceptions from operation.
+        """
+        try:
+            # path_args is passed by ref so changes can be made.
+            for middleware in self.middleware.pre_dispatch + operation.middleware.pre_dispatch:
+                await maybe_await(middleware(request, path_args))
+            if marks:
+                marks[3] = _compat.perf_counter()
+
+            if operation.cache or operation.coalesce:
+                resource = await self.cached_response(operation, request, path_args, marks)
+            else:
+                resource = await self.execute_operation(operation, request, path_args, marks)
+
+        except Exception as e:
+            if marks:
+                # Time up to the error is recorded against the phase it occurred in
+                for idx in (3, 4, 5):
+                    if not marks[idx]:
+                        marks[idx] = _compat.perf_counter()
+                        break
+
+            result = self.operation_error(e)
+            if result is not None:
+                return result
+
+            if self.debug_enabled:
+                raise
+
+            # Fallback to the default handler
+            resource = await self.handle_500_async(request, e)
+            return resource, resource.status, None
+
+        else:
+            return resource, None, None
+
+    async def dispatch_async(self, operation, request, **path_args):
+        # type: (Operation, BaseHttpRequest, **Any) -> HttpResponse
+        """
+        Dispatch incoming request and capture top level exceptions.
+
+        The body of a streaming response is generated after dispatch, the
+        request-finished hooks are then called once the body has been sent
+        (see :py:meth:`send_streaming`).
+        """
+        response = None
+        try:
+            response = await self._traced_dispatch_async(operation, request, path_args)
+            return response
+
+        finally:
+            if response is None or not response.streaming:
+                await self.finish_request(request)
+
+    async def _traced_dispatch_async(self, operation, request, path_args):
+        # type: (Operation, BaseHttpRequest, Dict[str, Any]) -> HttpResponse
+        tracer = self.tracer
+        if not tracer.enabled:
+            return await self._timed_dispatch_async(operation, request, path_args)
+
+        span = tracer.start_span('odinweb.dispatch', tracer.extract(request.headers), {
+            'operation_id': operation.operation_id,
+            'http.method': request.method.value,
+        })
+        with span:
+            request.trace_span = span
+            response = await self._timed_dispatch_async(operation, request, path_args)
+            span.set_attribute('http.status_code', response.status)
+            span.set_attribute('body_size', body_size(response.body))
+        return response
+
+    async def _timed_dispatch_async(self, operation, request, path_args):
+        # type: (Operation, BaseHttpRequest, Dict[str, Any]) -> HttpResponse
+        """
+        Record timing marks of the dispatch phases (see
+        :py:meth:`ApiInterfaceBase.compile_operation`) if any middleware
+        defines a ``record_timings`` hook.
+        """
+        if not self.middleware.record_timings:
+            return await self._dispatch_async(operation, request, path_args)
+
+        marks = [_compat.perf_counter(), 0, 0, 0, 0, 0, 0, 0]
+        response = await self._dispatch_async(operation, request, path_args, marks)
+        self._record_timings(request, response, marks)
+        return response
+
+    async def finish_request(self, request):
+        # type: (BaseHttpRequest) -> None
+        """
+        Call the request-finished hooks.
+        """
+        for middleware in self.middleware.request_finished:
+            await maybe_await(middleware(request))
+
+    async def _dispatch_async(self, operation, request, path_args, marks=None):
+        # type: (Operation, BaseHttpRequest, Dict[str, Any], Optional[list]) -> HttpResponse
+        # Add current operation to the request (for convenience in middleware methods)
+        request.current_operation = operation
+
+        try:
+            for middleware in self.middleware.pre_request:
+                response = await maybe_await(middleware(request, path_args))
+                # Return HttpResponse if one is returned.
+                if isinstance(response, HttpResponse):
+                    if marks:
+                        marks[1] = _compat.perf_counter()
+                    return response
+            if marks:
+                marks[1] = _compat.perf_counter()
+
+            # Determine the request and response types. Ensure API supports the requested types
+            response = self.resolve_codecs(request)
+            if marks:
+                marks[2] = _compat.perf_counter()
+            if response is None:
+                # Check if method is in our allowed method list
+                if request.method not in operation.methods:
+                    response = self.method_not_allowed(operation)
+                else:
+                    resource, status, headers = await self.dispatch_operation_async(
+                        operation, request, path_args, marks
+                    )
+                    response = self.operation_response(request, resource, status, headers)
+                    if marks:
+                        marks[6] = _compat.perf_counter()
+
+            for middleware in self.middleware.post_request:
+                response = await maybe_await(middleware(request, response))
+            if marks:
+                marks[7] = _compat.perf_counter()
+
+        except Exception as ex:
+            if self.debug_enabled:
+                # If debug is enabled then fallback to the frameworks default
+                # error processing, this often provides convenience features
+                # to aid in the debugging process.
+                raise
+            await self.handle_500_async(request, ex)
+            return HttpResponse("Error processing response.", HTTPStatus.INTERNAL_SERVER_ERROR)
+
+        else:
+            return response
+
+    async def handle_request(self, request):
+        # type: (AsgiRequest) -> HttpResponse
+        """
+        Route a request to an operation and dispatch.
+        """
+        try:
+            operation, path_args = self.router.resolve(request.environ['method'], request.environ['path'])
+        except ImmediateHttpResponse as e:
+            route = self.route_error(request, e)
+            if route is None:
+                return HttpResponse.from_status(e.status, e.headers)
+            operation, path_args = route
+        return await self.dispatch_async(operation, request, **path_args)
+
+    async def __call__(self, scope, receive, send):
+        scope_type = scope['type']
+        if scope_type == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope_type != 'http':
+            raise ValueError("Unsupported scope type: {}".format(scope_type))
+
+        # Read complete body
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            more_body = message.get('more_body', False)
+
+        request = self.request_type(scope, b''.join(chunks))
+        response = await self.handle_request(request)
+
+        headers = [(str(k).encode('latin-1'), str(v).encode('latin-1')) for k, v in response.headers.items()]
+
+        if response.streaming:
+            await self.send_streaming(request, response, headers, send)
+            return
+
+        body = encode_body(response.body)
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status,
+            'headers': headers,
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': body,
+        })
+
+    async def send_streaming(self, request, response, headers, send):
+        # type: (BaseHttpRequest, HttpResponse, List[Tuple[bytes, bytes]], Callable) -> None
+        """
+        Send a streaming response, chunks are generated in the executor so
+        the event loop is not blocked.
+
+        Errors generating the body are passed to :py:meth:`handle_500_async`
+        (and re-raised to abort the response), the request is finished once
+        the body has been sent.
+        """
+        chunks = response.body
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': response.status,
+                'headers': headers,
+            })
+
+            loop = asyncio.get_event_loop()
+            while True:
+                try:
+                    chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+                except Exception as ex:
+                    await self.handle_500_async(request, ex)
+                    raise
+                if chunk is None:
+                    break
+                await send({
+                    'type': 'http.response.body',
+                    'body': encode_body(chunk),
+                    'more_body': True,
+                })
+
+            await send({
+                'type': 'http.response.body',
+                'body': b'',
+            })
+
+        finally:
+            # Release the body if sending fails (eg the client disconnected)
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+            await self.finish_request(request)
+
+    async def lifespan(self, receive, send):
+        """
+        Handle ASGI lifespan events.
+        """
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Batch Requests
+~~~~~~~~~~~~~~
+
+Multiplex many operations into a single HTTP request.
+
+To enable add the :py:class:`BatchApi` resource API into your API::
+
+    >>> from odinweb import api
+    >>> from odinweb.batch import BatchApi
+    >>> my_api = api.ApiCollection(
+    ...    BatchApi(max_workers=4),
+    ... )
+
+Clients ``POST`` a list of sub-requests to the batch endpoint::
+
+    [
+        {"method": "GET", "path": "/api/v1/user/1"},
+        {"method": "POST", "path": "/api/v1/user", "body": {"name": "Dave"}}
+    ]
+
+Each sub-request is resolved and dispatched through the API interface (with
+the headers, cookies and session of the batch request) and the responses are
+returned, in order, in a single response.
+
+Sub-request and response bodies are passed through as decoded objects, so
+only the batch request and response are encoded.
+
+"""
+from __future__ import absolute_import
+
+import odin
+
+from odin.resources import build_object_graph
+from odin.utils import lazy_property
+
+try:
+    from urllib.parse import parse_qsl
+except ImportError:
+    from urlparse import parse_qsl
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
+from . import doc
+from .constants import HTTPStatus, Method
+from .containers import ResourceApi
+from .data_structures import BaseHttpRequest, MultiValueDict, NoPath
+from .decorators import Operation
+from .exceptions import HttpError, ImmediateHttpResponse
+from .helpers import get_resource
+from .resources import AnyField
+
+# Imports for typing support
+from typing import Any, Dict, List, Tuple  # noqa
+from concurrent.futures import Executor  # noqa
+from .containers import ApiInterfaceBase  # noqa
+from .data_structures import HttpResponse  # noqa
+
+
+class MethodField(odin.StringField):
+    """
+    HTTP method; values are normalised to upper case before validation.
+    """
+    def to_python(self, value):
+        value = super(MethodField, self).to_python(value)
+        return value.upper() if value else value
+
+
+class SubRequest(odin.Resource):
+    """
+    Request to be executed as part of a batch.
+    """
+    class Meta:
+        namespace = None
+
+    method = MethodField(
+        default='GET', use_default_if_not_provided=True, choices=[(m.value, m.value) for m in Method],
+        help_text="HTTP method of the request."
+    )
+    path = odin.StringField(
+        help_text="Path (including any query string) of the request."
+    )
+    headers = odin.DictField(
+        null=True,
+        help_text="Additional headers of the request."
+    )
+    body = AnyField(
+        null=True,
+        help_text="Body of the request."
+    )
+
+
+class SubResponse(odin.Resource):
+    """
+    Response to a request executed as part of a batch.
+    """
+    class Meta:
+        namespace = None
+
+    status = odin.IntegerField(
+        help_text="HTTP status code of the response."
+    )
+    headers = odin.DictField(
+        null=True,
+        help_text="Headers of the response."
+    )
+    body = AnyField(
+        null=True,
+        help_text="Body of the response."
+    )
+
+
+class PassthroughCodec(object):
+    """
+    Codec for in-memory sub-requests; bodies are passed through as decoded
+    objects rather than being encoded and decoded.
+    """
+    CONTENT_TYPE = 'application/x-odinweb-passthrough'
+
+    @staticmethod
+    def loads(body, resource=None, full_clean=True, default_to_not_supplied=False):
+        return build_object_graph(body, resource, full_clean, False, default_to_not_supplied)
+
+    @staticmethod
+    def dumps(body):
+        return body
+
+
+SUB_REQUEST_EXCLUDED_HEADERS = frozenset((
+    'CONTENT_LENGTH', 'CONTENT_TYPE', 'CONTENT_ENCODING', 'CONTENT_MD5',
+    'IF_MATCH', 'IF_NONE_MATCH', 'IF_MODIFIED_SINCE', 'IF_UNMODIFIED_SINCE', 'IF_RANGE',
+))
+"""
+Entity and conditional headers of the batch request that are not inherited by
+sub-requests; they describe the batch body or make the batch request conditional.
+"""
+
+
+def _prepare_headers(headers):
+    # type: (Dict[str, str]) -> List[Tuple[str, str]]
+    return [(k.upper().replace('-', '_'), v) for k, v in (headers or {}).items()]
+
+
+class BatchSubRequest(BaseHttpRequest):
+    """
+    In-memory request for a sub-request; the environment, headers, cookies
+    and session are inherited from the batch request (the `parent`). Entity
+    and conditional headers (see :py:data:`SUB_REQUEST_EXCLUDED_HEADERS`) are
+    only taken from the sub-request.
+
+    Sub-requests are not subject to the interface concurrency limit (see
+    :py:class:`odinweb.middleware.concurrency.LoadShedding`) as the batch
+    request already holds a slot.
+    """
+    request_codec = PassthroughCodec
+    response_codec = PassthroughCodec
+    codecs_assigned = True
+
+    def __init__(self, parent, method, path, headers=None, body=None):
+        # type: (BaseHttpRequest, Method, str, Dict[str, str], Any) -> None
+        self.parent = parent
+        self._method = method
+        self._path, _, self._query_string = path.partition('?')
+        self._headers = headers
+        self._body = body
+
+    @property
+    def environ(self):
+        return self.parent.environ
+
+    @property
+    def method(self):
+        return self._method
+
+    @property
+    def scheme(self):
+        return self.parent.scheme
+
+    @property
+    def host(self):
+        return self.parent.host
+
+    @property
+    def path(self):
+        return self._path
+
+    @lazy_property
+    def query(self):
+        return MultiValueDict(parse_qsl(self._query_string, keep_blank_values=True))
+
+    @lazy_property
+    def headers(self):
+        headers = MultiValueDict(self.parent.headers)
+        for key in SUB_REQUEST_EXCLUDED_HEADERS:
+            headers.pop(key, None)
+        for key, value in _prepare_headers(self._headers):
+            headers[key] = value
+        return headers
+
+    @property
+    def cookies(self):
+        return self.parent.cookies
+
+    @property
+    def session(self):
+        return self.parent.session
+
+    @property
+    def body(self):
+        return self._body
+
+    @lazy_property
+    def form(self):
+        return MultiValueDict()
+
+
+class BatchApi(ResourceApi):
+    """
+    Resource API that executes a batch of sub-requests in a single call.
+
+    :param max_requests: Maximum number of sub-requests in a batch.
+    :param max_workers: Execute sub-requests in parallel on a thread pool
+        with this many workers; sub-requests are executed sequentially if
+        not specified.
+    :param executor: Executor used to execute sub-requests in parallel (in
+        place of a thread pool created for `max_workers`).
+
+    Sub-requests are executed using the synchronous dispatch of the API
+    interface.
+
+    A thread pool created for `max_workers` is owned by the batch API, call
+    :py:meth:`close` (eg when the application is shut down) to shut it down.
+    A supplied `executor` is owned by the caller and is responsible for
+    shutting it down; it is not shut down by :py:meth:`close`.
+    """
+    api_name = 'batch'
+    resource = SubRequest
+    request_type = BatchSubRequest
+
+    def __init__(self, max_requests=20, max_workers=None, executor=None):
+        # type: (int, int, Executor) -> None
+        super(BatchApi, self).__init__()
+        self.max_requests = max_requests
+        self.max_workers = max_workers
+
+        # Threads of the pool are only started once requests are submitted
+        self._owns_executor = executor is None and bool(max_workers and ThreadPoolExecutor)
+        if self._owns_executor:
+            executor = ThreadPoolExecutor(max_workers)
+        self.executor = executor
+
+        # Operation is bound to the instance to provide access to options
+        operation = Operation(BatchApi.execute_batch, NoPath, Method.POST)
+        operation.bind_to_instance(self)
+        self._operations = [operation]
+
+    @lazy_property
+    def api_interface(self):
+        # type: () -> ApiInterfaceBase
+        """
+        API interface (the top level of the API structure).
+        """
+        ancestor = parent = self.parent
+        while parent:
+            ancestor = parent
+            parent = getattr(parent, 'parent', None)
+        return ancestor
+
+    def close(self):
+        """
+        Shut down the thread pool owned by the batch API (waiting for any
+        executing sub-requests); batches are executed sequentially once closed.
+        """
+        executor = self.executor
+        self.executor = None
+        if executor is not None and self._owns_executor:
+            executor.shutdown(wait=True)
+
+    def execute_sub_request(self, request, sub_request):
+        # type: (BaseHttpRequest, SubRequest) -> SubResponse
+        """
+        Resolve and dispatch a sub-request.
+        """
+        api_interface = self.api_interface
+        try:
+            operation, path_args = api_interface.router.resolve(sub_request.method, sub_request.path.partition('?')[0])
+            if operation.binding is self:
+                raise HttpError(HTTPStatus.BAD_REQUEST, 1, "Batch requests cannot be nested.")
+        except ImmediateHttpResponse as e:
+            return SubResponse(int(e.status), e.headers, e.resource)
+
+        http_request = self.request_type(request, Method(sub_request.method), sub_request.path,
+                                         sub_request.headers, sub_request.body)
+        response = api_interface.dispatch(operation, http_request, **path_args)  # type: HttpResponse
+
+        body = response.body
+        if response.streaming:
+            # Passthrough codec generates a single chunk
+            try:
+                body = next(body, None)
+            finally:
+                close = getattr(response.body, 'close', None)
+                if close is not None:
+                    close()
+        return SubResponse(response.status, response.headers or None, body)
+
+    @doc.response(HTTPStatus.OK, "Responses of each request in the batch.", SubResponse)
+    def execute_batch(self, request):
+        """
+        Execute a batch of requests.
+        """
+        sub_requests = get_resource(request, SubRequest, allow_multiple=True)
+        if not isinstance(sub_requests, list):
+            sub_requests = [sub_requests]
+
+        if len(sub_requests) > self.max_requests:
+            raise HttpError(HTTPStatus.BAD_REQUEST, 2, "Too many requests, a maximum of {} is supported.".format(
+                self.max_requests
+            ))
+
+        executor = self.executor
+        if executor and len(sub_requests) > 1:
+            futures = [executor.submit(self.execute_sub_request, request, r) for r in sub_requests]
+            return [f.result() for f in futures]
+        return [self.execute_sub_request(request, r) for r in sub_requests]
@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""
+Response Caching
+~~~~~~~~~~~~~~~~
+
+Server side caching of encoded responses.
+
+Apply the :py:func:`cache_response` decorator to an operation, responses are
+stored after being encoded and returned directly (skipping the operation
+callback and encoding) until the TTL expires::
+
+    >>> from odinweb import api
+    >>> from odinweb.cache import cache_response
+    >>> class CountryApi(api.ResourceApi):
+    ...     @cache_response(ttl=3600, vary=('Accept-Language',))
+    ...     @api.listing
+    ...     def list_countries(self, request, offset, limit):
+    ...         ...
+
+Responses are cached using a backend, by default an in-process LRU cache
+shared by all operations is used. A backend can be supplied to share
+responses between processes (see :py:class:`FileCache`) or to use an external
+store by implementing the :py:class:`CacheBackend` interface.
+
+Middleware pre-dispatch hooks are always executed so cached responses are
+still subject to authentication checks etc; post-request hooks are applied
+to each response.
+
+Concurrent identical requests (eg after a popular cached response expires)
+can be coalesced with the :py:func:`coalesce_requests` decorator so only a
+single request executes the operation::
+
+    >>> class CountryApi(api.ResourceApi):
+    ...     @coalesce_requests()
+    ...     @cache_response(ttl=3600)
+    ...     @api.listing
+    ...     def list_countries(self, request, offset, limit):
+    ...         ...
+
+"""
+from __future__ import absolute_import
+
+import abc
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from odin.utils import lazy_property
+
+from . import _compat
+from .constants import Method
+from .data_structures import HttpResponse, LRUCache
+
+# Imports for typing support
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple  # noqa
+from .data_structures import BaseHttpRequest  # noqa
+from .decorators import Operation  # noqa
+
+__all__ = (
+    'CacheBackend', 'LocalMemoryCache', 'FileCache', 'ResponseCache', 'cache_response',
+    'SingleFlight', 'RequestCoalescer', 'coalesce_requests',
+)
+
+CACHEABLE_METHODS = (Method.GET, Method.HEAD)
+
+
+class CacheBackend(_compat.with_metaclass(abc.ABCMeta, object)):
+    """
+    Interface of a response cache backend.
+
+    Keys are tuples of strings (and other simple hashable values), values
+    are :py:class:`HttpResponse` objects.
+    """
+    @abc.abstractmethod
+    def get(self, key):
+        # type: (Hashable) -> Optional[HttpResponse]
+        """
+        Get a value from the cache; `None` if the key does not exist or has expired.
+        """
+
+    @abc.abstractmethod
+    def set(self, key, value, ttl):
+        # type: (Hashable, HttpResponse, int) -> None
+        """
+        Store a value in the cache for `ttl` seconds.
+        """
+
+    @abc.abstractmethod
+    def delete(self, key):
+        # type: (Hashable) -> None
+        """
+        Remove a value from the cache.
+        """
+
+    @abc.abstractmethod
+    def clear(self):
+        """
+        Remove all values from the cache.
+        """
+
+
+class LocalMemoryCache(CacheBackend):
+    """
+    In-process least recently used cache with TTL expiry.
+
+    :param max_size: Maximum number of values to store.
+
+    """
+    timer = staticmethod(time.time)
+
+    def __init__(self, max_size=256):
+        # type: (int) -> None
+        self._data = LRUCache(max_size)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > self.timer():
+                return value
+            self._data.pop(key)
+
+    def set(self, key, value, ttl):
+        self._data[key] = (self.timer() + ttl, value)
+
+    def delete(self, key):
+        self._data.pop(key)
+
+    def clear(self):
+        self._data.clear()
+
+
+class FileCache(CacheBackend):
+    """
+    Cache stored as files in a local directory, allowing responses to be
+    shared between processes on a host.
+
+    :param path: Directory to store cache files in.
+
+    """
+    timer = staticmethod(time.time)
+
+    def __init__(self, path):
+        # type: (str) -> None
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def file_path(self, key):
+        # type: (Hashable) -> str
+        name = hashlib.sha1(repr(key).encode('UTF-8')).hexdigest()
+        return os.path.join(self.path, name + '.cache')
+
+    def get(self, key):
+        file_path = self.file_path(key)
+        try:
+            with open(file_path, 'rb') as f:
+                expires, value = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        if expires > self.timer():
+            return value
+        self._remove(file_path)
+
+    def set(self, key, value, ttl):
+        # Write to a temporary file and rename so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((self.timer() + ttl, value), f, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, self.file_path(key))
+
+    def delete(self, key):
+        self._remove(self.file_path(key))
+
+    def clear(self):
+        for file_name in os.listdir(self.path):
+            if file_name.endswith('.cache'):
+                self._remove(os.path.join(self.path, file_name))
+
+    @staticmethod
+    def _remove(file_path):
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+
+default_backend = LocalMemoryCache()
+"""
+Backend used if a backend is not supplied.
+"""
+
+
+def normalise_headers(headers):
+    # type: (Optional[Sequence[str]]) -> Tuple[str, ...]
+    return tuple(h.upper().replace('-', '_') for h in headers or ())
+
+
+def request_key(operation, request, path_args, vary=()):
+    # type: (Operation, BaseHttpRequest, Dict[str, Any], Tuple[str, ...]) -> Optional[Tuple[Hashable, ...]]
+    """
+    Generate a key identifying identical requests; `None` if the request
+    method is not cacheable.
+
+    :param operation: Operation being dispatched.
+    :param request: Request being dispatched.
+    :param path_args: Arguments resolved from the path.
+    :param vary: Request headers (normalised) to include in the key.
+
+    """
+    if request.method not in CACHEABLE_METHODS:
+        return None
+
+    headers = request.headers
+    return (
+        operation.operation_id,
+        tuple(sorted(path_args.items())),
+        tuple(sorted((k, tuple(v)) for k, v in request.query.lists())),
+        request.response_codec.CONTENT_TYPE,
+        tuple(headers.get(h) for h in vary),
+    )
+
+
+def copy_response(response):
+    # type: (HttpResponse) -> HttpResponse
+    """
+    Copy a response so it can be modified (eg by post request middleware).
+    """
+    return HttpResponse(response.body, response.status, dict(response.headers))
+
+
+class ResponseCache(object):
+    """
+    Cache policy applied to an operation.
+
+    :param ttl: Time (in seconds) to cache a response.
+    :param vary: Request headers that result in a different response.
+    :param backend: Backend used to store responses.
+
+    """
+    def __init__(self, ttl=300, vary=None, backend=None):
+        # type: (int, Sequence[str], CacheBackend) -> None
+        self.ttl = ttl
+        self.vary = normalise_headers(vary)
+        self.backend = default_backend if backend is None else backend
+
+    def key(self, operation, request, path_args):
+        # type: (Operation, BaseHttpRequest, Dict[str, Any]) -> Optional[Tuple[Hashable, ...]]
+        """
+        Generate a key for a request; `None` if the request is not cacheable.
+        """
+        return request_key(operation, request, path_args, self.vary)
+
+    def get(self, key):
+        # type: (Hashable) -> Optional[HttpResponse]
+        """
+        Get a cached response; a copy is returned so it can be modified by
+        post request middleware.
+        """
+        response = self.backend.get(key)
+        if response is not None:
+            return copy_response(response)
+
+    def set(self, key, response):
+        # type: (Hashable, HttpResponse) -> None
+        """
+        Store a response (if the response can be cached).
+        """
+        if response.status == 200 and not response.streaming:
+            self.backend.set(key, copy_response(response), self.ttl)
+
+
+def cache_response(ttl=300, vary=None, backend=None):
+    # type: (int, Sequence[str], CacheBackend) -> Callable
+    """
+    Cache encoded responses of an operation.
+
+    :param ttl: Time (in seconds) to cache a response.
+    :param vary: Request headers that result in a different response (the
+        path arguments, query string and response content type are always
+        part of the key).
+    :param backend: Backend used to store responses; the default is an
+        in-process LRU cache.
+
+    .. warning:: The default key does not vary on the identity of the client,
+        a response is shared by every client that makes the same request. Do
+        not cache responses that are specific to a user unless headers that
+        identify the client (eg ``Authorization`` or ``Cookie``) are included
+        in `vary`.
+
+    """
+    def inner(o):
+        o.cache = ResponseCache(ttl, vary, backend)
+        return o
+    return inner
+
+
+class _Call(object):
+    __slots__ = ('event', 'result', 'exception')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight(object):
+    """
+    Execute a function once for concurrent calls with the same key; callers
+    that arrive while a call is in flight wait for and share the result (or
+    exception) of that call.
+
+    :param share: Function applied to the result of the leader to generate
+        the value shared with followers (eg a snapshot of a result the leader
+        goes on to modify); by default the result itself is shared.
+
+    """
+    def __init__(self, share=None):
+        # type: (Callable[[Any], Any]) -> None
+        self.share = share
+        self._lock = threading.Lock()
+        self._calls = {}  # type: Dict[Hashable, _Call]
+
+    def __len__(self):
+        return len(self._calls)
+
+    def do(self, key, func, *args):
+        # type: (Hashable, Callable[..., Any], *Any) -> Tuple[Any, bool]
+        """
+        Execute (or wait for) a call.
+
+        :returns: Tuple of the result and if the result is shared (this call
+            was a follower).
+
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result, True
+
+        try:
+            result = func(*args)
+            # Followers are released in finally, the shared value must be ready first
+            call.result = result if self.share is None else self.share(result)
+        except BaseException as ex:
+            # Includes exceptions that are not errors (eg SystemExit), followers
+            # must never receive a result from a call that did not complete.
+            call.exception = ex
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+        return result, False
+
+
+class RequestCoalescer(object):
+    """
+    Coalesce concurrent identical requests to an operation; one request (the
+    leader) executes the operation while the others wait and share the
+    response.
+
+    Followers receive a copy of a snapshot of the response taken before the
+    leader continues (and post request middleware modifies its response).
+
+    :param vary: Request headers that result in a different response.
+
+    """
+    def __init__(self, vary=None):
+        # type: (Sequence[str]) -> None
+        self.vary = normalise_headers(vary)
+        self.flight = SingleFlight(copy_response)
+
+    @lazy_property
+    def async_flight(self):
+        """
+        Single flight group for async dispatch.
+        """
+        from ._compat.aio import AsyncSingleFlight
+        return AsyncSingleFlight(copy_response)
+
+    def key(self, operation, request, path_args):
+        # type: (Operation, BaseHttpRequest, Dict[str, Any]) -> Optional[Tuple[Hashable, ...]]
+        """
+        Generate a key for a request; `None` if the request cannot be coalesced.
+        """
+        return request_key(operation, request, path_args, self.vary)
+
+    def do(self, key, func, *args):
+        # type: (Hashable, Callable[..., HttpResponse], *Any) -> HttpResponse
+        """
+        Generate a response (or wait for the response of the leader).
+        """
+        response, shared = self.flight.do(key, func, *args)
+        return copy_response(response) if shared else response
+
+
+def coalesce_requests(vary=None):
+    # type: (Sequence[str]) -> Callable
+    """
+    Coalesce concurrent identical *GET* requests to an operation, only one
+    request executes the operation with the others sharing the response.
+
+    :param vary: Request headers that result in a different response (the
+        path arguments, query string and response content type are always
+        part of the key). Include headers such as ``Authorization`` if the
+        response is specific to the client.
+
+    """
+    def inner(o):
+        o.coalesce = RequestCoalescer(vary)
+        return o
+    return inner
@@ -8,30 +8,41 @@ Containers that provide structure to an API.
 from __future__ import absolute_import
 
 import collections
+import functools
 import logging
 
 from odin.codecs import json_codec
 from odin.exceptions import ValidationError
-from odin.utils import getmeta
+from odin.utils import getmeta, lazy_property
 
 # Imports for typing support
-from typing import Union, Tuple, Any, Generator, Dict, Type, Optional  # noqa
+from typing import Union, Tuple, Any, Generator, Dict, Type, Optional, Callable  # noqa
 from odin import Resource  # noqa
 from .data_structures import BaseHttpRequest  # noqa
 
 from . import _compat
 from . import content_type_resolvers
 from .constants import Method, HTTPStatus
-from .data_structures import UrlPath, NoPath, HttpResponse, MiddlewareList
+from .data_structures import UrlPath, NoPath, HttpResponse, MiddlewareList, LRUCache, StreamingBody
 from .decorators import Operation, Tags
 from .exceptions import ImmediateHttpResponse
 from .helpers import resolve_content_type, create_response
 from .resources import Error
+from .router import Router
+from .tracing import Tracer, body_size, child_span
 
 
 logger = logging.getLogger(__name__)
 
-CODECS = {json_codec.CONTENT_TYPE: json_codec}
+TIMING_PHASES = (
+    'pre_request', 'negotiate', 'pre_dispatch', 'callback', 'post_dispatch', 'encode', 'post_request'
+)
+"""
+Dispatch phases timed by the compiled pipeline (see :py:meth:`ApiInterfaceBase.compile_operation`).
+"""
+
+# Ordered by preference (used when negotiating wildcard media ranges)
+CODECS = collections.OrderedDict([(json_codec.CONTENT_TYPE, json_codec)])
 
 # Attempt to load other codecs that have dependencies
 try:
@@ -47,6 +58,14 @@ except ImportError:
     pass
 
 
+def _route_error(request, error):
+    """
+    Callback of the operation used to dispatch requests that could not be
+    routed (see :py:meth:`ApiInterfaceBase.route_error`).
+    """
+    raise error
+
+
 class ResourceApiMeta(type):
     """
     Meta class that resolves endpoints to routes.
@@ -151,6 +170,7 @@ class ApiContainer(object):
     def __init__(self, *containers, **options):
         # type: (*Union[Operation, ApiContainer, ResourceApi], **Any) -> None
         self.containers = list(containers)
+        self._revision = 0
 
         # Set self as the parent
         for container in self.containers:
@@ -187,9 +207,33 @@ class ApiContainer(object):
         def inner(callback):
             operation = Operation(callback, path, methods, resource, tags, summary, middleware)
             self.containers.append(operation)
+            self.changed()
             return operation
         return inner
 
+    def changed(self):
+        """
+        Flag that the containers have been changed, this invalidates any data
+        derived from the API structure (eg a cached Swagger spec).
+
+        The revision of this container and of every ancestor is increased;
+        call this after modifying :py:attr:`containers` directly.
+        """
+        container = self
+        while container is not None:
+            if isinstance(container, ApiContainer):
+                container._revision += 1
+            container = getattr(container, 'parent', None)
+
+    @property
+    def revision(self):
+        # type: () -> int
+        """
+        Revision of the API structure (this container and any children); the
+        value only ever increases and is changed by :py:meth:`changed`.
+        """
+        return self._revision
+
     def op_paths(self, path_base=None):
         # type: (Union[str, UrlPath]) -> Generator[Tuple[UrlPath, Operation]]
         """
@@ -261,17 +305,54 @@ class ApiInterfaceBase(ApiContainer):
     Remap certain codecs commonly mistakenly used.
     """
 
+    codec_cache_size = 128
+    """
+    Number of resolved codecs to cache keyed by the *Content-Type* and *Accept*
+    headers. The cache is only used if all type resolvers are `cacheable`;
+    set to 0 to disable.
+    """
+
     def __init__(self, *containers, **options):
         options.setdefault('name', 'api')
         options.setdefault('path_prefix', UrlPath('', options['name']))
         self.debug_enabled = options.pop('debug_enabled', False)
         self.middleware = MiddlewareList(options.pop('middleware', []))
         self.options = options.pop('options', True)
+        self.tracer = options.pop('tracer', None) or Tracer()
         super(ApiInterfaceBase, self).__init__(*containers, **options)
+        # Compiled router and pipelines are discarded if the revision changes
+        self._compiled_revision = self.revision
+        self._router = None  # type: Optional[Router]
+        self._pipelines = {}  # type: Dict[int, Tuple[Operation, Callable[..., HttpResponse]]]
 
         if not self.path_prefix.is_absolute:
             raise ValueError("Path prefix must be an absolute path (eg start with a '/')")
 
+    @property
+    def router(self):
+        # type: () -> Router
+        """
+        Router compiled from the operations defined in this API; the router
+        is recompiled if the API is changed (see :py:meth:`changed`).
+        """
+        self._check_revision()
+        router = self._router
+        if router is None:
+            router = self._router = Router(self.op_paths())
+        return router
+
+    def _check_revision(self):
+        """
+        Discard the compiled router and dispatch pipelines (and the cached
+        middleware methods) if the API has been changed since they were compiled.
+        """
+        revision = self.revision
+        if revision != self._compiled_revision:
+            self._compiled_revision = revision
+            self._router = None
+            self._pipelines.clear()
+            self.middleware.clear_cache()
+
     def handle_500(self, request, exception):
         # type: (BaseHttpRequest, BaseException) -> Resource
         """
@@ -295,84 +376,148 @@ class ApiInterfaceBase(ApiContainer):
         return Error.from_status(HTTPStatus.INTERNAL_SERVER_ERROR, 0,
                                  "An unhandled error has been caught.")
 
+    @staticmethod
+    def operation_error(exception):
+        # type: (Exception) -> Optional[Tuple[Any, Optional[HTTPStatus], Optional[dict]]]
+        """
+        Convert an exception raised by an operation into a response.
+
+        Returns `None` if the exception is not handled.
+        """
+        if isinstance(exception, ImmediateHttpResponse):
+            # An exception used to return a response immediately, skipping any
+            # further processing.
+            return exception.resource, exception.status, exception.headers
+
+        if isinstance(exception, ValidationError):
+            # A validation error was raised by a resource.
+            if hasattr(exception, 'message_dict'):
+                resource = Error.from_status(HTTPStatus.BAD_REQUEST, 0, "Failed validation",
+                                             meta=exception.message_dict)
+            else:
+                resource = Error.from_status(HTTPStatus.BAD_REQUEST, 0, str(exception))
+            return resource, resource.status, None
+
+        if isinstance(exception, NotImplementedError):
+            resource = Error.from_status(HTTPStatus.NOT_IMPLEMENTED, 0, "The method has not been implemented")
+            return resource, resource.status, None
+
     def dispatch_operation(self, operation, request, path_args):
         # type: (Operation, BaseHttpRequest, Dict[str, Any]) -> Tuple[Any, Optional[HTTPStatus], Optional[dict]]
         """
         Dispatch and handle exceptions from operation.
+
+        Called by :py:meth:`_dispatch`; the compiled dispatch pipeline (see
+        :py:meth:`compile_operation`) only calls this method if it (or
+        :py:meth:`_dispatch`) is overridden by a sub-class.
         """
         try:
             # path_args is passed by ref so changes can be made.
             for middleware in self.middleware.pre_dispatch:
                 middleware(request, path_args)
 
-            resource = operation(request, path_args)
+            if request.trace_span is None:
+                resource = operation(request, path_args)
+            else:
+                with child_span(request, 'odinweb.operation', {'operation_id': operation.operation_id}):
+                    resource = operation(request, path_args)
 
             for middleware in self.middleware.post_dispatch:
                 resource = middleware(request, resource)
 
-        except ImmediateHttpResponse as e:
-            # An exception used to return a response immediately, skipping any
-            # further processing.
-            return e.resource, e.status, e.headers
-
-        except ValidationError as e:
-            # A validation error was raised by a resource.
-            if hasattr(e, 'message_dict'):
-                resource = Error.from_status(HTTPStatus.BAD_REQUEST, 0, "Failed validation", meta=e.message_dict)
-            else:
-                resource = Error.from_status(HTTPStatus.BAD_REQUEST, 0, str(e))
-            return resource, resource.status, None
-
-        except NotImplementedError:
-            resource = Error.from_status(HTTPStatus.NOT_IMPLEMENTED, 0, "The method has not been implemented")
-            return resource, resource.status, None
-
         except Exception as e:
-            if self.debug_enabled:
-                # If debug is enabled then fallback to the frameworks default
-                # error processing, this often provides convenience features
-                # to aid in the debugging process.
-                raise
-
-            resource = None
-            # Fallback to the default handler
-            if resource is None:
-                resource = self.handle_500(request, e)
-
-            return resource, resource.status, None
+            return self._handle_operation_error(request, e)
 
         else:
             return resource, None, None
 
-    def _dispatch(self, operation, request, path_args):
+    @lazy_property
+    def codec_cache(self):
+        # type: () -> Optional[LRUCache]
         """
-        Wrapped dispatch method, prepare request and generate a HTTP Response.
+        Cache of resolved codecs (if all type resolvers are cacheable).
         """
-        # Determine the request and response types. Ensure API supports the requested types
-        request_type = resolve_content_type(self.request_type_resolvers, request)
+        resolvers = self.request_type_resolvers + self.response_type_resolvers
+        if self.codec_cache_size and all(getattr(r, 'cacheable', False) for r in resolvers):
+            return LRUCache(self.codec_cache_size)
+
+    @lazy_property
+    def available_content_types(self):
+        # type: () -> Tuple[str]
+        """
+        Content types that can be negotiated, registered codecs are listed
+        first (in order of preference) followed by any remapped types.
+        """
+        registered_codecs = self.registered_codecs
+        return tuple(registered_codecs) + tuple(
+            k for k, v in self.remap_codecs.items() if v in registered_codecs and k not in registered_codecs
+        )
+
+    def _resolve_codecs(self, request):
+        # type: (BaseHttpRequest) -> Union[Tuple[Any, Any], HTTPStatus]
+        """
+        Resolve request and response codecs or an error status.
+        """
+        content_types = self.available_content_types
+
+        request_type = resolve_content_type(self.request_type_resolvers, request, content_types)
         request_type = self.remap_codecs.get(request_type, request_type)
         try:
-            request.request_codec = self.registered_codecs[request_type]
+            request_codec = self.registered_codecs[request_type]
         except KeyError:
-            return HttpResponse.from_status(HTTPStatus.UNPROCESSABLE_ENTITY)
+            return HTTPStatus.UNPROCESSABLE_ENTITY
 
-        response_type = resolve_content_type(self.response_type_resolvers, request)
+        response_type = resolve_content_type(self.response_type_resolvers, request, content_types)
         response_type = self.remap_codecs.get(response_type, response_type)
         try:
-            request.response_codec = self.registered_codecs[response_type]
+            response_codec = self.registered_codecs[response_type]
         except KeyError:
-            return HttpResponse.from_status(HTTPStatus.NOT_ACCEPTABLE)
+            return HTTPStatus.NOT_ACCEPTABLE
 
-        # Check if method is in our allowed method list
-        if request.method not in operation.methods:
-            return HttpResponse.from_status(
-                HTTPStatus.METHOD_NOT_ALLOWED,
-                {'Allow': ','.join(m.value for m in operation.methods)}
-            )
+        return request_codec, response_codec
 
-        # Response types
-        resource, status, headers = self.dispatch_operation(operation, request, path_args)
+    def resolve_codecs(self, request):
+        # type: (BaseHttpRequest) -> Optional[HttpResponse]
+        """
+        Determine the request and response codecs and assign them to the request.
+
+        Returns an error response if the API does not support the requested types.
+        Resolution is skipped for requests with pre-assigned codecs (eg
+        in-memory sub-requests).
+        """
+        if request.codecs_assigned:
+            return
 
+        cache = self.codec_cache
+        if cache is None:
+            result = self._resolve_codecs(request)
+        else:
+            key = (request.content_type, request.accepts)
+            result = cache.get(key)
+            if result is None:
+                result = cache[key] = self._resolve_codecs(request)
+
+        if isinstance(result, HTTPStatus):
+            return HttpResponse.from_status(result)
+        request.request_codec, request.response_codec = result
+
+    @staticmethod
+    def method_not_allowed(operation):
+        # type: (Operation) -> HttpResponse
+        """
+        Generate a method not allowed response for an operation.
+        """
+        return HttpResponse.from_status(
+            HTTPStatus.METHOD_NOT_ALLOWED,
+            {'Allow': ','.join(m.value for m in operation.methods)}
+        )
+
+    @staticmethod
+    def operation_response(request, resource, status, headers):
+        # type: (BaseHttpRequest, Any, Optional[HTTPStatus], Optional[dict]) -> HttpResponse
+        """
+        Generate a response from the result of an operation.
+        """
         if isinstance(status, HTTPStatus):
             status = status.value
 
@@ -383,36 +528,474 @@ class ApiInterfaceBase(ApiContainer):
         # Encode the response
         return create_response(request, resource, status, headers)
 
+    def _dispatch(self, operation, request, path_args):
+        """
+        Wrapped dispatch method, prepare request and generate a HTTP Response.
+
+        The compiled dispatch pipeline (see :py:meth:`compile_operation`) only
+        calls this method if it (or :py:meth:`dispatch_operation`) is
+        overridden by a sub-class, the pre/post request hooks are run by the
+        pipeline.
+        """
+        # Determine the request and response types. Ensure API supports the requested types
+        response = self.resolve_codecs(request)
+        if response is not None:
+            return response
+
+        # Check if method is in our allowed method list
+        if request.method not in operation.methods:
+            return self.method_not_allowed(operation)
+
+        # Response types
+        resource, status, headers = self.dispatch_operation(operation, request, path_args)
+        return self.operation_response(request, resource, status, headers)
+
+    def _overrides(self, name):
+        # type: (str) -> bool
+        """
+        Check if a method of the interface has been overridden by a sub-class.
+        """
+        for klass in type(self).__mro__:
+            if klass is ApiInterfaceBase:
+                break
+            if name in vars(klass):
+                return True
+        return False
+
+    def _handle_operation_error(self, request, exception):
+        # type: (BaseHttpRequest, Exception) -> Tuple[Any, Optional[HTTPStatus], Optional[dict]]
+        """
+        Convert an exception raised while dispatching an operation into a
+        result, falling back to the 500 handler. Must be called while the
+        exception is being handled (it is re-raised if debug is enabled).
+        """
+        result = self.operation_error(exception)
+        if result is not None:
+            return result
+
+        if self.debug_enabled:
+            # If debug is enabled then fallback to the frameworks default
+            # error processing, this often provides convenience features
+            # to aid in the debugging process.
+            raise
+
+        # Fallback to the default handler
+        resource = self.handle_500(request, exception)
+        return resource, resource.status, None
+
+    def compile_operation(self, operation):
+        # type: (Operation) -> Callable[[BaseHttpRequest, Dict[str, Any]], HttpResponse]
+        """
+        Compile a flat dispatch pipeline for an operation.
+
+        The global and operation middleware hooks, allowed methods and codec
+        resolution are all resolved up front so dispatching a request is a
+        short chain of calls. The pipeline is composed of stages:
+
+        - request: pre/post request middleware (see :py:meth:`_compile_request`)
+        - negotiate: codecs and allowed methods (see :py:meth:`_compile_negotiate`)
+        - respond: pre-dispatch middleware, error handling and encoding of the
+          response (see :py:meth:`_compile_respond`)
+        - cache and coalesce: response caching and request coalescing (see
+          :py:mod:`odinweb.cache`)
+        - execute: the operation callback and post-dispatch middleware (see
+          :py:meth:`_compile_execute`)
+
+        If a sub-class overrides :py:meth:`_dispatch` or
+        :py:meth:`dispatch_operation` the overridden method is called in place
+        of the negotiate stage (response caching and request coalescing are
+        then the responsibility of the sub-class).
+
+        If the tracer of the interface is enabled the pipeline is traced with
+        an ``odinweb.dispatch`` span and the operation callback with an
+        ``odinweb.operation`` span (see :py:mod:`odinweb.tracing`).
+
+        If any middleware defines a ``record_timings`` hook the pipeline
+        records a timing mark at the start of the request and at the end of
+        each of the :py:data:`TIMING_PHASES`; the hook is called with the
+        request, the response and the list of marks. Marks of phases that
+        were not reached are 0.
+
+        """
+        if self._overrides('_dispatch') or self._overrides('dispatch_operation'):
+            dispatch = self._compile_dispatch_override(operation)
+        else:
+            stage = self._compile_execute(operation)
+            stage = self._compile_coalesce(operation, stage)
+            stage = self._compile_cache(operation, stage)
+            stage = self._compile_respond(operation, stage)
+            dispatch = self._compile_negotiate(operation, stage)
+
+        pipeline = self._compile_request(operation, dispatch)
+        if self.middleware.record_timings:
+            pipeline = self._compile_timed(pipeline)
+        if self.tracer.enabled:
+            pipeline = self._compile_traced(operation, pipeline)
+        return self._compile_finished(pipeline)
+
+    def _compile_execute(self, operation):
+        """
+        Stage that executes the operation callback and post-dispatch hooks;
+        returns the resource.
+        """
+        execute = operation.execute
+        post_dispatch = operation.middleware.post_dispatch + self.middleware.post_dispatch
+        timer = _compat.perf_counter
+
+        if self.tracer.enabled:
+            execute_callback = execute
+            attributes = {'operation_id': operation.operation_id}
+
+            def execute(request, **path_args):
+                with child_span(request, 'odinweb.operation', attributes):
+                    return execute_callback(request, **path_args)
+
+        def execute_stage(request, path_args, marks):
+            resource = execute(request, **path_args)
+            if marks:
+                marks[4] = timer()
+
+            for middleware in post_dispatch:
+                resource = middleware(request, resource)
+            if marks:
+                marks[5] = timer()
+
+            return resource
+
+        return execute_stage
+
+    def _compile_coalesce(self, operation, stage):
+        """
+        Stage that coalesces identical requests (if enabled for the operation),
+        followers receive a copy of the (encoded) response of the leader.
+        """
+        coalesce = operation.coalesce
+        if not coalesce:
+            return stage
+
+        operation_response = self.operation_response
+        timer = _compat.perf_counter
+
+        def execute_response(request, path_args):
+            return operation_response(request, stage(request, path_args, None), None, None)
+
+        def coalesce_stage(request, path_args, marks):
+            flight_key = coalesce.key(operation, request, path_args)
+            if not flight_key:
+                return stage(request, path_args, marks)
+
+            response = coalesce.do(flight_key, execute_response, request, path_args)
+            if marks:
+                # Coalesced responses are timed as the callback
+                marks[4] = timer()
+            return response
+
+        return coalesce_stage
+
+    def _compile_cache(self, operation, stage):
+        """
+        Stage that serves cached responses (if enabled for the operation);
+        responses are encoded before they are cached.
+        """
+        cache = operation.cache
+        if not cache:
+            return stage
+
+        operation_response = self.operation_response
+        timer = _compat.perf_counter
+
+        def cache_stage(request, path_args, marks):
+            cache_key = cache.key(operation, request, path_args)
+            if not cache_key:
+                return stage(request, path_args, marks)
+
+            response = cache.get(cache_key)
+            if response is not None:
+                if marks:
+                    # Cached responses are timed as the callback
+                    marks[4] = timer()
+                return response
+
+            response = operation_response(request, stage(request, path_args, marks), None, None)
+            cache.set(cache_key, response)
+            return response
+
+        return cache_stage
+
+    def _compile_respond(self, operation, stage):
+        """
+        Stage that runs pre-dispatch hooks, converts errors into responses
+        and encodes the response.
+        """
+        pre_dispatch = self.middleware.pre_dispatch + operation.middleware.pre_dispatch
+        handle_operation_error = self._handle_operation_error
+        operation_response = self.operation_response
+        timer = _compat.perf_counter
+
+        def respond_stage(request, path_args, marks):
+            try:
+                # path_args is passed by ref so changes can be made.
+                for middleware in pre_dispatch:
+                    middleware(request, path_args)
+                if marks:
+                    marks[3] = timer()
+
+                resource = stage(request, path_args, marks)
+
+            except Exception as e:
+                if marks:
+                    # Time up to the error is recorded against the phase it occurred in
+                    for idx in (3, 4, 5):
+                        if not marks[idx]:
+                            marks[idx] = timer()
+                            break
+                response = operation_response(request, *handle_operation_error(request, e))
+
+            else:
+                response = operation_response(request, resource, None, None)
+
+            if marks:
+                marks[6] = timer()
+            return response
+
+        return respond_stage
+
+    def _compile_negotiate(self, operation, stage):
+        """
+        Stage that resolves the request/response codecs and checks the
+        request method is allowed.
+        """
+        methods = frozenset(operation.methods)
+        allow = ','.join(m.value for m in operation.methods)
+        resolve_codecs = self.resolve_codecs
+        timer = _compat.perf_counter
+
+        def negotiate_stage(request, path_args, marks):
+            # Determine the request and response types. Ensure API supports the requested types
+            response = resolve_codecs(request)
+            if marks:
+                marks[2] = timer()
+            if response is not None:
+                return response
+
+            # Check if method is in our allowed method list
+            if request.method not in methods:
+                return HttpResponse.from_status(HTTPStatus.METHOD_NOT_ALLOWED, {'Allow': allow})
+
+            return stage(request, path_args, marks)
+
+        return negotiate_stage
+
+    def _compile_dispatch_override(self, operation):
+        """
+        Stage that calls an overridden :py:meth:`_dispatch` (that in turn
+        calls :py:meth:`dispatch_operation`); timed as a whole.
+        """
+        dispatch = self._dispatch
+        timer = _compat.perf_counter
+
+        def dispatch_stage(request, path_args, marks):
+            response = dispatch(operation, request, path_args)
+            if marks:
+                marks[6] = timer()
+            return response
+
+        return dispatch_stage
+
+    def _compile_request(self, operation, stage):
+        """
+        Stage that runs the pre/post request hooks and handles any error not
+        handled by other stages.
+        """
+        pre_request = self.middleware.pre_request
+        post_request = self.middleware.post_request
+        handle_500 = self.handle_500
+        debug_enabled = self.debug_enabled
+        timer = _compat.perf_counter
+
+        def pipeline(request, path_args, marks=None):
+            # Add current operation to the request (for convenience in middleware methods)
+            request.current_operation = operation
+
+            try:
+                for middleware in pre_request:
+                    response = middleware(request, path_args)
+                    # Return HttpResponse if one is returned.
+                    if isinstance(response, HttpResponse):
+                        if marks:
+                            marks[1] = timer()
+                        return response
+                if marks:
+                    marks[1] = timer()
+
+                response = stage(request, path_args, marks)
+
+                for middleware in post_request:
+                    response = middleware(request, response)
+                if marks:
+                    marks[7] = timer()
+
+            except Exception as ex:
+                if debug_enabled:
+                    # If debug is enabled then fallback to the frameworks default
+                    # error processing, this often provides convenience features
+                    # to aid in the debugging process.
+                    raise
+                handle_500(request, ex)
+                return HttpResponse("Error processing response.", HTTPStatus.INTERNAL_SERVER_ERROR)
+
+            else:
+                return response
+
+        return pipeline
+
+    def _compile_timed(self, pipeline):
+        """
+        Record timing marks of a pipeline and call the ``record_timings`` hooks.
+        """
+        record_timings = self._record_timings
+        timer = _compat.perf_counter
+
+        def timed_pipeline(request, path_args):
+            marks = [timer(), 0, 0, 0, 0, 0, 0, 0]
+            response = pipeline(request, path_args, marks)
+            record_timings(request, response, marks)
+            return response
+
+        return timed_pipeline
+
+    def _record_timings(self, request, response, marks):
+        # type: (BaseHttpRequest, HttpResponse, list) -> None
+        """
+        Call the ``record_timings`` hooks with the timing marks of a request.
+        """
+        for middleware in self.middleware.record_timings:
+            # Timings are informational, a failure must not fail the request
+            try:
+                middleware(request, response, marks)
+            except Exception:  # noqa - Isolate errors of each hook
+                logger.exception('Error recording timings of %s', request.current_operation)
+
+    def _compile_traced(self, operation, pipeline):
+        """
+        Trace a pipeline with an ``odinweb.dispatch`` span.
+        """
+        tracer = self.tracer
+        operation_id = operation.operation_id
+
+        def traced_pipeline(request, path_args):
+            span = tracer.start_span('odinweb.dispatch', tracer.extract(request.headers), {
+                'operation_id': operation_id,
+                'http.method': request.method.value,
+            })
+            with span:
+                request.trace_span = span
+                response = pipeline(request, path_args)
+                span.set_attribute('http.status_code', response.status)
+                span.set_attribute('body_size', body_size(response.body))
+            return response
+
+        return traced_pipeline
+
+    def _compile_finished(self, pipeline):
+        """
+        Call the ``request_finished`` hooks once a pipeline has completed.
+
+        Streaming response bodies are generated after the pipeline has
+        returned; errors generating the body are passed to :py:meth:`handle_500`
+        and the request is finished once the body is exhausted or closed.
+        """
+        request_finished = self.middleware.request_finished
+        handle_500 = self.handle_500
+
+        def finish(request):
+            for middleware in request_finished:
+                middleware(request)
+
+        def finished_pipeline(request, path_args):
+            try:
+                response = pipeline(request, path_args)
+            except BaseException:
+                finish(request)
+                raise
+
+            if response.streaming:
+                response.body = StreamingBody(
+                    response.body, functools.partial(handle_500, request), functools.partial(finish, request)
+                )
+            else:
+                finish(request)
+            return response
+
+        return finished_pipeline
+
+    def compile(self):
+        """
+        Compile dispatch pipelines for all operations.
+
+        This is called automatically (per operation) on first dispatch, calling
+        during application start up removes this cost from initial requests.
+        Pipelines are recompiled if the API is changed (eg containers or
+        middleware are added, see :py:meth:`changed`).
+        """
+        for _, operation in self.op_paths():
+            self.get_pipeline(operation)
+
+    def get_pipeline(self, operation):
+        # type: (Operation) -> Callable[[BaseHttpRequest, Dict[str, Any]], HttpResponse]
+        """
+        Get the compiled dispatch pipeline for an operation.
+        """
+        self._check_revision()
+
+        # Operations are not hashable (they compare by path and methods) so
+        # pipelines are stored with the operation they were compiled for and
+        # only used for that same operation object.
+        entry = self._pipelines.get(id(operation))
+        if entry is not None and entry[0] is operation:
+            return entry[1]
+
+        pipeline = self.compile_operation(operation)
+        self._pipelines[id(operation)] = operation, pipeline
+        return pipeline
+
     def dispatch(self, operation, request, **path_args):
         """
         Dispatch incoming request and capture top level exceptions.
         """
-        # Add current operation to the request (for convenience in middleware methods)
-        request.current_operation = operation
+        return self.get_pipeline(operation)(request, path_args)
+
+    @lazy_property
+    def route_error_operation(self):
+        # type: () -> Operation
+        """
+        Operation used to dispatch requests that could not be routed.
+        """
+        operation = Operation(_route_error, methods=tuple(Method))
+        operation.operation_id = 'odinweb.route_error'
+        return operation
+
+    def route_error(self, request, error):
+        # type: (BaseHttpRequest, ImmediateHttpResponse) -> Optional[Tuple[Operation, Dict[str, Any]]]
+        """
+        Resolve the operation and path arguments used to dispatch a request
+        the router raised an error for; the error response is generated by
+        the same middleware and error handling as any other operation.
 
+        If :py:attr:`options` is enabled an *OPTIONS* request to a path
+        without an *OPTIONS* operation is answered with the allowed methods.
+        Returns `None` if the request method is unknown.
+        """
         try:
-            for middleware in self.middleware.pre_request:
-                response = middleware(request, path_args)
-                # Return HttpResponse if one is returned.
-                if isinstance(response, HttpResponse):
-                    return response
-
-            response = self._dispatch(operation, request, path_args)
-
-            for middleware in self.middleware.post_request:
-                response = middleware(request, response)
-
-        except Exception as ex:
-            if self.debug_enabled:
-                # If debug is enabled then fallback to the frameworks default
-                # error processing, this often provides convenience features
-                # to aid in the debugging process.
-                raise
-            self.handle_500(request, ex)
-            return HttpResponse("Error processing response.", HTTPStatus.INTERNAL_SERVER_ERROR)
+            method = request.method
+        except ValueError:
+            return
 
-        else:
-            return response
+        if self.options and method is Method.OPTIONS and error.status == HTTPStatus.METHOD_NOT_ALLOWED:
+            allow = '{},{}'.format(error.headers['Allow'], Method.OPTIONS.value)
+            error = ImmediateHttpResponse(None, HTTPStatus.NO_CONTENT, {'Allow': allow})
+
+        return self.route_error_operation, {'error': error}
 
     def op_paths(self, path_base=None, collate_methods=False):
         # type: (Union[str, UrlPath], bool) -> Union[Generator[Tuple[UrlPath, Operation]], Dict[UrlPath, Operation]]
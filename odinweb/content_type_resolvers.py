@@ -7,6 +7,10 @@ Collection of methods for resolving the content type of a request.
 
 These methods are designed to work with either Flask or Bottle.
 
+Resolvers that only make use of the *Content-Type* and *Accept* headers of a
+request are marked as `cacheable`, if all resolvers used by an API are
+cacheable the resolved codecs are cached against these header values.
+
 """
 
 
@@ -16,6 +20,7 @@ def accepts_header():
     """
     def resolver(request):
         return request.accepts
+    resolver.cacheable = True
     return resolver
 
 
@@ -25,6 +30,7 @@ def content_type_header():
     """
     def resolver(request):
         return request.content_type
+    resolver.cacheable = True
     return resolver
 
 
@@ -37,5 +43,6 @@ def specific_default(content_type):
     """
     def resolver(_):
         return content_type
+    resolver.cacheable = True
     return resolver
 
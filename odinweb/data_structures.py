@@ -1,7 +1,10 @@
 from __future__ import absolute_import
 
 import abc
+import collections
+import io
 import re
+import threading
 
 from odin.compatibility import deprecated
 from odin.utils import getmeta, lazy_property, force_tuple
@@ -11,7 +14,7 @@ from .constants import HTTPStatus, In, Type
 from .utils import dict_filter, sort_by_priority
 
 # Imports for typing support
-from typing import Dict, Union, Optional, Callable, Any, AnyStr, List, Tuple, Hashable, Iterator, NamedTuple  # noqa
+from typing import Dict, Union, Optional, Callable, Any, AnyStr, IO, List, Tuple, Hashable, Iterable, Iterator, NamedTuple  # noqa
 from odin import Resource  # noqa
 from .constants import Method
 
@@ -34,6 +37,13 @@ class BaseHttpRequest(_compat.with_metaclass(abc.ABCMeta, object)):
     current_operation = None
     request_codec = None
     response_codec = None
+    codecs_assigned = False
+    validators = None  # type: Dict[str, str]
+    rate_limit_headers = None  # type: Dict[str, str]
+    concurrency_limits = None  # type: list
+    parent = None  # type: BaseHttpRequest
+    trace_span = None  # type: odinweb.tracing.Span
+    profiler = None  # type: odinweb.profiling.StackSampler
 
     @property
     @abc.abstractmethod
@@ -118,6 +128,20 @@ class BaseHttpRequest(_compat.with_metaclass(abc.ABCMeta, object)):
         HTTP Request body
         """
 
+    @property
+    def stream(self):
+        # type: () -> IO[bytes]
+        """
+        HTTP Request body as a file-like object.
+
+        Interfaces should override this to read directly from the underlying
+        connection; the stream can only be consumed once.
+        """
+        body = self.body
+        if isinstance(body, _compat.text_type):
+            body = body.encode('UTF-8')
+        return io.BytesIO(body or b'')
+
     @property
     @abc.abstractmethod
     def form(self):
@@ -130,9 +154,10 @@ class BaseHttpRequest(_compat.with_metaclass(abc.ABCMeta, object)):
     def accepts(self):
         # type: () -> str
         """
-        Accepts request header
+        Accept request header (falls back to the legacy ``Accepts`` header)
         """
-        return self.headers.get('ACCEPTS')
+        headers = self.headers
+        return headers.get('ACCEPT') or headers.get('ACCEPTS')
 
     @property
     def content_type(self):
@@ -169,6 +194,11 @@ class HttpResponse(object):
     """
     __slots__ = ('status', 'body', 'headers')
 
+    streaming = False
+    """
+    Body is an iterable of chunks.
+    """
+
     @classmethod
     def from_status(cls, http_status, headers=None):
         # type: (HTTPStatus, Dict[str]) -> HttpResponse
@@ -198,6 +228,75 @@ class HttpResponse(object):
         self.headers['Content-Type'] = value
 
 
+class StreamingHttpResponse(HttpResponse):
+    """
+    HTTP response where the body is an iterable (or generator) of encoded
+    chunks that are written to the client as they are produced.
+    """
+    __slots__ = ()
+
+    streaming = True
+
+    def __init__(self, body, status=HTTPStatus.OK, headers=None):
+        # type: (Iterable[AnyStr], HTTPStatus, Dict[str, AnyStr]) -> None
+        super(StreamingHttpResponse, self).__init__(iter(body), status, headers)
+
+
+class StreamingBody(object):
+    """
+    Iterator over the chunks of a streaming response body.
+
+    Streaming bodies are generated after the request has been dispatched;
+    `on_error` is called with any exception raised while generating a chunk
+    (the exception is then re-raised so the server aborts the response) and
+    `on_close` is called once the body is exhausted or closed.
+
+    WSGI servers call :py:meth:`close` once a response has been sent (or if
+    sending fails).
+    """
+    __slots__ = ('chunks', 'on_error', 'on_close', 'closed')
+
+    def __init__(self, chunks, on_error=None, on_close=None):
+        # type: (Iterable[AnyStr], Callable[[Exception], Any], Callable[[], Any]) -> None
+        self.chunks = iter(chunks)
+        self.on_error = on_error
+        self.on_close = on_close
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # type: () -> AnyStr
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            self.close()
+            raise
+        except Exception as ex:
+            try:
+                if self.on_error is not None:
+                    self.on_error(ex)
+            finally:
+                self.close()
+            raise
+
+    next = __next__  # Python 2
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+
+        try:
+            close = getattr(self.chunks, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+
 PathParam = NamedTuple('PathParam', [('name', str), ('type', Type), ('type_args', Optional[str])])
 PathParam.__new__.__defaults__ = (None, Type.Integer, None)
 
@@ -615,17 +714,53 @@ class MiddlewareList(list):
         middleware = sort_by_priority(self, reverse=True)
         return tuple(m.post_request for m in middleware if hasattr(m, 'post_request'))
 
+    @lazy_property
+    def record_timings(self):
+        """
+        List of record-timings methods from registered middleware.
+
+        These are called with the request, response and timing marks of each
+        request (see :py:meth:`odinweb.containers.ApiInterfaceBase.compile_operation`).
+
+        """
+        middleware = sort_by_priority(self, reverse=True)
+        return tuple(m.record_timings for m in middleware if hasattr(m, 'record_timings'))
+
+    @lazy_property
+    def request_finished(self):
+        """
+        List of request-finished methods from registered middleware.
+
+        These are always called once a request has been dispatched (even if a
+        pre-request hook returned a response or an error occurred) and are
+        used to release any resources acquired by middleware.
+
+        """
+        middleware = sort_by_priority(self, reverse=True)
+        return tuple(m.request_finished for m in middleware if hasattr(m, 'request_finished'))
+
     @lazy_property
     def post_swagger(self):
         """
         List of post-swagger methods from registered middleware.
 
-        This is used to modify documentation (eg add/remove any extra information, provided by the middleware)
+        This is used to modify documentation (eg add/remove any extra information, provided by the middleware).
+        Hooks are called with the operation and the (swagger) definition of the operation.
 
         """
         middleware = sort_by_priority(self)
         return tuple(m.post_swagger for m in middleware if hasattr(m, 'post_swagger'))
 
+    def clear_cache(self):
+        """
+        Clear the cached lists of middleware methods, call after adding or
+        removing middleware.
+        """
+        for klass in type(self).__mro__:
+            for name, value in vars(klass).items():
+                if isinstance(value, lazy_property):
+                    self.__dict__.pop(name, None)
+
 
 class MultiValueDictKeyError(KeyError):
     pass
@@ -746,10 +881,10 @@ class MultiValueDict(dict):
         Return the last data value for the passed key. If key doesn't exist
         or value is an empty list, return `default`.
         """
-        try:
-            rv = self[key]
-        except KeyError:
+        values = dict.get(self, key)
+        if not values:
             return default
+        rv = values[-1]
         if type_ is not None:
             try:
                 rv = type_(rv)
@@ -972,3 +1107,71 @@ class MultiValueDict(dict):
         an empty list is returned.
         """
         return dict.pop(self, key, [])
+
+
+class LRUCache(object):
+    """
+    Thread safe least recently used cache of a fixed size.
+
+    >>> cache = LRUCache(2)
+    >>> cache['a'] = 1
+    >>> cache['b'] = 2
+    >>> cache.get('a')
+    1
+    >>> cache['c'] = 3
+    >>> cache.get('b') is None
+    True
+
+    """
+    def __init__(self, max_size=128):
+        # type: (int) -> None
+        if max_size < 1:
+            raise ValueError("Max size must be at least 1.")
+        self.max_size = max_size
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        # type: (Hashable) -> bool
+        return key in self._data
+
+    def __setitem__(self, key, value):
+        # type: (Hashable, Any) -> None
+        data = self._data
+        with self._lock:
+            data.pop(key, None)
+            data[key] = value
+            if len(data) > self.max_size:
+                data.popitem(last=False)
+
+    def get(self, key, default=None):
+        # type: (Hashable, Any) -> Any
+        """
+        Return the value for key if key is in the cache, else default.
+        """
+        data = self._data
+        with self._lock:
+            try:
+                value = data.pop(key)
+            except KeyError:
+                return default
+            data[key] = value
+            return value
+
+    def pop(self, key, default=None):
+        # type: (Hashable, Any) -> Any
+        """
+        Remove a key from the cache and return the value, else default.
+        """
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        """
+        Remove all items from the cache.
+        """
+        with self._lock:
+            self._data.clear()
@@ -12,10 +12,12 @@ import odin
 from odin.exceptions import ValidationError
 from odin.utils import force_tuple, lazy_property, getmeta
 
+from . import _compat
 from .constants import HTTPStatus, Method, Type
 from .data_structures import NoPath, UrlPath, PathParam, Param, Response, DefaultResponse, MiddlewareList
-from .helpers import get_resource, create_response
-from .resources import Listing, Error
+from .exceptions import HttpError
+from .helpers import get_resource, iter_resources, create_response
+from .resources import Listing, Error, ItemStatus, MultiStatus
 from .utils import to_bool, dict_filter
 
 # Imports for typing support
@@ -103,6 +105,17 @@ class Operation(object):
         # Security object
         self.security = None
 
+        # Response cache and request coalescing (see odinweb.cache)
+        self.cache = None
+        self.coalesce = None
+
+        # Rate and concurrency limits (see odinweb.middleware)
+        self.rate_limit = None
+        self.concurrency_limit = None
+
+        # Profiling threshold (see odinweb.profiling)
+        self.profile_threshold = None
+
         # Documentation
         self.deprecated = False
         self.summary = summary
@@ -113,7 +126,8 @@ class Operation(object):
         self._tags = set(force_tuple(tags))
 
         # Copy values from callback (if defined)
-        for attr in ('deprecated', 'consumes', 'produces', 'responses', 'parameters', 'security'):
+        for attr in ('deprecated', 'consumes', 'produces', 'responses', 'parameters', 'security', 'cache',
+                     'coalesce', 'rate_limit', 'concurrency_limit', 'profile_threshold'):
             value = getattr(callback, attr, None)
             if value is not None:
                 setattr(self, attr, value)
@@ -327,11 +341,17 @@ class WrappedListOperation(Operation):
     Maximum limit.
     """
 
+    stream = False
+    """
+    Stream the response, results are encoded incrementally.
+    """
+
     def __init__(self, *args, **kwargs):
         self.listing_resource = kwargs.pop('listing_resource', self.listing_resource)
         self.default_offset = kwargs.pop('default_offset', self.default_offset)
         self.default_limit = kwargs.pop('default_limit', self.default_limit)
         self.max_limit = kwargs.pop('max_limit', self.max_limit)
+        self.stream = kwargs.pop('stream', self.stream)
 
         super(WrappedListOperation, self).__init__(*args, **kwargs)
 
@@ -360,15 +380,23 @@ class WrappedListOperation(Operation):
 
         bare = to_bool(request.query.get('bare', False))
 
+        def wrap_result(result):
+            if result is not None:
+                if isinstance(result, tuple) and len(result) == 2:
+                    result, total_count = result
+                else:
+                    total_count = None
+
+                result = result if bare else Listing(result, limit, offset, total_count)
+                if self.stream:
+                    return create_response(request, result, stream=True)
+                return result
+
         # Run base execute
         result = super(WrappedListOperation, self).execute(request, *args, **path_args)
-        if result is not None:
-            if isinstance(result, tuple) and len(result) == 2:
-                result, total_count = result
-            else:
-                total_count = None
-
-            return result if bare else Listing(result, limit, offset, total_count)
+        if _compat.isawaitable(result):
+            return _compat.then(result, wrap_result)
+        return wrap_result(result)
 
 
 class ListOperation(Operation):
@@ -401,10 +429,16 @@ class ListOperation(Operation):
     Maximum limit.
     """
 
+    stream = False
+    """
+    Stream the response, results are encoded incrementally.
+    """
+
     def __init__(self, *args, **kwargs):
         self.default_offset = kwargs.pop('default_offset', self.default_offset)
         self.default_limit = kwargs.pop('default_limit', self.default_limit)
         self.max_limit = kwargs.pop('max_limit', self.max_limit)
+        self.stream = kwargs.pop('stream', self.stream)
 
         super(ListOperation, self).__init__(*args, **kwargs)
 
@@ -444,15 +478,20 @@ class ListOperation(Operation):
         if errors:
             raise ValidationError(errors)
 
+        def wrap_result(result):
+            if result is not None:
+                if isinstance(result, tuple) and len(result) == 2:
+                    result, total_count = result
+                    if total_count is not None:
+                        headers['X-Total-Count'] = str(total_count)
+
+                return create_response(request, result, headers=headers, stream=self.stream)
+
         # Run base execute
         result = super(ListOperation, self).execute(request, *args, **path_args)
-        if result is not None:
-            if isinstance(result, tuple) and len(result) == 2:
-                result, total_count = result
-                if total_count is not None:
-                    headers['X-Total-Count'] = str(total_count)
-
-            return create_response(request, result, headers=headers)
+        if _compat.isawaitable(result):
+            return _compat.then(result, wrap_result)
+        return wrap_result(result)
 
 
 class ResourceOperation(Operation):
@@ -482,19 +521,133 @@ class ResourceOperation(Operation):
         return super(ResourceOperation, self).execute(request, item, *args, **path_args)
 
 
+class BulkResourceOperation(Operation):
+    """
+    Handle processing a request with a list of resources in the body.
+
+    Each resource is validated individually. If the operation is *atomic* any
+    validation errors (keyed by the index of the item) fail the entire
+    request, otherwise valid resources are passed to the callback and a
+    multi-status response reports the status of each item.
+
+    In non-atomic mode the callback can return a result for each resource
+    passed to it; either a status to report per-item failures (eg conflicts),
+    a resource to include in the item status (an :py:class:`Error` resource
+    also supplies the status) or `None` for the default status.
+
+    It is assumed decorator will operate on a class method.
+    """
+    def __init__(self, *args, **kwargs):
+        self.full_clean = kwargs.pop('full_clean', True)
+        self.default_to_not_supplied = kwargs.pop('default_to_not_supplied', False)
+        self.clear_key_field = kwargs.pop('clear_key_field', True)
+        self.atomic = kwargs.pop('atomic', True)
+        self.max_items = kwargs.pop('max_items', None)
+        self.item_status = kwargs.pop('item_status', HTTPStatus.OK)
+
+        super(BulkResourceOperation, self).__init__(*args, **kwargs)
+
+        # Apply documentation
+        self.parameters.add(Param.body('Expected list of resources supplied with request.'))
+
+    def clean_items(self, request):
+        # type: (BaseHttpRequest) -> Tuple[List[Tuple[int, Resource]], Dict[int, Any]]
+        """
+        Decode and validate each resource, returning the valid ``(index, item)``
+        pairs and a dict of errors keyed by index.
+        """
+        errors = {}
+        items = iter_resources(request, self.resource, full_clean=False,
+                               default_to_not_supplied=self.default_to_not_supplied, errors=errors)
+
+        valid = []
+        for idx, item in enumerate(items):
+            if self.max_items and idx >= self.max_items:
+                raise HttpError(HTTPStatus.BAD_REQUEST, 95,
+                                "Too many resources, a maximum of {} is supported.".format(self.max_items))
+
+            # Item could not be built, errors have been recorded
+            if item is None:
+                continue
+
+            if self.full_clean:
+                try:
+                    item.full_clean()
+                except ValidationError as ve:
+                    errors[idx] = ve.error_messages
+                    continue
+
+            # Don't allow key_field to be edited
+            if self.clear_key_field and hasattr(item, self.key_field_name):
+                setattr(item, self.key_field_name, None)
+
+            valid.append((idx, item))
+
+        return valid, errors
+
+    def item_status_result(self, index, result):
+        # type: (int, Any) -> ItemStatus
+        """
+        Convert the callback result of an individual item into an item status.
+        """
+        if result is None:
+            return ItemStatus(index, int(self.item_status), None)
+        if isinstance(result, int):
+            return ItemStatus(index, int(result), None)
+        if isinstance(result, Error):
+            return ItemStatus(index, int(result.status), None, result)
+        if isinstance(result, odin.Resource):
+            return ItemStatus(index, int(self.item_status), None, result)
+        raise TypeError("Unsupported bulk operation result for item {}: {!r}".format(index, result))
+
+    def execute(self, request, *args, **path_args):
+        # type: (BaseHttpRequest, *Any, **Any) -> Any
+        valid = []
+        errors = {}
+        if self.resource:
+            valid, errors = self.clean_items(request)
+            if errors and self.atomic:
+                raise ValidationError(errors)
+
+        def wrap_result(item_results):
+            item_results = list(item_results or ())
+            item_results += [None] * (len(valid) - len(item_results))
+
+            results = [self.item_status_result(idx, result) for (idx, _), result in zip(valid, item_results)]
+            results += [ItemStatus(idx, HTTPStatus.BAD_REQUEST.value, messages) for idx, messages in errors.items()]
+            results.sort(key=lambda r: r.index)
+
+            return create_response(request, MultiStatus(results), status=HTTPStatus.MULTI_STATUS)
+
+        # Every item failed validation, there is nothing to pass to the callback
+        if errors and not valid:
+            return wrap_result(None)
+
+        result = super(BulkResourceOperation, self).execute(request, [item for _, item in valid], *args, **path_args)
+        if self.atomic:
+            return result
+
+        if _compat.isawaitable(result):
+            return _compat.then(result, wrap_result)
+        return wrap_result(result)
+
+
 # Shortcut methods
 
 def listing(callback=None, path=None, method=Method.GET, resource=None, tags=None, summary="List resources",
-            middleware=None, default_limit=50, max_limit=None, use_wrapper=True):
-    # type: (Callable, Path, Methods, Resource, Tags, str, List[Any], int, int) -> Operation
+            middleware=None, default_limit=50, max_limit=None, use_wrapper=True, stream=False):
+    # type: (Callable, Path, Methods, Resource, Tags, str, List[Any], int, int, bool, bool) -> Operation
     """
     Decorator to configure an operation that returns a list of resources.
+
+    If `stream` is enabled results are encoded incrementally into a streaming
+    response, the callback may also return a generator of resources.
     """
     op_type = WrappedListOperation if use_wrapper else ListOperation
 
     def inner(c):
         op = op_type(c, path or NoPath, method, resource, tags, summary, middleware,
-                     default_limit=default_limit, max_limit=max_limit)
+                     default_limit=default_limit, max_limit=max_limit, stream=stream)
         op.responses.add(Response(HTTPStatus.OK, "Listing of resources", Listing))
         return op
     return inner(callback) if callback else inner
@@ -514,6 +667,25 @@ def create(callback=None, path=None, method=Method.POST, resource=None, tags=Non
     return inner(callback) if callback else inner
 
 
+def bulk_create(callback=None, path='bulk', method=Method.POST, resource=None, tags=None,
+                summary="Create multiple resources", middleware=None, atomic=True, max_items=None):
+    # type: (Callable, Path, Methods, Resource, Tags, str, List[Any], bool, int) -> Operation
+    """
+    Decorator to configure an operation that creates multiple resources.
+
+    The callback is supplied a list of the resources to create; if `atomic`
+    is disabled a multi-status response is returned.
+    """
+    def inner(c):
+        op = BulkResourceOperation(c, path, method, resource, tags, summary, middleware,
+                                   atomic=atomic, max_items=max_items, item_status=HTTPStatus.CREATED)
+        op.responses.add(Response(HTTPStatus.CREATED, "{name}(s) have been created"))
+        op.responses.add(Response(HTTPStatus.MULTI_STATUS, "Status of each {name}.", MultiStatus))
+        op.responses.add(Response(HTTPStatus.BAD_REQUEST, "Validation failed.", Error))
+        return op
+    return inner(callback) if callback else inner
+
+
 def detail(callback=None, path=None, method=Method.GET, resource=None, tags=None, summary="Get specified resource.",
            middleware=None):
     # type: (Callable, Path, Methods, Resource, Tags, str, List[Any]) -> Operation
@@ -543,6 +715,27 @@ def update(callback=None, path=None, method=Method.PUT, resource=None, tags=None
     return inner(callback) if callback else inner
 
 
+def bulk_update(callback=None, path='bulk', method=Method.PUT, resource=None, tags=None,
+                summary="Update multiple resources", middleware=None, atomic=True, max_items=None):
+    # type: (Callable, Path, Methods, Resource, Tags, str, List[Any], bool, int) -> Operation
+    """
+    Decorator to configure an operation that updates multiple resources.
+
+    The callback is supplied a list of the resources to update (key fields
+    are retained to identify each resource); if `atomic` is disabled a
+    multi-status response is returned.
+    """
+    def inner(c):
+        op = BulkResourceOperation(c, path, method, resource, tags, summary, middleware,
+                                   atomic=atomic, max_items=max_items, clear_key_field=False,
+                                   item_status=HTTPStatus.NO_CONTENT)
+        op.responses.add(Response(HTTPStatus.NO_CONTENT, "{name}(s) have been updated."))
+        op.responses.add(Response(HTTPStatus.MULTI_STATUS, "Status of each {name}.", MultiStatus))
+        op.responses.add(Response(HTTPStatus.BAD_REQUEST, "Validation failed.", Error))
+        return op
+    return inner(callback) if callback else inner
+
+
 def patch(callback=None, path=None, method=Method.PATCH, resource=None, tags=None, summary="Patch specified resource.",
           middleware=None):
     # type: (Callable, Path, Methods, Resource, Tags, str, List[Any]) -> Operation
@@ -1,11 +1,26 @@
-from odin.exceptions import CodecDecodeError, ResourceException
+import codecs
+import hashlib
+import inspect
+import json
+import re
+
+from odin.codecs import json_codec
+from odin.exceptions import CodecDecodeError, ResourceException, ValidationError
+from odin.resources import build_object_graph
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 from .constants import HTTPStatus
-from .data_structures import HttpResponse
+from .data_structures import HttpResponse, StreamingHttpResponse, LRUCache
 from .exceptions import HttpError
+from .resources import Listing
+from .tracing import body_size, child_span
 
 # Type imports
-from typing import Iterable, Callable, Any, Optional  # noqa
+from typing import Iterable, Iterator, Callable, Any, AnyStr, IO, Optional, Sequence, Tuple  # noqa
 from .data_structures import BaseHttpRequest  # noqa
 
 
@@ -24,24 +39,518 @@ def parse_content_type(value):
     return value.split(';')[0].strip()
 
 
-def resolve_content_type(type_resolvers, request):
-    # type: (Iterable[Callable[[Any], str]], Any) -> Optional[str]
+_accept_cache = LRUCache(256)
+
+
+def parse_accept_header(value):
+    # type: (str) -> Tuple[Tuple[str, float], ...]
+    """
+    Parse an `RFC 7231 <https://tools.ietf.org/html/rfc7231#section-5.3.2>`_
+    Accept header into ``(media_range, quality)`` pairs ordered by preference.
+
+    Preference is determined by quality, then specificity of the media range
+    and finally the order supplied by the client. Results are cached by the
+    header value.
+
+    >>> parse_accept_header('application/json;q=0.5, application/msgpack')
+    (('application/msgpack', 1.0), ('application/json', 0.5))
+
+    """
+    result = _accept_cache.get(value)
+    if result is not None:
+        return result
+
+    media_ranges = []
+    for idx, item in enumerate(value.split(',')):
+        params = item.split(';')
+        media_range = params[0].strip().lower()
+        if not media_range:
+            continue
+        if media_range == '*':
+            media_range = '*/*'
+
+        quality = 1.0
+        for param in params[1:]:
+            key, _, param_value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = min(max(float(param_value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+                break
+
+        specificity = 0 if media_range == '*/*' else 1 if media_range.endswith('/*') else 2
+        media_ranges.append((-quality, -specificity, idx, media_range))
+
+    result = _accept_cache[value] = tuple((m, -q) for q, _, _, m in sorted(media_ranges))
+    return result
+
+
+def _media_range_matches(media_range, content_type):
+    # type: (str, str) -> bool
+    if media_range == '*/*' or media_range == content_type:
+        return True
+    if media_range.endswith('/*'):
+        return content_type.startswith(media_range[:-1])
+    return False
+
+
+def negotiate_content_type(value, content_types):
+    # type: (str, Sequence[str]) -> Optional[str]
+    """
+    Select the content type preferred by an Accept (or Content-Type) header
+    from a sequence of available content types.
+
+    Quality for each available type is taken from the most specific matching
+    media range; a quality of 0 means *not acceptable*. Ties are resolved using
+    the order supplied by the client and then the order of `content_types`.
+
+    >>> negotiate_content_type('application/msgpack;q=1, application/json;q=0.5',
+    ...                        ['application/json', 'application/msgpack'])
+    'application/msgpack'
+
+    """
+    media_ranges = parse_accept_header(value)
+
+    best = None
+    best_rank = None
+    for content_type in content_types:
+        # Find the most specific media range that matches
+        match = None
+        for idx, (media_range, quality) in enumerate(media_ranges):
+            if _media_range_matches(media_range, content_type):
+                specificity = 0 if media_range == '*/*' else 1 if media_range.endswith('/*') else 2
+                if match is None or specificity > match[0]:
+                    match = (specificity, quality, idx)
+        if match is None or match[1] <= 0:
+            continue
+
+        rank = (-match[1], match[2])
+        if best_rank is None or rank < best_rank:
+            best, best_rank = content_type, rank
+
+    return best
+
+
+def generate_etag(content):
+    # type: (bytes) -> str
+    """
+    Generate a (strong) entity tag for content.
+    """
+    return '"{}"'.format(hashlib.sha1(content).hexdigest())
+
+
+def etag_matches(etag, if_none_match):
+    # type: (str, Optional[str]) -> bool
+    """
+    Check if an entity tag matches the value of an ``If-None-Match`` header
+    (using weak comparison as defined in RFC 7232).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+
+    etag = etag[2:] if etag.startswith('W/') else etag
+    for value in if_none_match.split(','):
+        value = value.strip()
+        if value.startswith('W/'):
+            value = value[2:]
+        if value == etag:
+            return True
+    return False
+
+
+def accepts_encoding(value, encoding):
+    # type: (Optional[str], str) -> bool
+    """
+    Check if a content coding (eg gzip) is acceptable based on the value of
+    an ``Accept-Encoding`` header.
+    """
+    if not value:
+        return False
+    qualities = dict(parse_accept_header(value))
+    # A * wildcard is normalised to */* by the parser
+    return qualities.get(encoding, qualities.get('*/*', 0)) > 0
+
+
+def negotiate_encoding(value, encodings):
+    # type: (Optional[str], Sequence[str]) -> Optional[str]
+    """
+    Negotiate the content coding to use based on the value of an
+    ``Accept-Encoding`` header.
+
+    :param value: Value of the ``Accept-Encoding`` header.
+    :param encodings: Available content codings in order of server preference.
+    :returns: The selected coding or :const:`None` if no coding is acceptable.
+
+    The ``identity`` coding is acceptable unless explicitly excluded (RFC 7231).
+
+    """
+    qualities = dict(parse_accept_header(value)) if value else {}
+    wildcard = qualities.get('*/*')
+
+    best, best_q = None, 0
+    for encoding in encodings:
+        q = qualities.get(encoding, wildcard)
+        if q is None:
+            q = 0.001 if encoding == 'identity' else 0
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def resolve_content_type(type_resolvers, request, content_types=None):
+    # type: (Iterable[Callable[[Any], str]], Any, Sequence[str]) -> Optional[str]
     """
     Resolve content types from a request.
+
+    If `content_types` are supplied resolved values are negotiated against
+    the available content types (see :py:func:`negotiate_content_type`); if no
+    acceptable type is available the first type requested is returned.
     """
     for resolver in type_resolvers:
-        content_type = parse_content_type(resolver(request))
+        value = resolver(request)
+        if not value:
+            continue
+
+        if content_types:
+            content_type = negotiate_content_type(value, content_types)
+            if content_type:
+                return content_type
+
+        content_type = parse_content_type(value)
         if content_type:
             return content_type
 
 
-def get_resource(request, resource, allow_multiple=False, full_clean=True, default_to_not_supplied=False):
+STREAM_CHUNK_SIZE = 8192
+"""
+Size (in characters) that streamed output is buffered to before a chunk is
+emitted.
+"""
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Array decoding states
+_START, _FIRST_VALUE, _VALUE, _SEPARATOR, _END = range(5)
+
+_STRING_SCAN = re.compile(r'["\\]')
+_CONTAINER_SCAN = re.compile(r'["\[\]{}]')
+_SCALAR_END = re.compile(r'[^0-9A-Za-z.+-]')
+
+
+class _ItemScanner(object):
+    """
+    Find the end of a JSON value that may span many chunks.
+
+    Only the nesting of containers and strings is tracked (the value is
+    validated once decoded); the state of the scan is kept between chunks so
+    each character is scanned once.
+    """
+    __slots__ = ('scalar', 'in_string', 'escaped', 'depth')
+
+    def __init__(self, char):
+        # type: (str) -> None
+        self.scalar = char not in '"[{'
+        self.in_string = char == '"'
+        self.escaped = False
+        self.depth = 0 if self.scalar or self.in_string else 1
+
+    def scan(self, buffer, pos):
+        # type: (str, int) -> int
+        """
+        Scan a chunk for the end of the value.
+
+        :returns: Position following the value or -1 if the value continues
+            past the end of the chunk.
+
+        """
+        if self.scalar:
+            match = _SCALAR_END.search(buffer, pos)
+            return -1 if match is None else match.start()
+
+        if self.escaped:
+            if pos == len(buffer):
+                return -1
+            self.escaped = False
+            pos += 1
+
+        while True:
+            if self.in_string:
+                match = _STRING_SCAN.search(buffer, pos)
+                if match is None:
+                    return -1
+                pos = match.end()
+                if match.group() == '\\':
+                    # Skip the escaped character (that may be in the next chunk)
+                    if pos == len(buffer):
+                        self.escaped = True
+                        return -1
+                    pos += 1
+                    continue
+                self.in_string = False
+                if not self.depth:
+                    return pos
+
+            else:
+                match = _CONTAINER_SCAN.search(buffer, pos)
+                if match is None:
+                    return -1
+                pos = match.end()
+                char = match.group()
+                if char == '"':
+                    self.in_string = True
+                elif char in '[{':
+                    self.depth += 1
+                else:
+                    self.depth -= 1
+                    if not self.depth:
+                        return pos
+
+
+def iterdecode_json(stream, chunk_size=STREAM_CHUNK_SIZE):
+    # type: (IO[bytes], int) -> Iterator[Any]
+    """
+    Incrementally decode a UTF-8 encoded JSON document from a stream.
+
+    If the document is an array each item is yielded as it is decoded, only
+    the current item is held in memory. Any other document is decoded in full
+    and yielded as a single value.
+
+    Decoding fails as soon as an item cannot be parsed, and anything other
+    than whitespace following the document is an error.
+
+    :param stream: File-like object to read from.
+    :param chunk_size: Size of blocks read from the stream.
+
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('UTF-8')()
+    buffer = ''
+    offset = pos = 0
+    eof = False
+    state = _START
+
+    # Current item; chunks are only joined once the end of the item is found
+    item = None  # type: Optional[_ItemScanner]
+    item_chunks = []
+    item_start = 0
+
+    while True:
+        if item is not None:
+            end = item.scan(buffer, pos)
+            if end >= 0:
+                item_chunks.append(buffer[item_start:end])
+                text = ''.join(item_chunks)
+                try:
+                    value, idx = decoder.raw_decode(text)
+                except ValueError as ex:
+                    raise CodecDecodeError(str(ex))
+                if idx != len(text):
+                    raise CodecDecodeError("Extra data: char {}".format(offset + end - len(text) + idx))
+                yield value
+
+                item = None
+                item_chunks = []
+                state = _SEPARATOR
+                pos = end
+                continue
+
+            if eof:
+                raise CodecDecodeError("Unexpected end of document.")
+            item_chunks.append(buffer[item_start:])
+            item_start = 0
+
+        else:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer):
+                char = buffer[pos]
+
+                if state == _START:
+                    if char != '[':
+                        # Not an array, decode as a single document
+                        chunks = [buffer[pos:]]
+                        while not eof:
+                            data = stream.read(chunk_size)
+                            eof = not data
+                            chunks.append(text_decoder.decode(data, final=eof))
+                        try:
+                            yield decoder.decode(''.join(chunks))
+                        except ValueError as ex:
+                            raise CodecDecodeError(str(ex))
+                        return
+                    state = _FIRST_VALUE
+                    pos += 1
+                    continue
+
+                if state == _END:
+                    raise CodecDecodeError("Extra data: char {}".format(offset + pos))
+
+                if char == ']' and state in (_FIRST_VALUE, _SEPARATOR):
+                    state = _END
+                    pos += 1
+                    continue
+
+                if state == _SEPARATOR:
+                    if char != ',':
+                        raise CodecDecodeError("Expecting ',' delimiter: char {}".format(offset + pos))
+                    state = _VALUE
+                    pos += 1
+                    continue
+
+                item = _ItemScanner(char)
+                item_start = pos
+                if not item.scalar:
+                    pos += 1
+                continue
+
+            elif eof:
+                if state == _END:
+                    return
+                raise CodecDecodeError("Unexpected end of document.")
+
+        # Read more data
+        data = stream.read(chunk_size)
+        eof = not data
+        offset += len(buffer)
+        buffer = text_decoder.decode(data, final=eof)
+        pos = 0
+
+
+def iterdecode_msgpack(stream, chunk_size=STREAM_CHUNK_SIZE):
+    # type: (IO[bytes], int) -> Iterator[Any]
+    """
+    Incrementally decode a MessagePack document from a stream.
+
+    If the document is an array each item is yielded as it is decoded; any
+    other document is yielded as a single value. Any data following the
+    document is an error.
+
+    :param stream: File-like object to read from.
+    :param chunk_size: Size of blocks read from the stream.
+
+    """
+    unpacker = msgpack.Unpacker(raw=False)
+    received = [0]
+
+    def feed(data):
+        unpacker.feed(data)
+        received[0] += len(data)
+
+    def unpack(method):
+        while True:
+            try:
+                return method()
+            except msgpack.OutOfData:
+                data = stream.read(chunk_size)
+                if not data:
+                    raise CodecDecodeError("Unexpected end of document.")
+                feed(data)
+
+    data = stream.read(chunk_size)
+    feed(data)
+    marker = bytearray(data[:1])
+    try:
+        if marker and (0x90 <= marker[0] <= 0x9f or marker[0] in (0xdc, 0xdd)):
+            for _ in range(unpack(unpacker.read_array_header)):
+                yield unpack(unpacker.unpack)
+        else:
+            yield unpack(unpacker.unpack)
+    except ValueError as ex:
+        raise CodecDecodeError(str(ex))
+
+    position = unpacker.tell()
+    if position < received[0] or stream.read(chunk_size):
+        raise CodecDecodeError("Extra data: byte {}".format(position))
+
+
+STREAMING_DECODERS = {
+    json_codec.CONTENT_TYPE: iterdecode_json,
+}
+"""
+Incremental decoders keyed by content type; codecs without an incremental
+decoder fall back to decoding the entire body.
+"""
+
+if msgpack:
+    STREAMING_DECODERS['application/x-msgpack'] = iterdecode_msgpack
+
+
+def iter_resources(request, resource, full_clean=True, default_to_not_supplied=False, errors=None):
+    """
+    Incrementally get resource instances from ``request.stream``.
+
+    Resources are decoded and yielded one at a time so arbitrarily large
+    arrays can be processed in constant memory; a single resource is also
+    accepted. Errors are reported using the same codes as
+    :py:func:`get_resource`.
+
+    If an `errors` dict is supplied, items that fail validation (eg a value
+    of the wrong type) do not fail the request; the error messages are
+    recorded in `errors` keyed by the index of the item and ``None`` is
+    yielded in place of the item.
+
+    """
+    decoder = STREAMING_DECODERS.get(request.request_codec.CONTENT_TYPE)
+    if decoder is None:
+        instance = get_resource(request, resource, True, full_clean, default_to_not_supplied)
+        for item in (instance if isinstance(instance, list) else [instance]):
+            yield item
+        return
+
+    try:
+        for idx, data in enumerate(decoder(request.stream)):
+            try:
+                instance = build_object_graph(data, resource, full_clean, False, default_to_not_supplied)
+            except ResourceException:
+                raise HttpError(HTTPStatus.BAD_REQUEST, 98, "Invalid resource type.")
+            except ValidationError as ve:
+                if errors is None:
+                    raise
+                errors[idx] = ve.error_messages
+                yield None
+                continue
+
+            if not isinstance(instance, resource):
+                raise HttpError(HTTPStatus.BAD_REQUEST, 98, "Invalid resource type.")
+
+            yield instance
+
+    except UnicodeDecodeError as ude:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 99, "Unable to decode request body.", str(ude))
+
+    except CodecDecodeError as cde:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 96, "Unable to decode body.", str(cde))
+
+
+def get_resource(request, resource, allow_multiple=False, full_clean=True, default_to_not_supplied=False,
+                 stream=False):
     """
     Get a resource instance from ``request.body``.
 
+    If `stream` and `allow_multiple` are both set the body is decoded
+    incrementally and an iterator of resources is returned (see
+    :py:func:`iter_resources`).
+
     Note error code 98 is returned in multiple places, this is to prevent leakage of details of defined resources.
 
     """
+    if stream and allow_multiple:
+        return iter_resources(request, resource, full_clean, default_to_not_supplied)
+
+    if request.trace_span is None:
+        return _decode_resource(request, resource, allow_multiple, full_clean, default_to_not_supplied)
+
+    with child_span(request, 'odinweb.decode', {
+        'content_type': request.request_codec.CONTENT_TYPE,
+        'body_size': body_size(request.body),
+    }):
+        return _decode_resource(request, resource, allow_multiple, full_clean, default_to_not_supplied)
+
+
+def _decode_resource(request, resource, allow_multiple, full_clean, default_to_not_supplied):
     # Decode the request body.
     body = request.body
     if isinstance(body, bytes):
@@ -75,8 +584,84 @@ def get_resource(request, resource, allow_multiple=False, full_clean=True, defau
     return instance
 
 
-def create_response(request, body=None, status=None, headers=None):
-    # type: (BaseHttpRequest, Any, HTTPStatus, dict) -> HttpResponse
+def _is_sequence(value):
+    # type: (Any) -> bool
+    return isinstance(value, (list, tuple)) or inspect.isgenerator(value)
+
+
+def iterencode_json(body, encoder=None):
+    # type: (Any, json_codec.OdinEncoder) -> Iterator[str]
+    """
+    Incrementally encode a body to JSON.
+
+    Sequences (including generators) and the results of a
+    :py:class:`odinweb.resources.Listing` are encoded one item at a time.
+    """
+    encoder = encoder or json_codec.OdinEncoder()
+
+    if isinstance(body, Listing):
+        obj = encoder.default(body)
+        results = obj.pop('results', None)
+        yield '{"results": '
+        for chunk in iterencode_json(results, encoder):
+            yield chunk
+        for key, value in obj.items():
+            yield ', ' + encoder.encode(key) + ': ' + encoder.encode(value)
+        yield '}'
+
+    elif _is_sequence(body):
+        yield '['
+        for idx, item in enumerate(body):
+            if idx:
+                yield ', '
+            yield encoder.encode(item)
+        yield ']'
+
+    else:
+        yield encoder.encode(body)
+
+
+STREAMING_ENCODERS = {
+    json_codec.CONTENT_TYPE: iterencode_json,
+}
+"""
+Incremental encoders keyed by content type; codecs without an incremental
+encoder fall back to encoding the entire body as a single chunk.
+"""
+
+
+def iterencode(codec, body, chunk_size=STREAM_CHUNK_SIZE):
+    # type: (Any, Any, int) -> Iterator[AnyStr]
+    """
+    Encode a body into chunks of (at least) `chunk_size` using a codec.
+
+    :param codec: Codec used to encode the body.
+    :param body: Body of the response
+    :param chunk_size: Size to buffer output to before emitting a chunk.
+
+    """
+    encoder = STREAMING_ENCODERS.get(codec.CONTENT_TYPE)
+    if encoder is None:
+        if inspect.isgenerator(body):
+            body = list(body)
+        yield codec.dumps(body)
+        return
+
+    buffer = []
+    size = 0
+    for chunk in encoder(body):
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def create_response(request, body=None, status=None, headers=None, stream=False):
+    # type: (BaseHttpRequest, Any, HTTPStatus, dict, bool) -> HttpResponse
     """
     Generate a HttpResponse.
 
@@ -84,10 +669,29 @@ def create_response(request, body=None, status=None, headers=None):
     :param body: Body of the response
     :param status: HTTP status code
     :param headers: Any headers.
+    :param stream: Generate a :py:class:`StreamingHttpResponse` where the body
+        is encoded incrementally.
 
     """
+    if request.trace_span is None:
+        return _create_response(request, body, status, headers, stream)
+
+    with child_span(request, 'odinweb.encode') as span:
+        response = _create_response(request, body, status, headers, stream)
+        span.set_attribute('content_type', response.headers.get('Content-Type'))
+        span.set_attribute('body_size', body_size(response.body))
+        span.set_attribute('http.status_code', response.status)
+        return response
+
+
+def _create_response(request, body, status, headers, stream):
+    # type: (BaseHttpRequest, Any, HTTPStatus, dict, bool) -> HttpResponse
     if body is None:
         return HttpResponse(None, status or HTTPStatus.NO_CONTENT, headers)
+    elif stream:
+        response = StreamingHttpResponse(iterencode(request.response_codec, body), status or HTTPStatus.OK, headers)
+        response.set_content_type(request.response_codec.CONTENT_TYPE)
+        return response
     else:
         body = request.response_codec.dumps(body)
         response = HttpResponse(body, status or HTTPStatus.OK, headers)
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Metrics
+~~~~~~~
+
+Per-operation latency and throughput metrics.
+
+Add the :py:class:`Metrics` middleware to an API interface to record a
+histogram of the time spent in each dispatch phase (see
+:py:data:`odinweb.containers.TIMING_PHASES`) and a count of responses by
+status for each operation. Metrics can be exported by mounting a
+:py:class:`MetricsApi`::
+
+    >>> from odinweb import api
+    >>> from odinweb.metrics import Metrics, MetricsApi
+    >>> metrics = Metrics()
+    >>> api_interface = api.ApiInterfaceBase(
+    ...     api.ApiVersion(
+    ...         UserApi(),
+    ...         MetricsApi(metrics),
+    ...     ),
+    ...     middleware=[metrics]
+    ... )
+
+``GET /api/v1/metrics`` returns a snapshot in the requested content type,
+``GET /api/v1/metrics/prometheus`` returns a snapshot in the Prometheus text
+exposition format.
+
+Timings are recorded by the compiled dispatch pipeline using the
+``record_timings`` middleware hook, other middleware can implement this hook
+to export timings to another system.
+
+"""
+from __future__ import absolute_import
+
+import threading
+
+from bisect import bisect_left
+
+from .constants import HTTPStatus, Method
+from .containers import ResourceApi, TIMING_PHASES
+from .data_structures import HttpResponse, NoPath, UrlPath
+from .decorators import Operation
+
+# Imports for typing support
+from typing import Any, Dict, List, Sequence  # noqa
+from .data_structures import BaseHttpRequest  # noqa
+
+__all__ = ('Histogram', 'OperationMetrics', 'Metrics', 'MetricsApi', 'prometheus_text')
+
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+"""
+Upper bounds (in seconds) of histogram buckets.
+"""
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram(object):
+    """
+    Histogram of durations with fixed buckets.
+
+    :param buckets: Upper bounds of each bucket (in ascending order); an
+        additional bucket is used for values that exceed the last bound.
+
+    """
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        # type: (Sequence[float]) -> None
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        # type: (float) -> None
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        # type: () -> Dict[str, Any]
+        """
+        Snapshot of the histogram; bucket counts are cumulative (values that
+        exceed the last bound are only included in the count).
+        """
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+
+        return {
+            'count': cumulative + self.counts[-1],
+            'sum': self.sum,
+            'buckets': buckets,
+        }
+
+
+class OperationMetrics(object):
+    """
+    Metrics of an operation.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        # type: (Sequence[float]) -> None
+        self._lock = threading.Lock()
+        self.buckets = tuple(buckets)
+        self.statuses = {}  # type: Dict[int, int]
+        self.phases = tuple(Histogram(buckets) for _ in TIMING_PHASES)
+        self.total = Histogram(buckets)
+
+    def record(self, status, marks):
+        # type: (int, List[float]) -> None
+        """
+        Record a response status and the timing marks of a request.
+        """
+        # Histogram updates are inlined as this is called for every request
+        buckets = self.buckets
+        start = previous = marks[0]
+        with self._lock:
+            statuses = self.statuses
+            statuses[status] = statuses.get(status, 0) + 1
+
+            for histogram, mark in zip(self.phases, marks[1:]):
+                if mark:
+                    duration = mark - previous
+                    histogram.counts[bisect_left(buckets, duration)] += 1
+                    histogram.sum += duration
+                    previous = mark
+
+            histogram = self.total
+            duration = previous - start
+            histogram.counts[bisect_left(buckets, duration)] += 1
+            histogram.sum += duration
+
+    def snapshot(self):
+        # type: () -> Dict[str, Any]
+        with self._lock:
+            statuses = dict(self.statuses)
+            return {
+                'requests': sum(statuses.values()),
+                'errors': sum(c for s, c in statuses.items() if s >= 400),
+                'statuses': statuses,
+                'duration': self.total.snapshot(),
+                'phases': {name: h.snapshot() for name, h in zip(TIMING_PHASES, self.phases)},
+            }
+
+
+class Metrics(object):
+    """
+    Middleware that records metrics of each operation.
+
+    :param buckets: Upper bounds (in seconds) of histogram buckets.
+
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        # type: (Sequence[float]) -> None
+        self.buckets = tuple(sorted(buckets))
+        self.operations = {}  # type: Dict[str, OperationMetrics]
+        self._lock = threading.Lock()
+
+    def get_operation(self, operation_id):
+        # type: (str) -> OperationMetrics
+        """
+        Get (or create) the metrics of an operation.
+        """
+        try:
+            return self.operations[operation_id]
+        except KeyError:
+            with self._lock:
+                metrics = self.operations.get(operation_id)
+                if metrics is None:
+                    metrics = self.operations[operation_id] = OperationMetrics(self.buckets)
+                return metrics
+
+    def record_timings(self, request, response, marks):
+        # type: (BaseHttpRequest, HttpResponse, List[float]) -> None
+        """
+        Record-timings hook.
+        """
+        self.get_operation(request.current_operation.operation_id).record(response.status, marks)
+
+    def reset(self):
+        """
+        Reset all metrics.
+        """
+        with self._lock:
+            self.operations = {}
+
+    def snapshot(self):
+        # type: () -> Dict[str, Dict[str, Any]]
+        """
+        Snapshot of the metrics of all operations (keyed by operation ID).
+        """
+        return {key: metrics.snapshot() for key, metrics in list(self.operations.items())}
+
+
+def _write_histogram(lines, name, labels, histogram):
+    # type: (List[str], str, str, Dict[str, Any]) -> None
+    for bound, count in histogram['buckets']:
+        lines.append('{}_bucket{{{},le="{!r}"}} {}'.format(name, labels, float(bound), count))
+    lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(name, labels, histogram['count']))
+    lines.append('{}_sum{{{}}} {!r}'.format(name, labels, histogram['sum']))
+    lines.append('{}_count{{{}}} {}'.format(name, labels, histogram['count']))
+
+
+def _escape(value):
+    # type: (str) -> str
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(snapshot, prefix='odinweb'):
+    # type: (Dict[str, Dict[str, Any]], str) -> str
+    """
+    Format a metrics snapshot in the Prometheus text exposition format.
+
+    :param snapshot: Snapshot generated by :py:meth:`Metrics.snapshot`.
+    :param prefix: Prefix of metric names.
+
+    """
+    operations = sorted(snapshot.items())
+
+    lines = [
+        '# HELP {}_requests_total Requests dispatched by operation and response status.'.format(prefix),
+        '# TYPE {}_requests_total counter'.format(prefix),
+    ]
+    for operation_id, metrics in operations:
+        for status, count in sorted(metrics['statuses'].items()):
+            lines.append('{}_requests_total{{operation="{}",status="{}"}} {}'.format(
+                prefix, _escape(operation_id), status, count
+            ))
+
+    name = prefix + '_request_duration_seconds'
+    lines.append('# HELP {} Time to dispatch a request.'.format(name))
+    lines.append('# TYPE {} histogram'.format(name))
+    for operation_id, metrics in operations:
+        _write_histogram(lines, name, 'operation="{}"'.format(_escape(operation_id)), metrics['duration'])
+
+    name = prefix + '_phase_duration_seconds'
+    lines.append('# HELP {} Time spent in each phase of dispatching a request.'.format(name))
+    lines.append('# TYPE {} histogram'.format(name))
+    for operation_id, metrics in operations:
+        for phase in TIMING_PHASES:
+            labels = 'operation="{}",phase="{}"'.format(_escape(operation_id), phase)
+            _write_histogram(lines, name, labels, metrics['phases'][phase])
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsApi(ResourceApi):
+    """
+    Resource API that exports a snapshot of metrics.
+
+    :param metrics: Metrics middleware to export.
+    :param prometheus: Enable the Prometheus export.
+
+    """
+    api_name = 'metrics'
+    tags = ('metrics', )
+
+    def __init__(self, metrics, prometheus=True):
+        # type: (Metrics, bool) -> None
+        super(MetricsApi, self).__init__()
+        self.metrics = metrics
+
+        # Operations are bound to the instance to provide access to the metrics
+        operations = [Operation(MetricsApi.get_metrics, NoPath, Method.GET)]
+        if prometheus:
+            operations.append(Operation(MetricsApi.get_prometheus, UrlPath.parse('prometheus'), Method.GET))
+        for operation in operations:
+            operation.bind_to_instance(self)
+        self._operations = operations
+
+    def get_metrics(self, request):
+        """
+        Snapshot of metrics of each operation.
+        """
+        return self.metrics.snapshot()
+
+    def get_prometheus(self, request):
+        """
+        Snapshot of metrics in the Prometheus text format.
+        """
+        return HttpResponse(prometheus_text(self.metrics.snapshot()), HTTPStatus.OK, {
+            'Content-Type': PROMETHEUS_CONTENT_TYPE,
+        })
@@ -0,0 +1,151 @@
+"""
+Middleware to compress response bodies.
+
+Add to the middleware of an API interface::
+
+    >>> from odinweb.middleware.compression import Compression
+    >>> api_interface.middleware.append(Compression(min_size=1024, cache_size=64))
+
+"""
+from __future__ import absolute_import
+
+import hashlib
+import zlib
+
+# Typing imports
+from typing import Sequence  # noqa
+
+from .._compat import text_type, binary_type
+from ..constants import HTTPStatus
+from ..data_structures import LRUCache
+from ..helpers import negotiate_encoding
+
+# Imports for typing support
+from ..data_structures import BaseHttpRequest, HttpResponse  # noqa
+
+ENCODINGS = ('gzip', 'deflate')
+"""
+Supported content codings (in order of preference).
+"""
+
+NOT_COMPRESSIBLE_STATUSES = (
+    HTTPStatus.NO_CONTENT.value,
+    HTTPStatus.PARTIAL_CONTENT.value,
+    HTTPStatus.NOT_MODIFIED.value,
+)
+
+
+def compress(body, encoding, level=6):
+    # type: (bytes, str, int) -> bytes
+    """
+    Compress a body using the specified content coding.
+    """
+    # gzip and deflate (zlib) formats only differ by the window bits.
+    wbits = zlib.MAX_WBITS | 16 if encoding == 'gzip' else zlib.MAX_WBITS
+    compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+    return compressor.compress(body) + compressor.flush()
+
+
+def add_vary(response, header):
+    # type: (HttpResponse, str) -> None
+    """
+    Add a header to the Vary header of a response.
+    """
+    vary = response.headers.get('Vary')
+    if not vary:
+        response.headers['Vary'] = header
+    elif header.lower() not in (v.strip().lower() for v in vary.split(',')):
+        response.headers['Vary'] = vary + ', ' + header
+
+
+class Compression(object):
+    """
+    Middleware to compress responses using a content coding negotiated with
+    the client (from the ``Accept-Encoding`` header).
+
+    :param min_size: Minimum size of a body (in bytes) to compress.
+    :param level: Compression level (1-9).
+    :param cache_size: Number of compressed bodies to cache; a cache is only
+        useful for responses that are repeated byte for byte (eg reference
+        data or a swagger spec). Bodies are identified by a digest of their
+        content; set to 0 to disable.
+    :param content_types: Content types to compress; all content types are
+        compressed if not supplied.
+
+    Streaming responses, responses that already have a content coding and
+    responses marked with a ``no-transform`` cache control are not altered.
+
+    """
+    priority = 0  # Ensure compression is the last post request hook run
+
+    def __init__(self, min_size=1024, level=6, cache_size=0, content_types=None):
+        # type: (int, int, int, Sequence[str]) -> None
+        self.min_size = min_size
+        self.level = level
+        self.cache = LRUCache(cache_size) if cache_size else None
+        self.content_types = set(content_types) if content_types else None
+
+    def compressible(self, response):
+        # type: (HttpResponse) -> bool
+        """
+        Determine if a response is a candidate for compression.
+        """
+        if response.streaming or response.status < 200 or response.status in NOT_COMPRESSIBLE_STATUSES:
+            return False
+
+        headers = response.headers
+        if 'Content-Encoding' in headers or 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+
+        if self.content_types is not None:
+            content_type = headers.get('Content-Type', '').partition(';')[0].strip()
+            if content_type not in self.content_types:
+                return False
+
+        return True
+
+    def compress(self, body, encoding):
+        # type: (bytes, str) -> bytes
+        """
+        Compress a body (using the cache if enabled).
+        """
+        cache = self.cache
+        if cache is None:
+            return compress(body, encoding, self.level)
+
+        key = (encoding, hashlib.sha1(body).digest())
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = cache[key] = compress(body, encoding, self.level)
+        return compressed
+
+    def post_request(self, request, response):
+        # type: (BaseHttpRequest, HttpResponse) -> HttpResponse
+        """
+        Post-request hook to compress the response body.
+        """
+        body = response.body
+        if not body or not self.compressible(response):
+            return response
+
+        if isinstance(body, text_type):
+            body = body.encode('UTF-8')
+        elif not isinstance(body, binary_type):
+            return response
+
+        if len(body) < self.min_size:
+            return response
+
+        add_vary(response, 'Accept-Encoding')
+
+        encoding = negotiate_encoding(request.headers.get('ACCEPT_ENCODING'), ENCODINGS)
+        if encoding:
+            response.body = self.compress(body, encoding)
+            response.headers['Content-Encoding'] = encoding
+
+            # The compressed body is a different representation
+            etag = response.headers.get('ETag')
+            if etag and not etag.startswith('W/'):
+                response.headers['ETag'] = 'W/' + etag
+
+        return response
@@ -0,0 +1,211 @@
+"""
+Middleware to limit the number of requests being processed concurrently,
+shedding excess load before any work is done on a request.
+
+Add to the middleware of an API interface, optionally with a limit applied to
+all requests to the interface::
+
+    >>> from odinweb.middleware.concurrency import LoadShedding, concurrency_limit
+    >>> api_interface.middleware.append(LoadShedding(max_concurrency=32, queue_size=8, timeout=0.5))
+
+Limits can also be declared for an operation::
+
+    >>> class ReportApi(ResourceApi):
+    ...     @concurrency_limit(4, queue_size=4, timeout=2)
+    ...     @listing
+    ...     def list_reports(self, request, offset, limit):
+    ...         ...
+
+Requests that arrive when a limit is reached wait (up to the `timeout`) in a
+queue of `queue_size` requests; once the queue is full (or the timeout
+expires) requests are rejected with a *503 Service Unavailable* response and a
+``Retry-After`` header.
+
+.. note:: Waiting in the queue blocks the current thread, when using the ASGI
+    interface use a `queue_size` of 0 so requests are never blocked.
+
+"""
+from __future__ import absolute_import
+
+import threading
+
+from .. import _compat
+from ..constants import HTTPStatus
+from ..data_structures import HttpResponse
+
+# Imports for typing support
+from typing import Callable, Optional  # noqa
+from ..data_structures import BaseHttpRequest  # noqa
+
+
+class ConcurrencyLimit(object):
+    """
+    Limit of the number of concurrent requests, with a wait queue.
+
+    :param max_concurrency: Number of requests that can be in-flight; `None`
+        for no limit (requests are only counted).
+    :param queue_size: Number of requests that can wait for a slot.
+    :param timeout: Time (in seconds) a request can wait in the queue.
+
+    The ``active``, ``waiting``, ``shed`` and ``timeouts`` counters can be
+    used to monitor the limit.
+
+    """
+    timer = staticmethod(_compat.monotonic)
+
+    def __init__(self, max_concurrency=None, queue_size=0, timeout=1.0):
+        # type: (Optional[int], int, float) -> None
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("Max concurrency must be a positive value.")
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._condition = threading.Condition(threading.Lock())
+
+        # Counters
+        self.active = 0
+        self.waiting = 0
+        self.shed = 0
+        self.timeouts = 0
+
+    def __repr__(self):
+        return "ConcurrencyLimit({!r}, queue_size={!r}, timeout={!r})".format(
+            self.max_concurrency, self.queue_size, self.timeout
+        )
+
+    def acquire(self):
+        # type: () -> bool
+        """
+        Acquire a slot, waiting in the queue if a slot is not available.
+
+        :returns: If a slot was acquired; `False` if the request was shed.
+
+        """
+        max_concurrency = self.max_concurrency
+        with self._condition:
+            if max_concurrency is None or self.active < max_concurrency:
+                self.active += 1
+                return True
+
+            if self.waiting >= self.queue_size or not self.timeout:
+                self.shed += 1
+                return False
+
+            self.waiting += 1
+            try:
+                deadline = self.timer() + self.timeout
+                while self.active >= max_concurrency:
+                    remaining = deadline - self.timer()
+                    if remaining <= 0:
+                        self.shed += 1
+                        self.timeouts += 1
+                        return False
+                    self._condition.wait(remaining)
+
+                self.active += 1
+                return True
+
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        """
+        Release a slot (waking a waiting request).
+        """
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+def concurrency_limit(max_concurrency, queue_size=0, timeout=1.0):
+    # type: (int, int, float) -> Callable
+    """
+    Limit the number of concurrent requests to an operation.
+
+    :param max_concurrency: Number of requests that can be in-flight.
+    :param queue_size: Number of requests that can wait for a slot.
+    :param timeout: Time (in seconds) a request can wait in the queue.
+
+    """
+    def inner(o):
+        o.concurrency_limit = ConcurrencyLimit(max_concurrency, queue_size, timeout)
+        return o
+    return inner
+
+
+class LoadShedding(object):
+    """
+    Middleware to limit concurrent requests and shed excess load.
+
+    :param max_concurrency: Number of requests to the API interface that can
+        be in-flight; `None` to only apply limits defined by operations.
+    :param queue_size: Number of requests that can wait for a slot.
+    :param timeout: Time (in seconds) a request can wait in the queue.
+    :param retry_after: Value of the ``Retry-After`` header (in seconds) of
+        rejected requests.
+
+    """
+    priority = 0  # Shed load before any other processing
+
+    def __init__(self, max_concurrency=None, queue_size=0, timeout=1.0, retry_after=1):
+        # type: (Optional[int], int, float, int) -> None
+        self.limit = ConcurrencyLimit(max_concurrency, queue_size, timeout)
+        self.retry_after = retry_after
+
+    @property
+    def active(self):
+        # type: () -> int
+        """
+        Number of requests currently in-flight.
+        """
+        return self.limit.active
+
+    @property
+    def shed(self):
+        # type: () -> int
+        """
+        Number of requests rejected by the interface limit.
+        """
+        return self.limit.shed
+
+    def pre_request(self, request, path_args):
+        """
+        Pre-request hook to acquire slots of the operation and interface limits.
+
+        Requests made on behalf of another request (eg sub-requests of a
+        batch) are not subject to the interface limit, the parent request
+        already holds a slot; limits of the operation still apply.
+        """
+        operation_limit = getattr(request.current_operation, 'concurrency_limit', None)
+        if operation_limit is not None:
+            if not operation_limit.acquire():
+                return self.unavailable()
+            request.concurrency_limits = [operation_limit]
+
+        if request.parent is not None:
+            return
+
+        if not self.limit.acquire():
+            return self.unavailable()
+
+        if request.concurrency_limits is None:
+            request.concurrency_limits = [self.limit]
+        else:
+            request.concurrency_limits.append(self.limit)
+
+    def request_finished(self, request):
+        # type: (BaseHttpRequest) -> None
+        """
+        Request-finished hook to release any slots held by the request.
+        """
+        limits = request.concurrency_limits
+        if limits:
+            request.concurrency_limits = None
+            for limit in limits:
+                limit.release()
+
+    def unavailable(self):
+        # type: () -> HttpResponse
+        return HttpResponse.from_status(
+            HTTPStatus.SERVICE_UNAVAILABLE, {'Retry-After': str(self.retry_after)}
+        )
@@ -0,0 +1,211 @@
+"""
+Middleware to support conditional GET requests (using ``ETag`` and
+``Last-Modified`` validators).
+
+Add to the middleware of an API interface to generate an entity tag by
+hashing the encoded body of each response::
+
+    >>> from odinweb.middleware.conditional import ConditionalGet
+    >>> api_interface.middleware.append(ConditionalGet())
+
+Hashing the body still requires a response to be generated. Where a version
+(or last modified time) of a resource can be cheaply determined an operation
+can supply validators that are checked prior to the operation callback
+being executed::
+
+    >>> from odinweb.middleware.conditional import conditional
+    >>> class UserApi(ResourceApi):
+    ...     def user_version(self, request, resource_id):
+    ...         return self.store.get_version(resource_id)
+    ...
+    ...     @conditional(etag=user_version)
+    ...     @detail
+    ...     def get_user(self, request, resource_id):
+    ...         return self.store.get(resource_id)
+
+Validator functions are called with the same arguments as the operation
+callback (prior to any listing arguments being added); returning `None`
+indicates a version could not be determined.
+
+"""
+from __future__ import absolute_import
+
+import calendar
+
+from email.utils import formatdate, parsedate_tz, mktime_tz
+
+from .._compat import text_type, binary_type
+from ..constants import HTTPStatus, Method
+from ..data_structures import HttpResponse
+from ..exceptions import ImmediateHttpResponse
+from ..helpers import generate_etag, etag_matches
+
+# Imports for typing support
+import datetime  # noqa
+from typing import Any, Callable, Dict, Optional  # noqa
+from ..data_structures import BaseHttpRequest  # noqa
+from ..decorators import Operation  # noqa
+
+CONDITIONAL_METHODS = (Method.GET, Method.HEAD)
+
+NOT_MODIFIED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'Vary', 'Expires', 'Content-Location')
+"""
+Headers retained in a Not Modified response.
+"""
+
+
+def http_date(value):
+    # type: (datetime.datetime) -> str
+    """
+    Format a datetime as an HTTP date; naive datetimes are assumed to be UTC.
+    """
+    return formatdate(calendar.timegm(value.utctimetuple()), usegmt=True)
+
+
+def parse_http_date(value):
+    # type: (str) -> Optional[int]
+    """
+    Parse an HTTP date into a timestamp; returns `None` if the date is invalid.
+    """
+    try:
+        return mktime_tz(parsedate_tz(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def not_modified(request, etag=None, last_modified=None):
+    # type: (BaseHttpRequest, str, datetime.datetime) -> bool
+    """
+    Evaluate the conditional headers of a request (as defined in RFC 7232).
+    """
+    if_none_match = request.headers.get('IF_NONE_MATCH')
+    if if_none_match:
+        return bool(etag) and etag_matches(etag, if_none_match)
+
+    if last_modified is not None:
+        if_modified_since = request.headers.get('IF_MODIFIED_SINCE')
+        if if_modified_since:
+            since = parse_http_date(if_modified_since)
+            return since is not None and calendar.timegm(last_modified.utctimetuple()) <= since
+
+    return False
+
+
+def not_modified_response(headers):
+    # type: (Dict[str, str]) -> HttpResponse
+    return HttpResponse(None, HTTPStatus.NOT_MODIFIED, {
+        k: v for k, v in headers.items() if k in NOT_MODIFIED_HEADERS
+    })
+
+
+class Validators(object):
+    """
+    Operation middleware that resolves validators for a request prior to
+    the operation being executed, responding with *Not Modified* if the
+    client already holds the current version.
+
+    :param etag: Function returning a version of the resource.
+    :param last_modified: Function returning when the resource was last modified.
+
+    Validators are only added to the response if the :py:class:`ConditionalGet`
+    middleware is enabled.
+
+    """
+    priority = 90  # Run after other (eg authentication) middleware
+
+    def __init__(self, etag=None, last_modified=None):
+        # type: (Callable[..., Any], Callable[..., datetime.datetime]) -> None
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def pre_dispatch(self, request, path_args):
+        """
+        Pre dispatch hook
+        """
+        if request.method not in CONDITIONAL_METHODS:
+            return
+
+        # Provide binding as decorators are executed prior to binding
+        binding = getattr(request.current_operation, 'binding', None)
+        args = (binding, request) if binding else (request,)
+
+        etag = last_modified = None
+        headers = {}
+        if self.etag:
+            version = self.etag(*args, **path_args)
+            if version is not None:
+                # Include the content type as each type is a distinct representation
+                value = u"{}:{}".format(version, request.response_codec.CONTENT_TYPE)
+                etag = headers['ETag'] = generate_etag(value.encode('UTF-8'))
+        if self.last_modified:
+            last_modified = self.last_modified(*args, **path_args)
+            if last_modified is not None:
+                headers['Last-Modified'] = http_date(last_modified)
+
+        if not_modified(request, etag, last_modified):
+            raise ImmediateHttpResponse(None, HTTPStatus.NOT_MODIFIED, headers)
+
+        request.validators = headers
+
+
+def conditional(etag=None, last_modified=None):
+    # type: (Callable[..., Any], Callable[..., datetime.datetime]) -> Callable[[Operation], Operation]
+    """
+    Supply validators for an operation, this decorator must be applied to an
+    operation (eg after the `detail` or `listing` decorator).
+
+    :param etag: Function returning a version of the resource.
+    :param last_modified: Function returning when the resource was last modified.
+
+    """
+    def inner(operation):
+        operation.middleware.append(Validators(etag, last_modified))
+        return operation
+    return inner
+
+
+class ConditionalGet(object):
+    """
+    Middleware that adds validators to responses of *GET* requests and
+    responds with *Not Modified* if the client already holds the current
+    version.
+
+    :param hash_body: Generate an entity tag by hashing the encoded body if
+        a response has no validators.
+
+    """
+    priority = 2  # Ensure validators are added prior to compression
+
+    def __init__(self, hash_body=True):
+        # type: (bool) -> None
+        self.hash_body = hash_body
+
+    def post_request(self, request, response):
+        # type: (BaseHttpRequest, HttpResponse) -> HttpResponse
+        """
+        Post-request hook to add validators and evaluate conditional headers.
+        """
+        if request.method not in CONDITIONAL_METHODS or response.status != 200 or response.streaming:
+            return response
+
+        headers = response.headers
+        if request.validators:
+            headers.update(request.validators)
+            # Conditional headers have already been evaluated
+            return response
+
+        if 'ETag' not in headers:
+            if not self.hash_body:
+                return response
+
+            body = response.body
+            if isinstance(body, text_type):
+                body = body.encode('UTF-8')
+            elif not isinstance(body, binary_type):
+                return response
+            headers['ETag'] = generate_etag(body)
+
+        if etag_matches(headers['ETag'], request.headers.get('IF_NONE_MATCH')):
+            return not_modified_response(headers)
+
+        return response
@@ -0,0 +1,264 @@
+"""
+Middleware to rate limit requests using a token bucket.
+
+Add to the middleware of an API interface, optionally with a default limit
+applied to all operations::
+
+    >>> from odinweb.middleware.ratelimit import RateLimit, Limit, rate_limit
+    >>> api_interface.middleware.append(RateLimit(default=Limit(1000, per=60)))
+
+Limits can be declared for an operation (each operation has a separate
+bucket)::
+
+    >>> class UserApi(ResourceApi):
+    ...     @rate_limit(10, per=1, burst=20)
+    ...     @listing
+    ...     def list_users(self, request, offset, limit):
+    ...         ...
+
+Requests that exceed a limit receive a *429 Too Many Requests* response with
+a ``Retry-After`` header. The following headers are added to all rate limited
+responses:
+
+- ``X-RateLimit-Limit``: number of requests allowed in a period (the `count`
+  of the limit).
+- ``X-RateLimit-Remaining``: number of requests that can be made immediately;
+  this may exceed the limit if a `burst` larger than the count is allowed.
+- ``X-RateLimit-Reset``: number of seconds until the bucket is full.
+
+Buckets are held in memory by default; to share limits between processes
+supply a store that implements :py:class:`RateLimitStore`.
+
+"""
+from __future__ import absolute_import
+
+import abc
+import collections
+import math
+import threading
+
+from .. import _compat
+from ..constants import HTTPStatus
+from ..data_structures import HttpResponse
+
+# Imports for typing support
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple  # noqa
+from ..data_structures import BaseHttpRequest  # noqa
+from ..decorators import Operation  # noqa
+
+
+def client_address(request):
+    # type: (BaseHttpRequest) -> Optional[str]
+    """
+    Identify a client by address (from a WSGI environ or ASGI scope).
+    """
+    environ = request.environ
+    address = environ.get('REMOTE_ADDR')
+    if address is None:
+        client = environ.get('client')
+        if client:
+            address = client[0]
+    return address
+
+
+class Limit(object):
+    """
+    Rate limit definition.
+
+    :param count: Number of requests allowed in a period.
+    :param per: Length of the period (in seconds).
+    :param burst: Number of requests that can be made in a burst (the
+        capacity of the bucket); defaults to `count`.
+    :param identity: Function to identify the client of a request; the
+        identity of the middleware is used if not supplied.
+
+    """
+    __slots__ = ('count', 'per', 'capacity', 'rate', 'identity')
+
+    def __init__(self, count, per=60, burst=None, identity=None):
+        # type: (int, float, int, Callable[[BaseHttpRequest], Optional[Hashable]]) -> None
+        if count < 1 or per <= 0:
+            raise ValueError("Count and period must be positive values.")
+        self.count = count
+        self.per = per
+        self.capacity = burst or count
+        self.rate = float(count) / per
+        self.identity = identity
+
+    def __repr__(self):
+        return "Limit({!r}, per={!r}, burst={!r})".format(self.count, self.per, self.capacity)
+
+
+def rate_limit(count, per=60, burst=None, identity=None):
+    # type: (int, float, int, Callable[[BaseHttpRequest], Optional[Hashable]]) -> Callable
+    """
+    Apply a rate limit to an operation.
+
+    :param count: Number of requests allowed in a period.
+    :param per: Length of the period (in seconds).
+    :param burst: Number of requests that can be made in a burst; defaults
+        to `count`.
+    :param identity: Function to identify the client of a request.
+
+    """
+    def inner(o):
+        o.rate_limit = Limit(count, per, burst, identity)
+        return o
+    return inner
+
+
+class RateLimitStore(_compat.with_metaclass(abc.ABCMeta, object)):
+    """
+    Interface of a store of token buckets.
+    """
+    @abc.abstractmethod
+    def consume(self, key, rate, capacity, cost=1):
+        # type: (Hashable, float, int, int) -> Tuple[bool, float, float]
+        """
+        Consume tokens from a bucket.
+
+        :param key: Key of the bucket.
+        :param rate: Rate tokens are added to the bucket (per second).
+        :param capacity: Capacity of the bucket.
+        :param cost: Number of tokens to consume.
+        :returns: Tuple of; if the tokens were consumed, the tokens remaining
+            and the number of seconds until enough tokens are available.
+
+        """
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """
+    In-memory store of token buckets.
+
+    Buckets are split across shards (each with a separate lock) to reduce
+    contention between threads. Each bucket is a mutable ``[tokens, updated]``
+    list that is updated in place.
+
+    :param shards: Number of shards.
+    :param max_buckets: Number of buckets in a shard; once a shard is full the
+        least recently used bucket is evicted.
+
+    """
+    timer = staticmethod(_compat.monotonic)
+
+    def __init__(self, shards=16, max_buckets=1024):
+        # type: (int, int) -> None
+        self.max_buckets = max_buckets
+        self._locks = tuple(threading.Lock() for _ in range(shards))
+        self._shards = tuple(collections.OrderedDict() for _ in range(shards))  # type: Tuple[Dict[Hashable, list], ...]
+
+    def __len__(self):
+        return sum(len(s) for s in self._shards)
+
+    def consume(self, key, rate, capacity, cost=1):
+        idx = hash(key) % len(self._shards)
+        buckets = self._shards[idx]
+        now = self.timer()
+
+        with self._locks[idx]:
+            bucket = buckets.pop(key, None)
+            if bucket is None:
+                if len(buckets) >= self.max_buckets:
+                    buckets.popitem(last=False)
+                bucket = buckets[key] = [capacity, now]
+            else:
+                # Re-insert to mark the bucket as most recently used
+                buckets[key] = bucket
+                tokens = bucket[0] + (now - bucket[1]) * rate
+                bucket[0] = capacity if tokens > capacity else tokens
+                bucket[1] = now
+
+            tokens = bucket[0]
+            if tokens >= cost:
+                tokens = bucket[0] = tokens - cost
+                return True, tokens, 0.0
+            return False, tokens, (cost - tokens) / rate
+
+
+class RateLimit(object):
+    """
+    Middleware to rate limit requests.
+
+    :param default: Limit applied to operations that do not define a limit;
+        all operations share a single bucket for each client.
+    :param identity: Function to identify the client of a request, requests
+        are not limited if `None` is returned; defaults to the client address.
+    :param store: Store of token buckets; defaults to an in-memory store.
+    :param headers: Add ``X-RateLimit-*`` headers to responses.
+
+    """
+    priority = 2  # Ensure limits are checked early
+
+    def __init__(self, default=None, identity=client_address, store=None, headers=True):
+        # type: (Limit, Callable[[BaseHttpRequest], Optional[Hashable]], RateLimitStore, bool) -> None
+        self.default = default
+        self.identity = identity
+        self.store = MemoryRateLimitStore() if store is None else store
+        self.headers = headers
+
+    def get_limit(self, operation):
+        # type: (Operation) -> Tuple[Optional[Limit], Hashable]
+        """
+        Get the limit applied to an operation and the scope of the bucket.
+        """
+        limit = getattr(operation, 'rate_limit', None)
+        if limit is not None:
+            return limit, operation.operation_id
+        return self.default, None
+
+    def pre_request(self, request, path_args):
+        """
+        Pre-request hook to check the rate limit of a request.
+        """
+        limit, scope = self.get_limit(request.current_operation)
+        if limit is None:
+            return
+
+        identity = (limit.identity or self.identity)(request)
+        if identity is None:
+            return
+
+        allowed, remaining, retry_after = self.store.consume((scope, identity), limit.rate, limit.capacity)
+
+        headers = {
+            'X-RateLimit-Limit': str(limit.count),
+            'X-RateLimit-Remaining': str(int(remaining)),
+            'X-RateLimit-Reset': str(int(math.ceil((limit.capacity - remaining) / limit.rate))),
+        } if self.headers else {}
+
+        if not allowed:
+            headers['Retry-After'] = str(int(math.ceil(retry_after)))
+            return HttpResponse.from_status(HTTPStatus.TOO_MANY_REQUESTS, headers)
+
+        request.rate_limit_headers = headers
+
+    def post_request(self, request, response):
+        # type: (BaseHttpRequest, HttpResponse) -> HttpResponse
+        """
+        Post-request hook to add rate limit headers.
+        """
+        headers = request.rate_limit_headers
+        if headers:
+            response.headers.update(headers)
+        return response
+
+    def post_swagger(self, operation, operation_spec):
+        # type: (Operation, Dict[str, Any]) -> None
+        """
+        Document the rate limit of an operation.
+        """
+        limit, _ = self.get_limit(operation)
+        if limit is None:
+            return
+
+        operation_spec['x-rateLimit'] = {'limit': limit.count, 'period': limit.per, 'burst': limit.capacity}
+        operation_spec.setdefault('responses', {})[HTTPStatus.TOO_MANY_REQUESTS.value] = {
+            'description': "Rate limit exceeded.",
+            'headers': {
+                'Retry-After': {
+                    'type': 'integer',
+                    'description': "Number of seconds until a request can be made.",
+                },
+            }
+        }
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+OpenAPI Support
+~~~~~~~~~~~~~~~
+
+Generate an `OpenAPI 3 <https://spec.openapis.org/oas/v3.0.3>`_ spec of an
+API, this is a drop in alternative to :py:class:`odinweb.swagger.SwaggerSpec`::
+
+    >>> from odinweb import api
+    >>> from odinweb.openapi import OpenApiSpec
+    >>> my_api = api.ApiCollection(
+    ...    OpenApiSpec("Title of my OpenAPI spec"),
+    ... )
+
+The spec is converted from the Swagger 2.0 definitions generated by
+operations, resource definitions are shared with (and cached by) the
+Swagger generator.
+
+"""
+from __future__ import absolute_import
+
+from .swagger import SwaggerSpec, CODECS
+from .utils import dict_filter
+
+# Imported for typing support
+from typing import Any, Dict, List, Optional, Sequence  # noqa
+
+OPENAPI_VERSION = '3.0.3'
+
+SCHEMA_KEYS = (
+    'type', 'format', 'items', 'enum', 'default', 'minimum', 'maximum', 'exclusiveMinimum',
+    'exclusiveMaximum', 'minLength', 'maxLength', 'pattern', 'minItems', 'maxItems', 'uniqueItems',
+)
+"""
+Keys of a Swagger 2.0 parameter that are moved into a schema object.
+"""
+
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+
+OAUTH2_FLOWS = {
+    'implicit': 'implicit',
+    'password': 'password',
+    'application': 'clientCredentials',
+    'accessCode': 'authorizationCode',
+}
+"""
+Swagger 2.0 OAuth2 flow names mapped to OpenAPI flow names.
+"""
+
+
+def convert_refs(value):
+    # type: (Any) -> Any
+    """
+    Convert Swagger 2.0 definition references to component schema references.
+    """
+    if isinstance(value, dict):
+        return {
+            k: v.replace('#/definitions/', '#/components/schemas/') if k == '$ref' else convert_refs(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [convert_refs(v) for v in value]
+    return value
+
+
+def convert_parameter(parameter):
+    # type: (Dict[str, Any]) -> Dict[str, Any]
+    """
+    Convert a Swagger 2.0 parameter into an OpenAPI parameter.
+    """
+    parameter = dict(parameter)
+    parameter.pop('collectionFormat', None)
+    schema = {key: parameter.pop(key) for key in SCHEMA_KEYS if key in parameter}
+    if schema:
+        parameter['schema'] = schema
+    return parameter
+
+
+def convert_operation(operation, consumes, produces):
+    # type: (Dict[str, Any], Sequence[str], Sequence[str]) -> Dict[str, Any]
+    """
+    Convert a Swagger 2.0 operation into an OpenAPI operation.
+
+    :param operation: Swagger operation definition.
+    :param consumes: Default content types consumed by the API.
+    :param produces: Default content types produced by the API.
+
+    """
+    operation = dict(operation)
+    consumes = operation.pop('consumes', None) or consumes
+    produces = operation.pop('produces', None) or produces
+
+    parameters = []
+    request_body = None
+    form_properties = {}
+    form_required = []
+    for parameter in operation.pop('parameters', ()):
+        in_ = parameter.get('in')
+        if in_ == 'body':
+            request_body = dict_filter({
+                'description': parameter.get('description'),
+                'required': parameter.get('required'),
+                'content': {
+                    content_type: {'schema': convert_refs(parameter.get('schema', {}))}
+                    for content_type in consumes
+                },
+            })
+        elif in_ == 'formData':
+            form_properties[parameter['name']] = convert_parameter(parameter).get('schema', {})
+            if parameter.get('required'):
+                form_required.append(parameter['name'])
+        else:
+            parameters.append(convert_parameter(parameter))
+
+    if form_properties:
+        request_body = {
+            'content': {
+                FORM_CONTENT_TYPE: {'schema': dict_filter({
+                    'type': 'object',
+                    'properties': form_properties,
+                    'required': form_required or None,
+                })}
+            }
+        }
+
+    responses = {}
+    for status, response in (operation.pop('responses', None) or {}).items():
+        response = dict(response)
+        response.setdefault('description', '')
+        if 'headers' in response:
+            response['headers'] = {k: convert_parameter(v) for k, v in response['headers'].items()}
+        schema = response.pop('schema', None)
+        if schema:
+            response['content'] = {
+                content_type: {'schema': convert_refs(schema)} for content_type in produces
+            }
+        responses[str(status)] = response
+
+    operation.update(dict_filter({
+        'parameters': parameters or None,
+        'requestBody': request_body,
+        'responses': responses or {'default': {'description': ''}},
+    }))
+    return operation
+
+
+def convert_security_scheme(definition):
+    # type: (Dict[str, Any]) -> Dict[str, Any]
+    """
+    Convert a Swagger 2.0 security definition into an OpenAPI security scheme.
+
+    Schemes that are already in OpenAPI format (eg ``http`` or
+    ``openIdConnect``) are returned unchanged.
+    """
+    scheme_type = definition.get('type')
+    if scheme_type == 'basic':
+        return dict_filter({
+            'type': 'http',
+            'scheme': 'basic',
+            'description': definition.get('description'),
+        })
+
+    if scheme_type == 'oauth2' and 'flow' in definition:
+        scheme = dict(definition)
+        flow = scheme.pop('flow')
+        scheme['flows'] = {
+            OAUTH2_FLOWS.get(flow, flow): dict_filter({
+                'authorizationUrl': scheme.pop('authorizationUrl', None),
+                'tokenUrl': scheme.pop('tokenUrl', None),
+                'scopes': scheme.pop('scopes', None) or {},
+            })
+        }
+        return scheme
+
+    # API keys (``in`` and ``name``) are unchanged
+    return definition
+
+
+def convert_path(path_spec, consumes, produces):
+    # type: (Dict[str, Any], Sequence[str], Sequence[str]) -> Dict[str, Any]
+    """
+    Convert a Swagger 2.0 path item into an OpenAPI path item.
+    """
+    result = {}
+    for key, value in path_spec.items():
+        if key == 'parameters':
+            result[key] = [convert_parameter(p) for p in value]
+        else:
+            result[key] = convert_operation(value, consumes, produces)
+    return result
+
+
+class OpenApiSpec(SwaggerSpec):
+    """
+    Resource API instance that generates an OpenAPI 3 spec of the current API.
+    """
+    api_name = 'openapi'
+
+    @property
+    def content_types(self):
+        # type: () -> List[str]
+        """
+        Content types supported by the API.
+        """
+        return list(getattr(self.cenancestor, 'registered_codecs', CODECS).keys())
+
+    def parse_operations(self):
+        """
+        Flatten routes into a path -> method -> route structure (in OpenAPI format).
+        """
+        paths, definitions = super(OpenApiSpec, self).parse_operations()
+        content_types = self.content_types
+        return {
+            path: convert_path(path_spec, content_types, content_types)
+            for path, path_spec in paths.items()
+        }, definitions
+
+    def security_schemes(self):
+        # type: () -> Optional[Dict[str, Any]]
+        """
+        Security schemes converted from the Swagger 2.0 security definitions.
+        """
+        definitions = self.security_definitions()
+        if definitions:
+            return {name: convert_security_scheme(d) for name, d in definitions.items()}
+
+    def servers(self, host):
+        # type: (str) -> List[Dict[str, str]]
+        """
+        Generate server objects.
+        """
+        base_path = str(self.base_path)
+        if host:
+            return [
+                {'url': '{}://{}{}'.format(scheme, host, base_path)}
+                for scheme in sorted(self.schemes or ('https',))
+            ]
+        return [{'url': base_path}]
+
+    def build_spec(self, host=None):
+        # type: (str) -> Dict[str, Any]
+        """
+        Build the OpenAPI spec document.
+
+        :param host: Host serving the API; if not supplied server URLs are
+            relative to the host serving the spec.
+
+        """
+        paths, definitions = self.get_operations()
+        return dict_filter({
+            'openapi': OPENAPI_VERSION,
+            'info': {
+                'title': self.title,
+                'version': str(getattr(self.parent, 'version', 0))
+            },
+            'servers': self.servers(host),
+            'paths': paths,
+            'components': dict_filter({
+                'schemas': definitions,
+                'securitySchemes': self.security_schemes(),
+            }) or None,
+        })
@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+Profiling
+~~~~~~~~~
+
+Sampling profiler that captures the call stacks of slow requests.
+
+Add the :py:class:`SamplingProfiler` middleware to an API interface, a
+fraction of requests are profiled and the profile is kept if the request
+takes longer than a threshold. Profiles can be fetched by mounting a
+:py:class:`ProfilesApi`::
+
+    >>> from odinweb import api
+    >>> from odinweb.profiling import SamplingProfiler, ProfilesApi
+    >>> profiler = SamplingProfiler(sample_rate=0.05, threshold=0.5)
+    >>> api_interface = api.ApiInterfaceBase(
+    ...     api.ApiVersion(
+    ...         UserApi(),
+    ...         ProfilesApi(profiler.store),
+    ...     ),
+    ...     middleware=[profiler]
+    ... )
+
+The threshold can be defined for an operation::
+
+    >>> class ReportApi(api.ResourceApi):
+    ...     @profile_threshold(2.0)
+    ...     @api.listing
+    ...     def list_reports(self, request, offset, limit):
+    ...         ...
+
+Profiles are in the collapsed stack format (one line per unique stack of
+``;`` separated frames, followed by the sample count) used by flame graph
+tools.
+
+Stacks are sampled using :py:func:`sys.setprofile` on the thread dispatching
+the request. A request is only sampled if no other profile function is
+installed on the thread, so requests dispatched by the ASGI interface (where
+requests share a thread) are not sampled while another request is being
+sampled; samples of a request dispatched by the ASGI interface can include
+other requests executing on the event loop.
+
+"""
+from __future__ import absolute_import
+
+import abc
+import collections
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+from . import _compat
+from .constants import HTTPStatus, Method
+from .containers import ResourceApi
+from .data_structures import HttpResponse, NoPath, UrlPath
+from .decorators import Operation
+from .exceptions import HttpError
+
+# Imports for typing support
+from typing import Any, Callable, Dict, List, Optional  # noqa
+from .data_structures import BaseHttpRequest  # noqa
+
+__all__ = (
+    'Profile', 'StackSampler', 'ProfileStore', 'RingBufferStore', 'DirectoryStore',
+    'SamplingProfiler', 'ProfilesApi', 'profile_threshold',
+)
+
+
+def profile_threshold(threshold):
+    # type: (float) -> Callable
+    """
+    Define the time (in seconds) a request to an operation must exceed for a
+    profile to be kept.
+    """
+    def inner(o):
+        o.profile_threshold = threshold
+        return o
+    return inner
+
+
+class Profile(object):
+    """
+    Sampled profile of a request.
+
+    :param operation_id: ID of the operation that was profiled.
+    :param duration: Duration of the request (in seconds).
+    :param samples: Sample counts keyed by collapsed stack.
+    :param started: Time the request started (seconds since the epoch).
+    :param profile_id: Unique ID of the profile.
+
+    """
+    __slots__ = ('profile_id', 'operation_id', 'duration', 'started', 'samples')
+
+    def __init__(self, operation_id, duration, samples, started=None, profile_id=None):
+        # type: (str, float, Dict[str, int], float, str) -> None
+        self.operation_id = operation_id
+        self.duration = duration
+        self.samples = samples
+        self.started = time.time() - duration if started is None else started
+        self.profile_id = profile_id or uuid.uuid4().hex
+
+    def __repr__(self):
+        return '<Profile {} {!r} {:.3f}s>'.format(self.profile_id, self.operation_id, self.duration)
+
+    def summary(self):
+        # type: () -> Dict[str, Any]
+        return {
+            'id': self.profile_id,
+            'operation_id': self.operation_id,
+            'duration': self.duration,
+            'started': self.started,
+            'samples': sum(self.samples.values()),
+        }
+
+    def collapsed(self):
+        # type: () -> str
+        """
+        Profile in the collapsed stack format.
+        """
+        return ''.join('{} {}\n'.format(stack, count) for stack, count in sorted(self.samples.items()))
+
+    @classmethod
+    def parse_collapsed(cls, value):
+        # type: (str) -> Dict[str, int]
+        """
+        Parse samples from the collapsed stack format.
+        """
+        samples = {}
+        for line in value.splitlines():
+            stack, _, count = line.rpartition(' ')
+            if stack:
+                samples[stack] = samples.get(stack, 0) + int(count)
+        return samples
+
+
+class StackSampler(object):
+    """
+    Sample call stacks of the current thread.
+
+    A profile function (see :py:func:`sys.setprofile`) samples the stack if
+    at least `interval` seconds have passed since the last sample, the sample
+    is weighted by the number of intervals that have passed so time spent in
+    long running calls (eg IO) is accounted for.
+
+    :param interval: Sampling interval (in seconds).
+
+    """
+    timer = staticmethod(_compat.perf_counter)
+
+    def __init__(self, interval=0.005):
+        # type: (float) -> None
+        self.interval = interval
+        self.samples = {}  # type: Dict[str, int]
+        self.started = None  # type: Optional[float]
+        self._last = None  # type: Optional[float]
+
+    def start(self):
+        # type: () -> bool
+        """
+        Start sampling the current thread.
+
+        :returns: `False` if sampling could not be started as a profile
+            function is already installed (eg another sampler).
+
+        """
+        if sys.getprofile() is not None:
+            return False
+        self.started = self._last = self.timer()
+        sys.setprofile(self._profile)
+        return True
+
+    def stop(self):
+        # type: () -> float
+        """
+        Stop sampling; the profile function is only removed if it is the
+        function of this sampler.
+
+        :returns: Time (in seconds) since sampling was started.
+
+        """
+        if sys.getprofile() == self._profile:
+            sys.setprofile(None)
+        return self.timer() - self.started
+
+    def _profile(self, frame, event, arg):
+        elapsed = self.timer() - self._last
+        if elapsed >= self.interval:
+            count = int(elapsed / self.interval)
+            self._last += count * self.interval
+            # Include builtin functions as the leaf of the stack
+            self.sample(frame, arg if event in ('c_return', 'c_exception') else None, count)
+
+    def sample(self, frame, builtin=None, count=1):
+        """
+        Record a sample of a stack.
+
+        :param frame: Frame at the top of the stack.
+        :param builtin: Builtin function called by the frame.
+        :param count: Weight of the sample.
+
+        """
+        stack = [] if builtin is None else [getattr(builtin, '__name__', '?')]
+        while frame is not None:
+            stack.append('{}:{}'.format(frame.f_globals.get('__name__', '?'), frame.f_code.co_name))
+            frame = frame.f_back
+
+        key = ';'.join(reversed(stack))
+        self.samples[key] = self.samples.get(key, 0) + count
+
+
+class ProfileStore(_compat.with_metaclass(abc.ABCMeta, object)):
+    """
+    Interface of a store of profiles.
+    """
+    @abc.abstractmethod
+    def add(self, profile):
+        # type: (Profile) -> None
+        """
+        Add a profile to the store.
+        """
+
+    @abc.abstractmethod
+    def list(self):
+        # type: () -> List[Profile]
+        """
+        List stored profiles (most recent first).
+        """
+
+    @abc.abstractmethod
+    def get(self, profile_id):
+        # type: (str) -> Optional[Profile]
+        """
+        Get a profile; `None` if the profile does not exist.
+        """
+
+
+class RingBufferStore(ProfileStore):
+    """
+    Store the most recent profiles in memory.
+
+    :param size: Number of profiles to keep.
+
+    """
+    def __init__(self, size=100):
+        # type: (int) -> None
+        self._profiles = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self):
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id):
+        for profile in self.list():
+            if profile.profile_id == profile_id:
+                return profile
+
+
+class DirectoryStore(ProfileStore):
+    """
+    Store profiles as collapsed stack files in a local directory.
+
+    Files are named ``<started ms>_<duration us>_<operation_id>.collapsed``,
+    the name (without the extension) is used as the profile ID.
+
+    :param path: Directory to store profiles in.
+    :param max_profiles: Number of profiles to keep, the oldest profiles are
+        removed once this is exceeded.
+
+    """
+    extension = '.collapsed'
+
+    def __init__(self, path, max_profiles=1000):
+        # type: (str, int) -> None
+        self.path = path
+        self.max_profiles = max_profiles
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def _file_names(self):
+        # type: () -> List[str]
+        return sorted((f for f in os.listdir(self.path) if f.endswith(self.extension)), reverse=True)
+
+    def _load(self, file_name, load_samples=True):
+        # type: (str, bool) -> Optional[Profile]
+        profile_id = file_name[:-len(self.extension)]
+        try:
+            started, duration, operation_id = profile_id.split('_', 2)
+            started, duration = int(started) / 1000.0, int(duration) / 1000000.0
+        except ValueError:
+            return None
+
+        samples = {}
+        if load_samples:
+            try:
+                with open(os.path.join(self.path, file_name)) as f:
+                    samples = Profile.parse_collapsed(f.read())
+            except (IOError, OSError):
+                return None
+
+        return Profile(operation_id, duration, samples, started, profile_id)
+
+    def add(self, profile):
+        profile_id = '{:013d}_{:d}_{}'.format(
+            int(profile.started * 1000), int(profile.duration * 1000000), profile.operation_id
+        )
+        with open(os.path.join(self.path, profile_id + self.extension), 'w') as f:
+            f.write(profile.collapsed())
+
+        for file_name in self._file_names()[self.max_profiles:]:
+            try:
+                os.remove(os.path.join(self.path, file_name))
+            except OSError:
+                pass
+
+    def list(self):
+        return [p for p in (self._load(f, False) for f in self._file_names()) if p is not None]
+
+    def get(self, profile_id):
+        file_name = profile_id + self.extension
+        # Ensure the ID cannot be used to access other files
+        if os.path.basename(file_name) != file_name:
+            return None
+        if os.path.exists(os.path.join(self.path, file_name)):
+            return self._load(file_name)
+
+
+class SamplingProfiler(object):
+    """
+    Middleware that profiles a sample of requests and keeps the profiles of
+    slow requests.
+
+    :param store: Store of profiles; defaults to an in-memory ring buffer.
+    :param sample_rate: Fraction of requests to profile.
+    :param threshold: Time (in seconds) a request must exceed for a profile
+        to be kept; can be overridden by operations (see
+        :py:func:`profile_threshold`).
+    :param interval: Sampling interval (in seconds).
+
+    """
+    priority = 0  # Start profiling before other middleware
+
+    random = staticmethod(random.random)
+
+    def __init__(self, store=None, sample_rate=0.01, threshold=1.0, interval=0.005):
+        # type: (ProfileStore, float, float, float) -> None
+        self.store = RingBufferStore() if store is None else store
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.interval = interval
+
+    def pre_request(self, request, path_args):
+        """
+        Pre-request hook to start profiling a sample of requests.
+        """
+        if self.random() < self.sample_rate:
+            sampler = StackSampler(self.interval)
+            if sampler.start():
+                request.profiler = sampler
+
+    def request_finished(self, request):
+        # type: (BaseHttpRequest) -> None
+        """
+        Request-finished hook to stop profiling and keep profiles of slow requests.
+        """
+        sampler = request.profiler
+        if sampler is None:
+            return
+
+        request.profiler = None
+        duration = sampler.stop()
+
+        operation = request.current_operation
+        threshold = getattr(operation, 'profile_threshold', None)
+        if threshold is None:
+            threshold = self.threshold
+
+        if duration >= threshold:
+            self.store.add(Profile(operation.operation_id, duration, sampler.samples))
+
+
+class ProfilesApi(ResourceApi):
+    """
+    Resource API to fetch stored profiles.
+
+    :param store: Store of profiles.
+
+    """
+    api_name = 'profiles'
+    tags = ('profiles', )
+
+    def __init__(self, store):
+        # type: (ProfileStore) -> None
+        super(ProfilesApi, self).__init__()
+        self.store = store
+
+        # Operations are bound to the instance to provide access to the store
+        operations = [
+            Operation(ProfilesApi.list_profiles, NoPath, Method.GET),
+            Operation(ProfilesApi.get_profile, UrlPath.parse('{profile_id:String}'), Method.GET),
+        ]
+        for operation in operations:
+            operation.bind_to_instance(self)
+        self._operations = operations
+
+    def list_profiles(self, request):
+        """
+        Summary of stored profiles (most recent first).
+        """
+        return [profile.summary() for profile in self.store.list()]
+
+    def get_profile(self, request, profile_id):
+        """
+        Profile in the collapsed stack format.
+        """
+        profile = self.store.get(profile_id)
+        if profile is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, 40, "Profile not found.")
+
+        return HttpResponse(profile.collapsed(), headers={'Content-Type': 'text/plain; charset=utf-8'})
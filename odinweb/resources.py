@@ -97,3 +97,40 @@ class Error(odin.Resource):
         null=True,
         help_text="Additional meta information that can help solve errors."
     )
+
+
+class ItemStatus(odin.Resource):
+    """
+    Status of an individual item from a bulk operation.
+    """
+    class Meta:
+        namespace = None
+
+    index = odin.IntegerField(
+        help_text="Index of the item within the request."
+    )
+    status = odin.IntegerField(
+        help_text="HTTP status code of the item."
+    )
+    errors = AnyField(
+        null=True,
+        help_text="Validation errors that map field names to error messages."
+    )
+    resource = AnyField(
+        null=True,
+        help_text="Resource returned for the item (eg the created resource or an error)."
+    )
+
+
+class MultiStatus(odin.Resource):
+    """
+    Response for bulk operations where the status of each item is reported
+    individually.
+    """
+    class Meta:
+        namespace = None
+
+    results = odin.ArrayOf(
+        ItemStatus,
+        help_text="Status of each item in the request."
+    )
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Router
+~~~~~~
+
+Built in router that resolves a request method and path to an operation.
+
+Operations yielded from :py:meth:`ApiInterfaceBase.op_paths` are compiled
+into a tree keyed on each static node of a :py:class:`UrlPath` with typed
+:py:class:`PathParam` leaves. Resolving a path is then proportional to the
+depth of the path rather than the number of operations defined in an API.
+
+This is intended to be used by any web framework integration (or the built
+in WSGI interface) in place of the frameworks own routing::
+
+    >>> router = Router(api_interface.op_paths())
+    >>> operation, path_args = router.resolve(Method.GET, '/api/v1/user/1')
+
+"""
+from __future__ import absolute_import
+
+import re
+
+from odin.exceptions import ValidationError
+
+from . import _compat
+from .constants import HTTPStatus, Method, Type, PATH_STRING_RE
+from .exceptions import HttpError
+
+# Imports for typing support
+from typing import Iterable, Tuple, Dict, Any, Callable, Union, List  # noqa
+from .data_structures import UrlPath, PathParam  # noqa
+from .decorators import Operation  # noqa
+
+
+def _path_param_converter(path_param):
+    # type: (PathParam) -> Callable[[str], Any]
+    """
+    Generate a converter function for a path parameter.
+
+    The converter raises a ValueError if the value is not valid.
+
+    """
+    type_ = path_param.type or Type.String
+
+    if type_ is Type.Regex and path_param.type_args:
+        matcher = re.compile(r'^(?:{})$'.format(path_param.type_args)).match
+    elif type_.native_type is str:
+        matcher = re.compile(r'^{}$'.format(PATH_STRING_RE)).match
+    else:
+        matcher = None
+
+    field = type_.odin_field()
+
+    def converter(value):
+        if matcher and not matcher(value):
+            raise ValueError(value)
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise ValueError(value)
+
+    return converter
+
+
+class RouteNode(object):
+    """
+    Node within the routing tree.
+    """
+    __slots__ = ('static', 'params', 'operations')
+
+    def __init__(self):
+        self.static = {}  # type: Dict[str, RouteNode]
+        self.params = []  # type: List[Tuple[str, Callable[[str], Any], RouteNode]]
+        self.operations = {}  # type: Dict[Method, Operation]
+
+    def child(self, node):
+        # type: (Union[str, PathParam]) -> RouteNode
+        """
+        Get or create a child for a path node.
+        """
+        if isinstance(node, _compat.string_types):
+            try:
+                return self.static[node]
+            except KeyError:
+                child = self.static[node] = RouteNode()
+                return child
+
+        for name, _, child in self.params:
+            if name == node.name:
+                return child
+
+        child = RouteNode()
+        self.params.append((node.name, _path_param_converter(node), child))
+        return child
+
+    def match(self, segments, index, path_args):
+        # type: (List[str], int, Dict[str, Any]) -> RouteNode
+        """
+        Find the node that matches the path segments (depth first).
+
+        Static nodes are preferred over parameters.
+        """
+        if index == len(segments):
+            return self if self.operations else None
+
+        segment = segments[index]
+        child = self.static.get(segment)
+        if child is not None:
+            node = child.match(segments, index + 1, path_args)
+            if node is not None:
+                return node
+
+        for name, converter, child in self.params:
+            try:
+                value = converter(segment)
+            except ValueError:
+                continue
+            node = child.match(segments, index + 1, path_args)
+            if node is not None:
+                path_args[name] = value
+                return node
+
+
+class Router(object):
+    """
+    Router that resolves a method and path into an operation and the path
+    arguments that should be supplied to the operation.
+    """
+    def __init__(self, op_paths=None):
+        # type: (Iterable[Tuple[UrlPath, Operation]]) -> None
+        self.root = RouteNode()
+        for path, operation in op_paths or ():
+            self.add(path, operation)
+
+    def add(self, path, operation):
+        # type: (UrlPath, Operation) -> None
+        """
+        Add an operation to the router.
+        """
+        node = self.root
+        for path_node in path._nodes:  # pylint:disable=protected-access
+            node = node.child(path_node)
+
+        for method in operation.methods:
+            node.operations[method] = operation
+
+    def resolve(self, method, path):
+        # type: (Union[Method, str], str) -> Tuple[Operation, Dict[str, Any]]
+        """
+        Resolve a method and path into an operation.
+
+        :param method: HTTP method of the request.
+        :param path: Path of the request (eg `/api/v1/user/1`).
+        :returns: The matched operation and the converted path arguments.
+        :raises HttpError: With a *NOT_FOUND* status if no path matches or a
+            *METHOD_NOT_ALLOWED* status if the path does not support the method.
+
+        """
+        segments = path.rstrip('/').split('/')
+
+        path_args = {}
+        node = self.root.match(segments, 0, path_args)
+        if node is None:
+            raise HttpError(HTTPStatus.NOT_FOUND)
+
+        if not isinstance(method, Method):
+            try:
+                method = Method(method.upper())
+            except ValueError:
+                method = None
+
+        try:
+            return node.operations[method], path_args
+        except KeyError:
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, 0, headers={
+                'Allow': ','.join(m.value for m in node.operations)
+            })
@@ -13,11 +13,31 @@ To enable add the :py:class:`SwaggerSpec` resource API into your API::
     ...    SwaggerSpec("Title of my Swagger spec", enable_ui=True),
     ... )
 
+The spec can also be built ahead of time (eg as part of a build process)::
+
+    $ python -m odinweb.swagger build my_app.api:api_interface -o swagger.json
+
+This writes a minified JSON spec and a gzipped copy (``swagger.json.gz``)
+which are served (read into memory once) by specifying the file::
+
+    >>> SwaggerSpec("Title of my Swagger spec", spec_file='swagger.json')
+
+Swagger UI assets are loaded into memory once (along with compressed copies)
+and served based on the ``Accept-Encoding`` header of the request, brotli is
+used if the `brotli <https://pypi.org/project/Brotli/>`_ package is installed.
+
 """
+import argparse
 import collections
+import gzip
+import importlib
+import io
 import os
+import sys
+import weakref
 
 from odin import fields
+from odin.codecs import json_codec
 from odin.fields.virtual import VirtualField
 from odin.utils import getmeta, lazy_property, force_tuple
 
@@ -26,20 +46,27 @@ from . import resources
 from ._compat import binary_type
 from .constants import HTTPStatus, Type as SwaggerType
 from .containers import ResourceApi, CODECS
-from .data_structures import UrlPath, Param, HttpResponse, NoPath, DefaultResource
+from .data_structures import UrlPath, Param, HttpResponse, NoPath, DefaultResource, LRUCache
 from .decorators import Operation
 from .exceptions import HttpError
+from .helpers import generate_etag, etag_matches, accepts_encoding, negotiate_encoding
 from .utils import dict_filter
 
 # Imported for typing support
-from typing import List, Dict, Any, Union, Tuple, Type  # noqa
-from .data_structures import PathParam  # noqa
+from typing import List, Dict, Any, MutableMapping, Optional, Union, Tuple, Type  # noqa
+from odin import Resource  # noqa
+from .data_structures import PathParam, BaseHttpRequest  # noqa
 
 try:
     from odin.fields import future
 except ImportError:
     future = None
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 
 SWAGGER_SPEC_TYPE_MAPPING = [
     (fields.IntegerField, SwaggerType.Long),
@@ -68,12 +95,30 @@ def map_field_to_type(field):
             return type_
 
 
+_definition_cache = weakref.WeakKeyDictionary()  # type: MutableMapping[Type[Resource], Dict[str, Any]]
+"""
+Resource definitions shared by all spec generators; keyed weakly on the
+resource so definitions are discarded along with their resource.
+"""
+
+
 def resource_definition(resource):
     """
     Generate a `Swagger Definitions Object <http://swagger.io/specification/#definitionsObject>`_
     from a resource.
 
+    Definitions are cached (each resource is only introspected once) and
+    must be treated as read-only.
+
     """
+    try:
+        return _definition_cache[resource]
+    except KeyError:
+        definition = _definition_cache[resource] = _resource_definition(resource)
+        return definition
+
+
+def _resource_definition(resource):
     meta = getmeta(resource)
 
     definition = {
@@ -105,6 +150,117 @@ def resource_definition(resource):
     return definition
 
 
+STATIC_CONTENT_TYPES = {
+    '.css': 'text/css',
+    '.js': 'application/javascript',
+}
+
+SPEC_CONTENT_TYPES = {
+    '.json': 'application/json',
+    '.yaml': 'application/x-yaml',
+    '.yml': 'application/x-yaml',
+}
+"""
+Content types of pre-built spec files by extension; specs with an unknown
+extension are served as JSON.
+"""
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def gzip_compress(content):
+    # type: (bytes) -> bytes
+    """
+    Gzip compress content (with a fixed mtime so output is reproducible).
+    """
+    buf = io.BytesIO()
+    with gzip.GzipFile(None, 'wb', 9, buf, mtime=0) as gz:
+        gz.write(content)
+    return buf.getvalue()
+
+
+class StaticAsset(object):
+    """
+    Static asset held in memory along with a copy in each supported content
+    coding; strong entity tags for each copy are generated on creation.
+
+    :param content: Uncompressed content.
+    :param content_type: Content type of the asset.
+    :param cache_control: Value of the Cache-Control header.
+    :param gzip_content: Gzip compressed content (if already available).
+
+    """
+    __slots__ = ('content_type', 'cache_control', 'variants')
+
+    def __init__(self, content, content_type, cache_control=None, gzip_content=None):
+        # type: (bytes, str, str, bytes) -> None
+        self.content_type = content_type
+        self.cache_control = cache_control
+
+        # In order of preference
+        variants = [('gzip', gzip_content or gzip_compress(content)), ('identity', content)]
+        if brotli:
+            variants.insert(0, ('br', brotli.compress(content)))
+        self.variants = collections.OrderedDict(
+            (encoding, (body, generate_etag(body))) for encoding, body in variants
+        )
+
+    @classmethod
+    def from_file(cls, file_path, content_type, cache_control=None):
+        # type: (str, str, str) -> StaticAsset
+        """
+        Load an asset from a file, the file may be gzip compressed.
+        """
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        if content[:2] == GZIP_MAGIC:
+            return cls(gzip.GzipFile(fileobj=io.BytesIO(content)).read(), content_type, cache_control, content)
+        return cls(content, content_type, cache_control)
+
+    def response(self, request):
+        # type: (BaseHttpRequest) -> HttpResponse
+        """
+        Generate a response negotiating the content coding with the client.
+        """
+        encoding = negotiate_encoding(request.headers.get('ACCEPT_ENCODING'), self.variants) or 'identity'
+        body, etag = self.variants[encoding]
+
+        headers = {'ETag': etag, 'Vary': 'Accept-Encoding'}
+        if self.cache_control:
+            headers['Cache-Control'] = self.cache_control
+
+        if etag_matches(etag, request.headers.get('IF_NONE_MATCH')):
+            return HttpResponse(None, HTTPStatus.NOT_MODIFIED, headers)
+
+        headers['Content-Type'] = self.content_type
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return HttpResponse(body, headers=headers)
+
+
+_static_assets = {}  # type: Dict[str, Dict[str, StaticAsset]]
+"""
+Static assets loaded from each static path; shared by all spec instances.
+"""
+
+
+def load_static_assets(static_path, cache_control=None):
+    # type: (str, str) -> Dict[str, StaticAsset]
+    """
+    Load (once) all static assets with a known content type in a folder.
+    """
+    assets = _static_assets.get(static_path)
+    if assets is None:
+        assets = {}
+        for file_name in os.listdir(static_path):
+            content_type = STATIC_CONTENT_TYPES.get(os.path.splitext(file_name)[1])
+            if content_type:
+                file_path = os.path.join(static_path, file_name)
+                assets[file_name] = StaticAsset.from_file(file_path, content_type, cache_control)
+        _static_assets[static_path] = assets
+    return assets
+
+
 class SwaggerSpec(ResourceApi):
     """
     Resource API instance that generates a Swagger spec of the current API.
@@ -114,15 +270,25 @@ class SwaggerSpec(ResourceApi):
     tags = (SWAGGER_TAG, )
 
     static_path = os.path.join(os.path.dirname(__file__), 'static')
+    static_cache_control = 'public, max-age=300'
 
-    def __init__(self, title, enabled=True, enable_ui=False, host=None, schemes=None):
-        # type: (str, bool, bool, str, Union[str, Tuple[str]]) -> None
-        # Register operations
+    cache_size = 32
+    """
+    Number of encoded specs (keyed by host and content type) to cache.
+    """
+
+    def __init__(self, title, enabled=True, enable_ui=False, host=None, schemes=None, spec_file=None):
+        # type: (str, bool, bool, str, Union[str, Tuple[str]], str) -> None
+        # Register operations (bound to this instance)
+        operations = []
         if enabled:
-            self._operations.append(Operation(SwaggerSpec.get_swagger))
+            operations.append(Operation(SwaggerSpec.spec_response))
             if enable_ui:
-                self._operations.append(Operation(SwaggerSpec.get_ui, UrlPath.parse('ui')))
-                self._operations.append(Operation(SwaggerSpec.get_static, UrlPath.parse('ui/{file_name:String}')))
+                operations.append(Operation(SwaggerSpec.get_ui, UrlPath.parse('ui')))
+                operations.append(Operation(SwaggerSpec.get_static, UrlPath.parse('ui/{file_name:String}')))
+        for operation in operations:
+            operation.bind_to_instance(self)
+        self._operations = operations
 
         super(SwaggerSpec, self).__init__()
         self.title = title
@@ -130,8 +296,11 @@ class SwaggerSpec(ResourceApi):
         self.enable_ui = enabled and enable_ui
         self.host = host
         self.schemes = set(force_tuple(schemes or ()))
+        self.spec_file = spec_file
 
-        self._ui_cache = None
+        self._ui_cache = None  # type: StaticAsset
+        self._operations_cache = None  # type: Tuple[int, Tuple[Dict[str, Any], Dict[str, Any]]]
+        self._spec_cache = LRUCache(self.cache_size)
 
     @lazy_property
     def cenancestor(self):
@@ -162,7 +331,7 @@ class SwaggerSpec(ResourceApi):
 
     @property
     def swagger_path(self):
-        return self.base_path + 'swagger'
+        return self.base_path + self.api_name
 
     @staticmethod
     def generate_parameters(path):
@@ -192,6 +361,10 @@ class SwaggerSpec(ResourceApi):
             getmeta(resources.Listing).resource_name: resource_definition(resources.Listing),
         }
 
+        # Middleware can modify the documentation of each operation
+        middleware = getattr(self.cenancestor, 'middleware', None)
+        post_swagger = middleware.post_swagger if middleware is not None else ()
+
         paths = collections.OrderedDict()
         for path, operation in self.parent.op_paths():
             # Cut of first item (will be the parents path)
@@ -226,17 +399,43 @@ class SwaggerSpec(ResourceApi):
 
             # Add methods
             for method in operation.methods:
-                path_spec[method.value.lower()] = operation.to_swagger()
+                operation_spec = path_spec[method.value.lower()] = operation.to_swagger()
+                for hook in post_swagger + operation.middleware.post_swagger:
+                    hook(operation, operation_spec)
 
         return paths, resource_defs
 
-    @doc.response(HTTPStatus.OK, "Swagger JSON of this API")
-    def get_swagger(self, request):
+    @property
+    def api_revision(self):
+        # type: () -> int
         """
-        Generate this document.
+        Revision of the API structure this spec is generated from.
+        """
+        return getattr(self.cenancestor, 'revision', 0)
+
+    def get_operations(self):
+        # type: () -> Tuple[Dict[str, Any], Dict[str, Any]]
+        """
+        Parsed operations (see :py:meth:`parse_operations`), these are cached
+        until the API structure is changed.
+        """
+        revision = self.api_revision
+        cached = self._operations_cache
+        if cached is None or cached[0] != revision:
+            cached = self._operations_cache = (revision, self.parse_operations())
+        return cached[1]
+
+    def build_spec(self, host=None):
+        # type: (str) -> Dict[str, Any]
+        """
+        Build the Swagger spec document.
+
+        :param host: Host serving the API; if not supplied the host is
+            omitted (clients will use the host serving the spec).
+
         """
         api_base = self.parent
-        paths, definitions = self.parse_operations()
+        paths, definitions = self.get_operations()
         codecs = getattr(self.cenancestor, 'registered_codecs', CODECS)  # type: dict
         return dict_filter({
             'swagger': '2.0',
@@ -244,7 +443,7 @@ class SwaggerSpec(ResourceApi):
                 'title': self.title,
                 'version': str(getattr(api_base, 'version', 0))
             },
-            'host': self.host or request.host,
+            'host': host,
             'schemes': list(self.schemes) or None,
             'basePath': str(self.base_path),
             'consumes': list(codecs.keys()),
@@ -254,6 +453,112 @@ class SwaggerSpec(ResourceApi):
             'securityDefinitions': self.security_definitions(),
         })
 
+    def get_swagger(self, request):
+        # type: (BaseHttpRequest) -> Dict[str, Any]
+        """
+        Generate this document.
+        """
+        return self.build_spec(self.host or request.host)
+
+    @doc.response(HTTPStatus.OK, "Swagger JSON of this API")
+    @doc.response(HTTPStatus.NOT_MODIFIED, "Swagger spec has not been modified", None)
+    def spec_response(self, request):
+        # type: (BaseHttpRequest) -> HttpResponse
+        """
+        Generate this document.
+
+        Encoded specs are cached (keyed by host and content type) until the
+        API structure is changed; a *Not Modified* response is returned if
+        the ETag supplied by the client matches.
+        """
+        if self.spec_file:
+            return self.get_spec_file_response(request)
+
+        codec = request.response_codec
+        key = (self.host or request.host, codec.CONTENT_TYPE)
+        revision = self.api_revision
+
+        cached = self._spec_cache.get(key)
+        if cached is None or cached[0] != revision:
+            body = codec.dumps(self.build_spec(self.host or request.host))
+            if not isinstance(body, binary_type):
+                body = body.encode('UTF-8')
+            cached = self._spec_cache[key] = (revision, generate_etag(body), body)
+        _, etag, body = cached
+
+        if etag_matches(etag, request.headers.get('IF_NONE_MATCH')):
+            return HttpResponse(None, HTTPStatus.NOT_MODIFIED, {'ETag': etag})
+
+        return HttpResponse(body, headers={
+            'Content-Type': codec.CONTENT_TYPE,
+            'ETag': etag,
+        })
+
+    # Served in place of get_swagger, the published operation ID is unchanged
+    spec_response.operation_id = 'odinweb.swagger.get_swagger'
+
+    @lazy_property
+    def spec_file_content(self):
+        # type: () -> bytes
+        """
+        Content of the pre-built spec file (read once).
+        """
+        with open(self.spec_file, 'rb') as f:
+            return f.read()
+
+    @lazy_property
+    def spec_file_gzip_content(self):
+        # type: () -> Optional[bytes]
+        """
+        Content of the gzipped copy of the pre-built spec file (if it exists).
+        """
+        file_name = self.spec_file + '.gz'
+        if os.path.exists(file_name):
+            with open(file_name, 'rb') as f:
+                return f.read()
+
+    @lazy_property
+    def spec_file_content_type(self):
+        # type: () -> str
+        return SPEC_CONTENT_TYPES.get(os.path.splitext(self.spec_file)[1].lower(), 'application/json')
+
+    @lazy_property
+    def spec_file_etag(self):
+        # type: () -> str
+        return generate_etag(self.spec_file_content)
+
+    @lazy_property
+    def spec_file_gzip_etag(self):
+        # type: () -> Optional[str]
+        """
+        Entity tag of the gzipped copy, each content coding has a separate
+        (strong) entity tag.
+        """
+        content = self.spec_file_gzip_content
+        if content is not None:
+            return generate_etag(content)
+
+    def get_spec_file_response(self, request):
+        # type: (BaseHttpRequest) -> HttpResponse
+        """
+        Serve the pre-built spec file (see :py:func:`build`).
+        """
+        content, etag, headers = self.spec_file_content, self.spec_file_etag, {}
+
+        if self.spec_file_gzip_content is not None:
+            headers['Vary'] = 'Accept-Encoding'
+            if accepts_encoding(request.headers.get('ACCEPT_ENCODING'), 'gzip'):
+                content, etag = self.spec_file_gzip_content, self.spec_file_gzip_etag
+                headers['Content-Encoding'] = 'gzip'
+
+        headers['ETag'] = etag
+        if etag_matches(etag, request.headers.get('IF_NONE_MATCH')):
+            headers.pop('Content-Encoding', None)
+            return HttpResponse(None, HTTPStatus.NOT_MODIFIED, headers)
+
+        headers['Content-Type'] = self.spec_file_content_type
+        return HttpResponse(content, headers=headers)
+
     def load_static(self, file_name):
         file_path = os.path.abspath(os.path.join(self.static_path, file_name))
         # This is a security check to ensure this is not abused to
@@ -266,9 +571,17 @@ class SwaggerSpec(ResourceApi):
         except IOError:
             raise HttpError(HTTPStatus.NOT_FOUND, 42)
 
+    @lazy_property
+    def static_assets(self):
+        # type: () -> Dict[str, StaticAsset]
+        """
+        Static assets of the UI (loaded into memory on first use).
+        """
+        return load_static_assets(self.static_path, self.static_cache_control)
+
     @doc.response(HTTPStatus.OK, "HTML content")
     @doc.produces('text/html')
-    def get_ui(self, _):
+    def get_ui(self, request):
         """
         Load the Swagger UI interface
         """
@@ -276,25 +589,107 @@ class SwaggerSpec(ResourceApi):
             content = self.load_static('ui.html')
             if isinstance(content, binary_type):
                 content = content.decode('UTF-8')
-            self._ui_cache = content.replace(u"{{SWAGGER_PATH}}", str(self.swagger_path))
-        return HttpResponse(self._ui_cache, headers={
-            'Content-Type': 'text/html'
-        })
+            content = content.replace(u"{{SWAGGER_PATH}}", str(self.swagger_path))
+            self._ui_cache = StaticAsset(content.encode('UTF-8'), 'text/html')
+        return self._ui_cache.response(request)
 
     @doc.response(HTTPStatus.OK, "HTML content")
-    def get_static(self, _, file_name=None):
+    def get_static(self, request, file_name=None):
         """
         Get static content for UI.
         """
-        content_type = {
-            'ss': 'text/css',
-            'js': 'application/javascript',
-        }.get(file_name[-2:])
-        if not content_type:
+        asset = self.static_assets.get(file_name)
+        if asset is None:
             raise HttpError(HTTPStatus.NOT_FOUND, 42)
+        return asset.response(request)
 
-        return HttpResponse(self.load_static(file_name), headers={
-            'Content-Type': content_type,
-            'Content-Encoding': 'gzip',
-            'Cache-Control': 'public, max-age=300',
-        })
+
+def find_spec(container):
+    # type: (Any) -> Optional[SwaggerSpec]
+    """
+    Find the first :py:class:`SwaggerSpec` within an API structure.
+    """
+    if isinstance(container, SwaggerSpec):
+        return container
+    for child in getattr(container, 'containers', ()):
+        spec = find_spec(child)
+        if spec:
+            return spec
+
+
+def import_api(api_path):
+    # type: (str) -> Any
+    """
+    Import an API from a ``module:attribute`` path.
+    """
+    module_name, _, attr = api_path.partition(':')
+    if not (module_name and attr):
+        raise ValueError("API must be specified in the form module:attribute")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def build(api, output, host=None, compress=True):
+    # type: (Any, str, str, bool) -> List[str]
+    """
+    Build the swagger spec of an API (that includes a :py:class:`SwaggerSpec`)
+    and write a minified JSON document (and a gzipped copy) to disk.
+
+    :param api: API interface to document.
+    :param output: File name to write the spec to.
+    :param host: Host serving the API.
+    :param compress: Also write a gzip compressed copy of the spec.
+    :returns: List of files written.
+
+    """
+    spec = find_spec(api)
+    if spec is None:
+        raise ValueError("SwaggerSpec not found in API.")
+
+    content = json_codec.dumps(spec.build_spec(host or spec.host), separators=(',', ':')).encode('UTF-8')
+
+    files = [output]
+    with open(output, 'wb') as f:
+        f.write(content)
+
+    if compress:
+        file_name = output + '.gz'
+        files.append(file_name)
+        with open(file_name, 'wb') as f:
+            # Fixed mtime so builds are reproducible
+            with gzip.GzipFile(os.path.basename(output), 'wb', 9, f, mtime=0) as gz:
+                gz.write(content)
+
+    return files
+
+
+def main(argv=None):
+    # type: (List[str]) -> int
+    parser = argparse.ArgumentParser(prog='python -m odinweb.swagger', description="Swagger spec tools.")
+    commands = parser.add_subparsers(dest='command')
+
+    build_parser = commands.add_parser('build', help="Build the swagger spec of an API.")
+    build_parser.add_argument('api', help="API interface to document in the form module:attribute.")
+    build_parser.add_argument('-o', '--output', default='swagger.json', help="File to write the spec to.")
+    build_parser.add_argument('--host', help="Host serving the API.")
+    build_parser.add_argument('--no-gzip', dest='compress', action='store_false',
+                              help="Do not write a gzip compressed copy of the spec.")
+
+    args = parser.parse_args(argv)
+    if args.command != 'build':
+        parser.print_help()
+        return 1
+
+    try:
+        files = build(import_api(args.api), args.output, args.host, args.compress)
+    except (ImportError, AttributeError, ValueError) as ex:
+        parser.error(str(ex))
+    else:
+        for file_name in files:
+            print("Written: {}".format(file_name))
+        return 0
+
+
+if __name__ == '__main__':
+    # Import from the package so classes match those used by the API
+    from odinweb.swagger import main as _main
+    sys.exit(_main())
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Tracing
+~~~~~~~
+
+Hooks to trace the phases of dispatching a request.
+
+Supply a tracer to an API interface to record a span for each request (with
+child spans for the operation, decoding of request bodies and encoding of
+responses)::
+
+    >>> from odinweb.tracing import InMemoryTracer
+    >>> tracer = InMemoryTracer()
+    >>> api_interface = ApiInterfaceBase(UserApi(), tracer=tracer)
+
+Integrating with a tracing system is a matter of implementing the
+:py:class:`Tracer` and :py:class:`Span` interfaces. The default tracer does
+nothing and tracing adds no overhead to requests.
+
+Trace context is extracted from the `W3C traceparent
+<https://www.w3.org/TR/trace-context/>`_ header of incoming requests, so
+request spans continue the trace of the caller.
+
+The current span is available to callbacks as ``request.trace_span`` (`None`
+if tracing is disabled); use :py:func:`child_span` to trace other work.
+
+"""
+from __future__ import absolute_import
+
+import collections
+import contextlib
+import random
+import re
+import threading
+
+from . import _compat
+
+# Imports for typing support
+from typing import Any, Dict, List, Optional  # noqa
+
+__all__ = ('SpanContext', 'Span', 'Tracer', 'RecordedSpan', 'InMemoryTracer', 'child_span')
+
+SpanContext = collections.namedtuple('SpanContext', 'trace_id span_id sampled')
+"""
+Identity of a span (that can be propagated between processes).
+"""
+
+TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+
+def parse_traceparent(value):
+    # type: (Optional[str]) -> Optional[SpanContext]
+    """
+    Parse a *traceparent* header; `None` if the value is missing or invalid.
+    """
+    if not value:
+        return None
+
+    match = TRACEPARENT_RE.match(value.strip().lower())
+    if match is None:
+        return None
+
+    trace_id, span_id, flags = match.groups()
+    if trace_id == '0' * 32 or span_id == '0' * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def format_traceparent(context):
+    # type: (SpanContext) -> str
+    """
+    Format a span context as a *traceparent* header.
+    """
+    return '00-{}-{}-{}'.format(context.trace_id, context.span_id, '01' if context.sampled else '00')
+
+
+def body_size(body):
+    # type: (Any) -> Optional[int]
+    """
+    Size of an (encoded) body; `None` if not known (eg a streaming body).
+    """
+    if isinstance(body, (_compat.text_type, _compat.binary_type)):
+        return len(body)
+
+
+class Span(object):
+    """
+    Interface of a span; the default implementation does nothing.
+
+    Spans are context managers, the span is finished (recording any error)
+    on exit.
+    """
+    context = None  # type: Optional[SpanContext]
+
+    def child(self, name, attributes=None):
+        # type: (str, Dict[str, Any]) -> Span
+        """
+        Start a child span.
+        """
+        return self
+
+    def set_attribute(self, key, value):
+        # type: (str, Any) -> None
+        pass
+
+    def record_exception(self, exception):
+        # type: (BaseException) -> None
+        pass
+
+    def finish(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_value is not None:
+            self.record_exception(exc_value)
+        self.finish()
+
+
+NOOP_SPAN = Span()
+
+
+@contextlib.contextmanager
+def child_span(request, name, attributes=None):
+    """
+    Trace a block with a child of the current span of a request, the child
+    is the current span of the request for the duration of the block.
+
+    The request must be traced (``request.trace_span`` is not `None`).
+    """
+    parent = request.trace_span
+    span = request.trace_span = parent.child(name, attributes)
+    try:
+        with span:
+            yield span
+    finally:
+        request.trace_span = parent
+
+
+class Tracer(object):
+    """
+    Interface of a tracer; the default implementation does nothing (requests
+    are not traced).
+    """
+    enabled = False
+    """
+    Trace requests; if disabled spans are not started.
+    """
+
+    def extract(self, headers):
+        # type: (Dict[str, str]) -> Optional[SpanContext]
+        """
+        Extract the context of a parent span from (normalised) request headers.
+        """
+        return parse_traceparent(headers.get('TRACEPARENT'))
+
+    def inject(self, span, headers):
+        # type: (Span, Dict[str, str]) -> None
+        """
+        Inject the context of a span into headers (eg of an outgoing request).
+        """
+        if span.context is not None:
+            headers['traceparent'] = format_traceparent(span.context)
+
+    def start_span(self, name, parent=None, attributes=None):
+        # type: (str, Optional[SpanContext], Dict[str, Any]) -> Span
+        """
+        Start a span.
+
+        :param name: Name of the span.
+        :param parent: Context of the parent span; a new trace is started if
+            not supplied.
+        :param attributes: Initial attributes of the span.
+
+        """
+        return NOOP_SPAN
+
+
+class RecordedSpan(Span):
+    """
+    Span recorded by the :py:class:`InMemoryTracer`.
+    """
+    def __init__(self, tracer, name, context, parent_id=None, attributes=None):
+        # type: (InMemoryTracer, str, SpanContext, Optional[str], Dict[str, Any]) -> None
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.error = None  # type: Optional[BaseException]
+        self.start = _compat.perf_counter()
+        self.end = None  # type: Optional[float]
+
+    def __repr__(self):
+        return '<RecordedSpan {!r} {}>'.format(self.name, self.context.span_id)
+
+    @property
+    def duration(self):
+        # type: () -> Optional[float]
+        if self.end is not None:
+            return self.end - self.start
+
+    def child(self, name, attributes=None):
+        return self.tracer.start_span(name, self.context, attributes)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exception):
+        self.error = exception
+
+    def finish(self):
+        if self.end is None:
+            self.end = _compat.perf_counter()
+            self.tracer.record(self)
+
+
+class InMemoryTracer(Tracer):
+    """
+    Tracer that records finished spans in memory (eg for testing).
+    """
+    enabled = True
+
+    def __init__(self):
+        self.spans = []  # type: List[RecordedSpan]
+        self._lock = threading.Lock()
+
+    def start_span(self, name, parent=None, attributes=None):
+        span_id = '{:016x}'.format(random.getrandbits(64))
+        if parent is None:
+            context = SpanContext('{:032x}'.format(random.getrandbits(128)), span_id, True)
+            return RecordedSpan(self, name, context, None, attributes)
+
+        context = SpanContext(parent.trace_id, span_id, parent.sampled)
+        return RecordedSpan(self, name, context, parent.span_id, attributes)
+
+    def record(self, span):
+        # type: (RecordedSpan) -> None
+        with self._lock:
+            self.spans.append(span)
+
+    def find(self, name):
+        # type: (str) -> List[RecordedSpan]
+        """
+        Find finished spans by name.
+        """
+        return [span for span in self.spans if span.name == name]
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
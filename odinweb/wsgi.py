@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+WSGI Interface
+~~~~~~~~~~~~~~
+
+A pure WSGI interface for hosting an API without the overhead of a web
+framework::
+
+    >>> from odinweb import api
+    >>> from odinweb.wsgi import WsgiApiInterface
+    >>> application = WsgiApiInterface(
+    ...     api.ApiVersion(
+    ...         UserApi(),
+    ...     )
+    ... )
+
+The WSGI request object parses the ``environ`` lazily, the headers, query
+string, cookies and body are only built when accessed.
+
+"""
+from __future__ import absolute_import
+
+import io
+
+from odin.utils import lazy_property
+
+try:
+    from urllib.parse import parse_qsl
+    from http.cookies import SimpleCookie, CookieError
+except ImportError:
+    from urlparse import parse_qsl
+    from Cookie import SimpleCookie, CookieError
+
+from . import _compat
+from .constants import HTTPStatus, Method
+from .containers import ApiInterfaceBase
+from .data_structures import BaseHttpRequest, HttpResponse, MultiValueDict, StreamingBody
+from .exceptions import ImmediateHttpResponse
+
+# Imports for typing support
+from typing import Dict, Any, Callable, IO, Iterable, List, Tuple  # noqa
+
+FORM_CONTENT_TYPES = ('application/x-www-form-urlencoded',)
+
+
+if _compat.PY2:
+    def _decode_path(value):
+        return value
+else:
+    def _decode_path(value):
+        # PEP 3333 strings are latin-1 decoded bytes
+        try:
+            return value.encode('latin-1').decode('UTF-8')
+        except UnicodeError:
+            return value
+
+
+class LimitedStream(object):
+    """
+    Wrapper around the WSGI input stream that prevents reading beyond the
+    content length (which may block).
+    """
+    def __init__(self, stream, limit):
+        # type: (IO[bytes], int) -> None
+        self._stream = stream
+        self.remaining = limit
+
+    def read(self, size=-1):
+        # type: (int) -> bytes
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        if size <= 0:
+            return b''
+        data = self._stream.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+class WsgiRequest(BaseHttpRequest):
+    """
+    Request object wrapping a WSGI ``environ``.
+    """
+    def __init__(self, environ):
+        # type: (Dict[str, Any]) -> None
+        self._environ = environ
+
+    @property
+    def environ(self):
+        return self._environ
+
+    @lazy_property
+    def method(self):
+        return Method(self._environ['REQUEST_METHOD'].upper())
+
+    @property
+    def scheme(self):
+        return self._environ.get('wsgi.url_scheme', 'http')
+
+    @lazy_property
+    def host(self):
+        environ = self._environ
+        host = environ.get('HTTP_HOST')
+        if not host:
+            host = environ['SERVER_NAME']
+            port = environ.get('SERVER_PORT')
+            if port and port != {'https': '443'}.get(self.scheme, '80'):
+                host = '{}:{}'.format(host, port)
+        return host
+
+    @lazy_property
+    def path_info(self):
+        # type: () -> str
+        """
+        Path of the request relative to the application (used for routing).
+        """
+        return _decode_path(self._environ.get('PATH_INFO', ''))
+
+    @lazy_property
+    def path(self):
+        return _decode_path(self._environ.get('SCRIPT_NAME', '')) + self.path_info
+
+    @lazy_property
+    def query(self):
+        return MultiValueDict(parse_qsl(self._environ.get('QUERY_STRING', ''), keep_blank_values=True))
+
+    @lazy_property
+    def headers(self):
+        headers = MultiValueDict()
+        for key, value in self._environ.items():
+            if key.startswith('HTTP_'):
+                headers[key[5:]] = value
+            elif key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                headers[key] = value
+        return headers
+
+    @property
+    def accepts(self):
+        return self._environ.get('HTTP_ACCEPT')
+
+    @property
+    def content_type(self):
+        return self._environ.get('CONTENT_TYPE')
+
+    @property
+    def origin(self):
+        return self._environ.get('HTTP_ORIGIN')
+
+    @lazy_property
+    def cookies(self):
+        cookies = MultiValueDict()
+        value = self._environ.get('HTTP_COOKIE')
+        if value:
+            cookie = SimpleCookie()
+            try:
+                cookie.load(value)
+            except CookieError:
+                pass
+            else:
+                for key, morsel in cookie.items():
+                    cookies[key] = morsel.value
+        return cookies
+
+    @lazy_property
+    def session(self):
+        # Sessions are not supported by WSGI
+        return MultiValueDict()
+
+    @lazy_property
+    def content_length(self):
+        # type: () -> int
+        try:
+            return max(int(self._environ.get('CONTENT_LENGTH') or 0), 0)
+        except ValueError:
+            return 0
+
+    @lazy_property
+    def body(self):
+        content_length = self.content_length
+        if content_length > 0:
+            return self._environ['wsgi.input'].read(content_length)
+        return b''
+
+    @property
+    def stream(self):
+        # type: () -> IO[bytes]
+        """
+        Request body stream; reads directly from ``wsgi.input`` unless the
+        body has already been read. The ``body`` is not available once the
+        stream has been consumed.
+        """
+        if 'body' in self.__dict__:
+            return io.BytesIO(self.body)
+        return LimitedStream(self._environ['wsgi.input'], self.content_length)
+
+    @lazy_property
+    def form(self):
+        content_type = (self.content_type or '').split(';')[0].strip()
+        if content_type in FORM_CONTENT_TYPES:
+            body = self.body
+            if isinstance(body, bytes) and not _compat.PY2:
+                body = body.decode('latin-1')
+            return MultiValueDict(parse_qsl(body, keep_blank_values=True))
+        return MultiValueDict()
+
+
+def status_line(status):
+    # type: (int) -> str
+    """
+    Generate a WSGI status line from a status code.
+    """
+    try:
+        return '{} {}'.format(status, HTTPStatus(status).phrase)
+    except ValueError:
+        return '{} Unknown'.format(status)
+
+
+def encode_body(body):
+    # type: (Any) -> bytes
+    """
+    Encode a response body into bytes.
+    """
+    if body is None:
+        return b''
+    if isinstance(body, bytes):
+        return body
+    if not isinstance(body, _compat.text_type):
+        body = _compat.text_type(body)
+    return body.encode('UTF-8')
+
+
+class WsgiApiInterface(ApiInterfaceBase):
+    """
+    API interface that is a WSGI application.
+    """
+    request_type = WsgiRequest
+    """
+    Request wrapper class.
+    """
+
+    def handle_request(self, request):
+        # type: (WsgiRequest) -> HttpResponse
+        """
+        Route a request to an operation and dispatch.
+        """
+        try:
+            operation, path_args = self.router.resolve(request.environ['REQUEST_METHOD'], request.path_info)
+        except ImmediateHttpResponse as e:
+            route = self.route_error(request, e)
+            if route is None:
+                return HttpResponse.from_status(e.status, e.headers)
+            operation, path_args = route
+        return self.dispatch(operation, request, **path_args)
+
+    def __call__(self, environ, start_response):
+        # type: (Dict[str, Any], Callable) -> Iterable[bytes]
+        response = self.handle_request(self.request_type(environ))
+
+        headers = [(str(k), str(v)) for k, v in response.headers.items()]
+
+        if response.streaming:
+            # Chunks are written by the server as they are generated, the
+            # server closes the body once the response is sent.
+            start_response(status_line(response.status), headers)
+            body = response.body
+            return StreamingBody((encode_body(chunk) for chunk in body), on_close=getattr(body, 'close', None))
+
+        body = encode_body(response.body)
+        headers.append(('Content-Length', str(len(body))))
+
+        start_response(status_line(response.status), headers)
+        return [body]
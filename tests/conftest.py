@@ -0,0 +1,7 @@
+import sys
+
+collect_ignore = []
+
+if sys.version_info < (3, 5):
+    # Async syntax is not supported
+    collect_ignore.append('test_asgi.py')
@@ -0,0 +1,612 @@
+from __future__ import absolute_import
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from odinweb import api
+from odinweb._compat.aio import AsyncSingleFlight
+from odinweb.asgi import AsgiApiInterface, AsgiRequest
+from odinweb.cache import cache_response, coalesce_requests, LocalMemoryCache
+from odinweb.constants import Method, HTTPStatus
+from odinweb.containers import TIMING_PHASES
+from odinweb.data_structures import HttpResponse
+from odinweb.decorators import Operation
+from odinweb.metrics import Metrics, MetricsApi
+from odinweb.resources import Error
+
+from .resources import User
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class UserApi(api.ResourceApi):
+    resource = User
+
+    @api.listing
+    async def list_users(self, request, offset, limit):
+        await asyncio.sleep(0)
+        return [User(1, 'Dave'), User(2, 'Bob')], 2
+
+    @api.listing(path='stream', stream=True, use_wrapper=False)
+    def stream_users(self, request, offset, limit):
+        return (User(i, 'User {}'.format(i)) for i in range(offset, offset + limit))
+
+    @api.listing(path='broken', stream=True, use_wrapper=False)
+    def broken_users(self, request, offset, limit):
+        def generate():
+            for i in range(offset, offset + limit):
+                if i == 100:
+                    raise ValueError("eek")
+                yield User(i, 'User {}'.format(i))
+        return generate()
+
+    @api.create
+    async def create_user(self, request, user):
+        user.id = 3
+        return user
+
+    @api.detail
+    def get_user(self, request, resource_id):
+        if resource_id == 1:
+            return User(1, 'Dave')
+        raise api.HttpError(api.HTTPStatus.NOT_FOUND)
+
+
+def make_scope(method='GET', path='/', query=b'', headers=None):
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query,
+        'headers': headers or [],
+        'server': ('127.0.0.1', 8000),
+    }
+
+
+def call_app(app, scope, body=b''):
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    run(app(scope, receive, send))
+
+    start, body = sent
+    return start['status'], dict(start['headers']), body['body']
+
+
+class TestAsgiRequest(object):
+    def test_properties(self):
+        target = AsgiRequest(make_scope('POST', '/user', b'a=1&a=2', [
+            (b'host', b'example.com'),
+            (b'content-type', b'application/json'),
+            (b'accept', b'application/json'),
+            (b'x-custom', b'foo'),
+            (b'cookie', b'session=abc'),
+        ]), b'{}')
+
+        assert target.method == Method.POST
+        assert target.scheme == 'http'
+        assert target.host == 'example.com'
+        assert target.path == '/user'
+        assert target.query.getlist('a') == ['1', '2']
+        assert target.headers['X_CUSTOM'] == 'foo'
+        assert target.accepts == 'application/json'
+        assert target.content_type == 'application/json'
+        assert target.cookies['session'] == 'abc'
+        assert target.body == b'{}'
+
+    def test_host__from_server(self):
+        target = AsgiRequest(make_scope())
+
+        assert target.host == '127.0.0.1:8000'
+
+
+class TestAsgiApiInterface(object):
+    @pytest.fixture
+    def target(self):
+        return AsgiApiInterface(api.ApiVersion(UserApi()))
+
+    def test_async_listing(self, target):
+        status, headers, body = call_app(target, make_scope(path='/api/v1/user'))
+
+        assert status == 200
+        assert headers[b'Content-Type'] == b'application/json'
+        assert headers[b'content-length'] == str(len(body)).encode()
+        actual = json.loads(body.decode())
+        assert actual['total_count'] == 2
+        assert [u['name'] for u in actual['results']] == ['Dave', 'Bob']
+
+    def test_async_create(self, target):
+        status, _, body = call_app(target, make_scope('POST', '/api/v1/user', headers=[
+            (b'content-type', b'application/json'),
+        ]), b'{"id": 1, "name": "Eve"}')
+
+        assert status == 200
+        assert json.loads(body.decode())['id'] == 3
+
+    def test_chunked_body(self, target):
+        messages = [
+            {'type': 'http.request', 'body': b'{"id": 1, ', 'more_body': True},
+            {'type': 'http.request', 'body': b'"name": "Eve"}', 'more_body': False},
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        run(target(make_scope('POST', '/api/v1/user', headers=[
+            (b'content-type', b'application/json'),
+        ]), receive, send))
+
+        start, body = sent
+        assert start['status'] == 200
+        assert json.loads(body['body'].decode())['name'] == 'Eve'
+
+    def test_sync_detail(self, target):
+        status, _, body = call_app(target, make_scope(path='/api/v1/user/1'))
+
+        assert status == 200
+        assert json.loads(body.decode())['name'] == 'Dave'
+
+    def test_sync_http_error(self, target):
+        status, _, body = call_app(target, make_scope(path='/api/v1/user/2'))
+
+        assert status == 404
+
+    def test_route_not_found(self, target):
+        status, _, _ = call_app(target, make_scope(path='/api/v1/group'))
+
+        assert status == 404
+
+    def test_route_error__middleware(self):
+        calls = []
+
+        class Middleware(object):
+            def post_request(self, request, response):
+                calls.append(request.current_operation.operation_id)
+                return response
+
+        target = AsgiApiInterface(api.ApiVersion(UserApi()), middleware=[Middleware()])
+
+        status, headers, _ = call_app(target, make_scope('OPTIONS', '/api/v1/user'))
+
+        assert status == 204
+        assert calls == ['odinweb.route_error']
+
+    def test_lifespan(self, target):
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        run(target({'type': 'lifespan'}, receive, send))
+
+        assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+
+    def test_streaming(self, target):
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        run(target(make_scope(path='/api/v1/user/stream', query=b'limit=500'), receive, send))
+
+        start, chunks, end = sent[0], sent[1:-1], sent[-1]
+        assert start['status'] == 200
+        assert b'content-length' not in dict(start['headers'])
+        assert len(chunks) > 1
+        assert all(message['more_body'] for message in chunks)
+        assert not end.get('more_body', False)
+        actual = json.loads(b''.join(message['body'] for message in sent[1:]).decode())
+        assert len(actual) == 500
+
+    @pytest.mark.parametrize('path, expected', (
+        ('/api/v1/user/stream', ['request_finished']),
+        ('/api/v1/user/broken', [('handle_500', 'eek'), 'request_finished']),
+    ))
+    def test_streaming__finished(self, path, expected):
+        calls = []
+
+        class Middleware(object):
+            async def handle_500(self, request, exception):
+                calls.append(('handle_500', str(exception)))
+
+            async def request_finished(self, request):
+                calls.append('request_finished')
+
+        target = AsgiApiInterface(api.ApiVersion(UserApi()), middleware=[Middleware()])
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            # Request is finished once the body has been sent
+            assert calls == []
+            sent.append(message)
+
+        try:
+            run(target(make_scope(path=path, query=b'limit=500'), receive, send))
+        except ValueError:
+            pass
+
+        assert calls == expected
+        assert sent[0]['type'] == 'http.response.start'
+
+
+class TestAsyncDispatch(object):
+    def test_async_middleware(self):
+        calls = []
+
+        class Middleware(object):
+            async def pre_request(self, request, path_args):
+                calls.append('pre_request')
+
+            async def pre_dispatch(self, request, path_args):
+                calls.append('pre_dispatch')
+                path_args['foo'] = 'bar'
+
+            def post_dispatch(self, request, response):
+                calls.append('post_dispatch')
+                return 'eek' + response
+
+            async def post_request(self, request, response):
+                calls.append('post_request')
+                response['test'] = 'header'
+                return response
+
+        async def callback(request, **args):
+            assert args['foo'] == 'bar'
+            return 'boo'
+
+        target = AsgiApiInterface(middleware=[Middleware()])
+        operation = Operation(callback)
+        actual = run(target.dispatch_async(operation, AsgiRequest(make_scope())))
+
+        assert actual.body == '"eekboo"'
+        assert actual.status == 200
+        assert 'test' in actual.headers
+        assert calls == ['pre_request', 'pre_dispatch', 'post_dispatch', 'post_request']
+
+    def test_pre_request_response(self):
+        class Middleware(object):
+            async def pre_request(self, request, path_args):
+                return HttpResponse('eek!', status=HTTPStatus.FORBIDDEN)
+
+        async def callback(request):
+            assert False, "Response should have already occurred!"
+
+        target = AsgiApiInterface(middleware=[Middleware()])
+        actual = run(target.dispatch_async(Operation(callback), AsgiRequest(make_scope())))
+
+        assert actual.status == 403
+
+    def test_request_finished(self):
+        calls = []
+
+        class Middleware(object):
+            async def pre_request(self, request, path_args):
+                return HttpResponse('eek!', status=HTTPStatus.FORBIDDEN)
+
+            async def request_finished(self, request):
+                calls.append('request_finished')
+
+        target = AsgiApiInterface(middleware=[Middleware()])
+        actual = run(target.dispatch_async(Operation(lambda r: None), AsgiRequest(make_scope())))
+
+        assert actual.status == 403
+        assert calls == ['request_finished']
+
+    @pytest.mark.parametrize('error, status', (
+        (api.ImmediateHttpResponse(None, HTTPStatus.NOT_MODIFIED, {}), HTTPStatus.NOT_MODIFIED),
+        (NotImplementedError, 501),
+        (ValueError, 500),
+    ))
+    def test_exceptions(self, error, status):
+        async def callback(request):
+            raise error
+
+        target = AsgiApiInterface()
+        actual = run(target.dispatch_async(Operation(callback), AsgiRequest(make_scope())))
+
+        assert actual.status == status
+
+    def test_async_handle_500(self):
+        class ErrorMiddleware(object):
+            async def handle_500(self, request, exception):
+                return Error.from_status(HTTPStatus.SEE_OTHER, 0, "Quick over there...")
+
+        async def callback(request):
+            raise ValueError()
+
+        target = AsgiApiInterface(middleware=[ErrorMiddleware()])
+        actual = run(target.dispatch_async(Operation(callback), AsgiRequest(make_scope())))
+
+        assert actual.status == 303
+
+    def test_record_timings(self):
+        metrics = Metrics()
+
+        class Reject(object):
+            def pre_request(self, request, path_args):
+                if request.headers.get('X_REJECT'):
+                    return HttpResponse.from_status(HTTPStatus.FORBIDDEN)
+
+        target = AsgiApiInterface(api.ApiVersion(UserApi(), MetricsApi(metrics)), middleware=[metrics, Reject()])
+
+        call_app(target, make_scope(path='/api/v1/user'))
+        call_app(target, make_scope(path='/api/v1/user', headers=[(b'x-reject', b'1')]))
+        call_app(target, make_scope(path='/api/v1/user/2'))
+
+        actual = metrics.snapshot()
+        listing = actual['tests.test_asgi.list_users']
+        assert listing['statuses'] == {200: 1, 403: 1}
+        assert [listing['phases'][p]['count'] for p in TIMING_PHASES] == [2, 1, 1, 1, 1, 1, 1]
+        assert listing['duration']['sum'] > 0
+
+        # Time up to the error is recorded as the callback
+        phases = actual['tests.test_asgi.get_user']['phases']
+        assert [phases.get(p, {}).get('count', 0) for p in TIMING_PHASES] == [1, 1, 1, 1, 0, 1, 1]
+
+        status, _, body = call_app(target, make_scope(path='/api/v1/metrics'))
+        assert status == 200
+        assert json.loads(body.decode())['tests.test_asgi.list_users']['requests'] == 2
+
+    def test_record_timings__cached(self):
+        metrics = Metrics()
+
+        async def callback(request):
+            return User(1, 'Dave')
+
+        operation = cache_response(backend=LocalMemoryCache())(Operation(callback))
+        target = AsgiApiInterface(middleware=[metrics])
+
+        for _ in range(2):
+            run(target.dispatch_async(operation, AsgiRequest(make_scope())))
+
+        phases = metrics.snapshot()[operation.operation_id]['phases']
+        # Cached responses are timed as the callback
+        assert [phases.get(p, {}).get('count', 0) for p in TIMING_PHASES] == [2, 2, 2, 2, 1, 2, 2]
+
+    def test_method_not_allowed(self):
+        async def callback(request):
+            pass
+
+        target = AsgiApiInterface()
+        actual = run(target.dispatch_async(Operation(callback), AsgiRequest(make_scope('POST'))))
+
+        assert actual.status == 405
+
+    @pytest.mark.parametrize('is_async', (True, False))
+    def test_coalesce_requests(self, is_async):
+        calls = []
+        checks = []
+
+        class AuthMiddleware(object):
+            def pre_dispatch(self, request, path_args):
+                checks.append(path_args['resource_id'])
+
+        if is_async:
+            async def callback(request, resource_id):
+                calls.append(resource_id)
+                await asyncio.sleep(0.01)
+                return User(resource_id, 'Dave')
+        else:
+            def callback(request, resource_id):
+                calls.append(resource_id)
+                time.sleep(0.01)
+                return User(resource_id, 'Dave')
+
+        operation = coalesce_requests()(Operation(callback, middleware=[AuthMiddleware()]))
+        target = AsgiApiInterface()
+
+        async def dispatch():
+            return await asyncio.gather(*(
+                target.dispatch_async(operation, AsgiRequest(make_scope()), resource_id=1) for _ in range(4)
+            ))
+
+        actual = run(dispatch())
+
+        assert calls == [1]
+        assert checks == [1] * 4
+        assert [r.status for r in actual] == [200] * 4
+        assert len(set(id(r) for r in actual)) == 4
+        assert len(operation.coalesce.async_flight) == 0
+
+    @pytest.mark.parametrize('is_async', (True, False))
+    def test_cache_response(self, is_async):
+        calls = []
+        checks = []
+
+        class AuthMiddleware(object):
+            def pre_dispatch(self, request, path_args):
+                checks.append(path_args['resource_id'])
+
+        if is_async:
+            async def callback(request, resource_id):
+                calls.append(resource_id)
+                return User(resource_id, 'Dave')
+        else:
+            def callback(request, resource_id):
+                calls.append(resource_id)
+                return User(resource_id, 'Dave')
+
+        backend = LocalMemoryCache()
+        operation = cache_response(backend=backend)(Operation(callback, middleware=[AuthMiddleware()]))
+        target = AsgiApiInterface()
+
+        actual = [
+            run(target.dispatch_async(operation, AsgiRequest(make_scope()), resource_id=resource_id))
+            for resource_id in (1, 1, 2)
+        ]
+
+        assert calls == [1, 2]
+        assert checks == [1, 1, 2]
+        assert [r.status for r in actual] == [200] * 3
+        assert actual[0].body == actual[1].body
+        assert actual[0] is not actual[1]
+        assert len(backend) == 2
+
+    def test_cache_response__not_cacheable(self):
+        calls = []
+
+        async def callback(request):
+            calls.append(request)
+            return User(1, 'Dave')
+
+        backend = LocalMemoryCache()
+        operation = cache_response(backend=backend)(Operation(callback, methods=Method.POST))
+        target = AsgiApiInterface()
+
+        for _ in range(2):
+            run(target.dispatch_async(operation, AsgiRequest(make_scope('POST'))))
+
+        assert len(calls) == 2
+        assert len(backend) == 0
+
+    @pytest.mark.parametrize('cached', (True, False))
+    @pytest.mark.parametrize('is_async', (True, False))
+    def test_hook_order(self, cached, is_async):
+        calls = []
+
+        class Middleware(object):
+            def __init__(self, name):
+                self.name = name
+
+            def pre_dispatch(self, request, path_args):
+                calls.append(('pre_dispatch', self.name))
+
+            def post_dispatch(self, request, response):
+                calls.append(('post_dispatch', self.name))
+                return response
+
+        if is_async:
+            async def callback(request):
+                calls.append('callback')
+                return User(1, 'Dave')
+        else:
+            def callback(request):
+                calls.append('callback')
+                return User(1, 'Dave')
+
+        operation = Operation(callback, middleware=[Middleware('operation')])
+        if cached:
+            operation = cache_response(backend=LocalMemoryCache())(operation)
+        target = AsgiApiInterface(middleware=[Middleware('global')])
+
+        actual = run(target.dispatch_async(operation, AsgiRequest(make_scope())))
+
+        assert actual.status == 200
+        assert calls == [
+            ('pre_dispatch', 'global'),
+            ('pre_dispatch', 'operation'),
+            'callback',
+            ('post_dispatch', 'operation'),
+            ('post_dispatch', 'global'),
+        ]
+
+
+class TestAsyncSingleFlight(object):
+    def test_do__share(self):
+        target = AsyncSingleFlight(share=dict)
+
+        async def func():
+            await asyncio.sleep(0.01)
+            return {'a': 1}
+
+        async def call(modify):
+            result, shared = await target.do('a', func)
+            if modify:
+                result['a'] = 2
+            await asyncio.sleep(0)
+            return result, shared
+
+        async def calls():
+            leader = asyncio.ensure_future(call(True))
+            await asyncio.sleep(0)
+            return await asyncio.gather(leader, call(False))
+
+        (leader, leader_shared), (follower, follower_shared) = run(calls())
+
+        assert not leader_shared and follower_shared
+        assert leader == {'a': 2}
+        assert follower == {'a': 1}
+
+    def test_do__exception(self):
+        target = AsyncSingleFlight()
+
+        async def func():
+            await asyncio.sleep(0.01)
+            raise ValueError()
+
+        async def call():
+            return await asyncio.gather(*(target.do('a', func) for _ in range(3)), return_exceptions=True)
+
+        actual = run(call())
+
+        assert all(isinstance(r, ValueError) for r in actual)
+        assert len(target) == 0
+
+    def test_do__base_exception(self):
+        class Abort(BaseException):
+            pass
+
+        target = AsyncSingleFlight()
+
+        async def func():
+            await asyncio.sleep(0.01)
+            raise Abort()
+
+        async def call():
+            return await asyncio.gather(*(target.do('a', func) for _ in range(3)), return_exceptions=True)
+
+        actual = run(call())
+
+        assert all(isinstance(r, Abort) for r in actual)
+        assert len(target) == 0
+
+    def test_do__leader_cancelled(self):
+        target = AsyncSingleFlight()
+
+        async def func():
+            await asyncio.sleep(0.02)
+            return 'result'
+
+        async def call():
+            leader = asyncio.ensure_future(target.do('a', func))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(target.do('a', func))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await asyncio.gather(leader, follower, return_exceptions=True)
+
+        leader, follower = run(call())
+
+        assert isinstance(leader, asyncio.CancelledError)
+        assert follower == ('result', True)
@@ -0,0 +1,167 @@
+from __future__ import absolute_import
+
+import json
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from odinweb import api
+from odinweb.batch import BatchApi, BatchSubRequest
+from odinweb.constants import Method
+from odinweb.containers import ApiInterfaceBase
+from odinweb.middleware.concurrency import LoadShedding
+from odinweb.testing import MockRequest
+
+from .resources import User
+
+
+class UserApi(api.ResourceApi):
+    resource = User
+
+    @api.listing(use_wrapper=False)
+    def list_users(self, request, offset, limit):
+        return [User(1, 'Dave'), User(2, 'Bob')][offset:offset + limit]
+
+    @api.create
+    def create_user(self, request, user):
+        user.id = 3
+        return user
+
+    @api.detail
+    def get_user(self, request, resource_id):
+        if resource_id == 1:
+            return User(1, request.headers.get('X_NAME', 'Dave'))
+        raise api.HttpError(api.HTTPStatus.NOT_FOUND, 1)
+
+
+def call_batch(interface, sub_requests, **options):
+    request = MockRequest(method=Method.POST, body=json.dumps(sub_requests), **options)
+    operation, path_args = interface.router.resolve(Method.POST, '/api/v1/batch')
+    response = interface.dispatch(operation, request, **path_args)
+    return response.status, json.loads(response.body)
+
+
+class TestBatchApi(object):
+    @pytest.fixture(params=(None, 4))
+    def target(self, request):
+        return ApiInterfaceBase(api.ApiVersion(UserApi(), BatchApi(max_requests=5, max_workers=request.param)))
+
+    def test_execute_batch(self, target):
+        status, actual = call_batch(target, [
+            {'path': '/api/v1/user/1'},
+            {'method': 'GET', 'path': '/api/v1/user?offset=1'},
+            {'method': 'POST', 'path': '/api/v1/user', 'body': {'id': 1, 'name': 'Eve'}},
+            {'path': '/api/v1/user/1', 'headers': {'X-Name': 'Bob'}},
+        ])
+
+        assert status == 200
+        assert [r['status'] for r in actual] == [200, 200, 200, 200]
+        assert actual[0]['body']['name'] == 'Dave'
+        assert [u['name'] for u in actual[1]['body']] == ['Bob']
+        assert actual[1]['headers']['X-Page-Offset'] == '1'
+        assert actual[2]['body']['id'] == 3
+        assert actual[3]['body']['name'] == 'Bob'
+
+    def test_execute_batch__inherit_headers(self, target):
+        status, actual = call_batch(target, [{'path': '/api/v1/user/1'}], headers={'X-Name': 'Eve'})
+
+        assert actual[0]['body']['name'] == 'Eve'
+
+    def test_execute_batch__errors(self, target):
+        status, actual = call_batch(target, [
+            {'path': '/api/v1/user/2'},
+            {'path': '/api/v1/group'},
+            {'method': 'DELETE', 'path': '/api/v1/user'},
+            {'method': 'POST', 'path': '/api/v1/user', 'body': {'name': 'Eve', 'role': 'owner'}},
+            {'method': 'POST', 'path': '/api/v1/batch', 'body': []},
+        ])
+
+        assert status == 200
+        assert [r['status'] for r in actual] == [404, 404, 405, 400, 400]
+        assert actual[0]['body']['code'] == 40401
+        assert actual[2]['headers']['Allow'] == 'GET,POST'
+        assert 'role' in actual[3]['body']['meta']
+        assert actual[4]['body']['code'] == 40001
+
+    def test_execute_batch__method_case(self, target):
+        status, actual = call_batch(target, [
+            {'method': 'get', 'path': '/api/v1/user/1'},
+            {'method': 'Post', 'path': '/api/v1/user', 'body': {'id': 1, 'name': 'Eve'}},
+        ])
+
+        assert status == 200
+        assert [r['status'] for r in actual] == [200, 200]
+
+    def test_execute_batch__load_shedding(self):
+        shedding = LoadShedding(max_concurrency=1)
+        target = ApiInterfaceBase(api.ApiVersion(UserApi(), BatchApi(max_workers=4)), middleware=[shedding])
+
+        status, actual = call_batch(target, [{'path': '/api/v1/user/1'}] * 3)
+
+        assert status == 200
+        assert [r['status'] for r in actual] == [200, 200, 200]
+        assert shedding.shed == 0
+        assert shedding.active == 0
+
+    def test_close(self):
+        batch = BatchApi(max_workers=2)
+        target = ApiInterfaceBase(api.ApiVersion(UserApi(), batch))
+        executor = batch.executor
+        call_batch(target, [{'path': '/api/v1/user/1'}] * 2)
+
+        batch.close()
+
+        assert batch.executor is None
+        with pytest.raises(RuntimeError):
+            executor.submit(lambda: None)
+        status, actual = call_batch(target, [{'path': '/api/v1/user/1'}] * 2)
+        assert [r['status'] for r in actual] == [200, 200]
+
+    def test_close__supplied_executor(self):
+        executor = ThreadPoolExecutor(2)
+        batch = BatchApi(max_workers=4, executor=executor)
+        target = ApiInterfaceBase(api.ApiVersion(UserApi(), batch))
+
+        status, actual = call_batch(target, [{'path': '/api/v1/user/1'}] * 2)
+        batch.close()
+
+        assert [r['status'] for r in actual] == [200, 200]
+        assert executor.submit(lambda: 42).result() == 42
+        executor.shutdown()
+
+    def test_execute_batch__too_many(self, target):
+        status, actual = call_batch(target, [{'path': '/api/v1/user/1'}] * 6)
+
+        assert status == 400
+        assert actual['code'] == 40002
+
+
+class TestBatchSubRequest(object):
+    def test_properties(self):
+        parent = MockRequest(headers={'X-Auth': '123', 'X-Name': 'Dave'}, cookies={'session': 'abc'})
+
+        target = BatchSubRequest(parent, Method.PUT, '/api/v1/user/1?a=1&a=2', {'x-name': 'Bob'}, {'id': 1})
+
+        assert target.method == Method.PUT
+        assert target.path == '/api/v1/user/1'
+        assert target.query.getlist('a') == ['1', '2']
+        assert target.headers['X_AUTH'] == '123'
+        assert target.headers['X_NAME'] == 'Bob'
+        assert parent.headers['X_NAME'] == 'Dave'
+        assert target.cookies['session'] == 'abc'
+        assert target.body == {'id': 1}
+        assert target.host == parent.host
+
+    def test_headers__entity_and_conditional(self):
+        parent = MockRequest(headers={
+            'Content-Type': 'application/json', 'Content-Length': '42',
+            'If-None-Match': '"abc"', 'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT',
+        })
+
+        target = BatchSubRequest(parent, Method.GET, '/api/v1/user/1', {'If-Match': '"def"'})
+
+        assert target.content_type is None
+        assert 'CONTENT_LENGTH' not in target.headers
+        assert 'IF_NONE_MATCH' not in target.headers
+        assert 'IF_MODIFIED_SINCE' not in target.headers
+        assert target.headers['IF_MATCH'] == '"def"'
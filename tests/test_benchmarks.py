@@ -0,0 +1,28 @@
+import pytest
+
+from benchmarks import runner
+
+
+@pytest.mark.parametrize('bench', runner.load_benchmarks(), ids=lambda b: b.name)
+def test_benchmark(bench):
+    # Ensure benchmarks keep working as the API changes
+    bench.prepare()()
+
+
+def test_time_callable():
+    actual = runner.time_callable(lambda: None, min_time=0.001, repeat=3)
+
+    assert actual['number'] > 1
+    assert actual['best'] <= actual['median']
+    assert actual['ops_per_sec'] > 0
+
+
+def test_compare():
+    def results(median, peak_bytes):
+        return {'results': {'a': {'median': median, 'allocations': {'peak_bytes': peak_bytes}}}}
+
+    assert runner.compare(results(1.0, 100), results(1.05, 100))[0]['status'] == 'same'
+    assert runner.compare(results(1.0, 100), results(1.5, 100))[0]['status'] == 'regression'
+    assert runner.compare(results(1.0, 100), results(1.0, 200))[0]['status'] == 'regression'
+    assert runner.compare(results(1.0, 100), results(0.5, 100))[0]['status'] == 'improvement'
+    assert runner.compare(results(1.0, 100), {'results': {'b': {}}}) == []
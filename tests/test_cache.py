@@ -0,0 +1,334 @@
+import json
+import threading
+import time
+
+import pytest
+
+from odinweb import api
+from odinweb.cache import (
+    cache_response, coalesce_requests, CacheBackend, LocalMemoryCache, FileCache, ResponseCache, SingleFlight
+)
+from odinweb.constants import Method
+from odinweb.containers import ApiInterfaceBase
+from odinweb.cors import CORS, AnyOrigin
+from odinweb.data_structures import HttpResponse, StreamingHttpResponse
+from odinweb.exceptions import PermissionDenied
+from odinweb.middleware.compression import Compression
+from odinweb.testing import MockRequest
+
+from .resources import User
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture(params=('memory', 'file'))
+def backend(request, clock, tmpdir):
+    if request.param == 'memory':
+        backend = LocalMemoryCache(max_size=2)
+    else:
+        backend = FileCache(str(tmpdir.join('cache')))
+    backend.timer = clock
+    return backend
+
+
+class TestBackend(object):
+    def test_get_set(self, backend, clock):
+        backend.set(('a', 1), HttpResponse('a'), 10)
+
+        assert backend.get(('a', 1)).body == 'a'
+        assert backend.get(('a', 2)) is None
+
+        clock.now += 10
+        assert backend.get(('a', 1)) is None
+
+    def test_delete_clear(self, backend):
+        backend.set('a', HttpResponse('a'), 10)
+        backend.set('b', HttpResponse('b'), 10)
+
+        backend.delete('a')
+        assert backend.get('a') is None
+        assert backend.get('b').body == 'b'
+
+        backend.clear()
+        assert backend.get('b') is None
+
+    def test_local_memory_lru(self):
+        target = LocalMemoryCache(max_size=2)
+        target.set('a', HttpResponse('a'), 10)
+        target.set('b', HttpResponse('b'), 10)
+        target.get('a')
+        target.set('c', HttpResponse('c'), 10)
+
+        assert target.get('b') is None
+        assert target.get('a').body == 'a'
+        assert len(target) == 2
+
+    def test_interface(self):
+        class PartialBackend(CacheBackend):
+            def get(self, key):
+                return None
+
+        with pytest.raises(TypeError):
+            PartialBackend()
+
+
+class TestResponseCache(object):
+    @pytest.mark.parametrize('uri, headers, method, same', (
+        ('/user?b=1&a=2', {}, Method.GET, True),
+        ('/user?a=2&b=1', {'X-Other': '1'}, Method.GET, True),
+        ('/user?a=2&b=1', {}, Method.HEAD, True),
+        ('/user?a=2', {}, Method.GET, False),
+        ('/user?a=2&b=1&b=2', {}, Method.GET, False),
+        ('/user?a=2&b=1', {'Accept-Language': 'fr'}, Method.GET, False),
+    ))
+    def test_key(self, uri, headers, method, same):
+        target = ResponseCache(vary=('Accept-Language',))
+        operation = api.Operation(lambda r: None)
+        expected = target.key(operation, MockRequest.from_uri('/user?a=2&b=1'), {'id': 1})
+
+        actual = target.key(operation, MockRequest.from_uri(uri, headers, method), {'id': 1})
+
+        assert (actual == expected) is same
+
+    def test_key__not_cacheable(self):
+        target = ResponseCache()
+
+        assert target.key(api.Operation(lambda r: None), MockRequest(method=Method.POST), {}) is None
+
+    @pytest.mark.parametrize('response', (
+        HttpResponse('x', 201),
+        StreamingHttpResponse(['x']),
+    ))
+    def test_set__not_cacheable(self, response):
+        target = ResponseCache(backend=LocalMemoryCache())
+        target.set('a', response)
+
+        assert target.get('a') is None
+
+    def test_get__returns_copy(self):
+        target = ResponseCache(backend=LocalMemoryCache())
+        target.set('a', HttpResponse('x', headers={'Content-Type': 'application/json'}))
+
+        target.get('a')['X-Other'] = '1'
+
+        assert target.get('a').headers == {'Content-Type': 'application/json'}
+
+
+class UserApi(api.ResourceApi):
+    resource = User
+    calls = []
+    backend = LocalMemoryCache()
+
+    @cache_response(ttl=60, backend=backend)
+    @api.listing(use_wrapper=False)
+    def list_users(self, request, offset, limit):
+        self.calls.append('list_users')
+        return [User(1, 'Dave'), User(2, 'Bob')][offset:offset + limit]
+
+    @api.detail
+    @cache_response(ttl=60, backend=backend)
+    def get_user(self, request, resource_id):
+        self.calls.append(resource_id)
+        if request.headers.get('X_DENY'):
+            raise PermissionDenied()
+        return User(resource_id, 'Dave')
+
+
+class TestCacheResponse(object):
+    @pytest.fixture
+    def target(self):
+        UserApi.calls = []
+        UserApi.backend.clear()
+        return CORS(ApiInterfaceBase(UserApi()), origins=AnyOrigin)
+
+    def dispatch(self, target, path, **kwargs):
+        request = MockRequest.from_uri(path, **kwargs)
+        operation, path_args = target.router.resolve(request.method, request.path)
+        return target.dispatch(operation, request, **path_args)
+
+    def test_listing(self, target):
+        first = self.dispatch(target, '/api/user?offset=1')
+        second = self.dispatch(target, '/api/user?offset=1')
+        other = self.dispatch(target, '/api/user')
+
+        assert UserApi.calls == ['list_users', 'list_users']
+        assert first.body == second.body != other.body
+        assert second['Access-Control-Allow-Origin'] == '*'
+
+    def test_detail(self, target):
+        self.dispatch(target, '/api/user/1')
+        self.dispatch(target, '/api/user/1')
+        self.dispatch(target, '/api/user/2')
+
+        assert UserApi.calls == [1, 2]
+
+    def test_errors_not_cached(self, target):
+        self.dispatch(target, '/api/user/1', headers={'X-Deny': '1'})
+        actual = self.dispatch(target, '/api/user/1')
+
+        assert actual.status == 200
+        assert UserApi.calls == [1, 1]
+
+    def test_codec_part_of_key(self, target):
+        self.dispatch(target, '/api/user/1')
+        actual = self.dispatch(target, '/api/user/1', headers={'Accept': 'application/x-yaml'})
+
+        assert actual['Content-Type'] == 'application/x-yaml'
+        assert UserApi.calls == [1, 1]
+
+
+class Abort(BaseException):
+    pass
+
+
+class TestSingleFlight(object):
+    def run_concurrently(self, target, func, count=5):
+        results = []
+        errors = []
+
+        def call():
+            try:
+                results.append(target.do('a', func))
+            except BaseException as ex:
+                errors.append(ex)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_do(self):
+        target = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            release.wait()
+            return 'result'
+
+        timer = threading.Timer(0.1, release.set)
+        timer.start()
+        results, _ = self.run_concurrently(target, func)
+
+        assert calls == [1]
+        assert sorted(results) == [('result', False)] + [('result', True)] * 4
+        assert len(target) == 0
+
+    def test_do__exception(self):
+        target = SingleFlight()
+        release = threading.Event()
+
+        def func():
+            release.wait()
+            raise ValueError('eek')
+
+        timer = threading.Timer(0.1, release.set)
+        timer.start()
+        results, errors = self.run_concurrently(target, func)
+
+        assert results == []
+        assert len(errors) == 5
+        assert len(target) == 0
+
+    def test_do__base_exception(self):
+        target = SingleFlight()
+        release = threading.Event()
+
+        def func():
+            release.wait()
+            raise Abort()
+
+        timer = threading.Timer(0.1, release.set)
+        timer.start()
+        results, errors = self.run_concurrently(target, func)
+
+        assert results == []
+        assert len(errors) == 5
+        assert all(isinstance(e, Abort) for e in errors)
+        assert len(target) == 0
+
+    def test_do__sequential(self):
+        target = SingleFlight()
+
+        assert target.do('a', lambda: 1) == (1, False)
+        assert target.do('a', lambda: 2) == (2, False)
+
+
+class CoalescedUserApi(api.ResourceApi):
+    resource = User
+    calls = []
+    release = threading.Event()
+
+    @coalesce_requests()
+    @api.detail
+    def get_user(self, request, resource_id):
+        self.calls.append(resource_id)
+        self.release.wait()
+        return User(resource_id, 'Dave')
+
+
+class TestCoalesceRequests(object):
+    def test_dispatch(self):
+        CoalescedUserApi.calls = []
+        CoalescedUserApi.release.clear()
+        target = CORS(ApiInterfaceBase(CoalescedUserApi()), origins=AnyOrigin)
+        operation, path_args = target.router.resolve(Method.GET, '/api/user/1')
+        responses = []
+
+        def call():
+            responses.append(target.dispatch(operation, MockRequest(), **path_args))
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        CoalescedUserApi.release.set()
+        for thread in threads:
+            thread.join()
+
+        assert CoalescedUserApi.calls == [1]
+        assert [r.status for r in responses] == [200] * 4
+        assert len(set(r.body for r in responses)) == 1
+        # Each response is a copy
+        assert len(set(id(r.headers) for r in responses)) == 4
+        assert all(r['Access-Control-Allow-Origin'] == '*' for r in responses)
+
+    def test_dispatch__leader_response_modified(self):
+        CoalescedUserApi.calls = []
+        CoalescedUserApi.release.clear()
+        target = ApiInterfaceBase(CoalescedUserApi(), middleware=[Compression(min_size=0)])
+        operation, path_args = target.router.resolve(Method.GET, '/api/user/1')
+        responses = {}
+
+        def call(name, headers):
+            responses[name] = target.dispatch(operation, MockRequest(headers=headers), **path_args)
+
+        leader = threading.Thread(target=call, args=('leader', {'Accept-Encoding': 'gzip'}))
+        leader.start()
+        while not CoalescedUserApi.calls:
+            time.sleep(0.01)
+        follower = threading.Thread(target=call, args=('follower', {}))
+        follower.start()
+        time.sleep(0.1)
+        CoalescedUserApi.release.set()
+        leader.join()
+        follower.join()
+
+        assert CoalescedUserApi.calls == [1]
+        assert responses['leader']['Content-Encoding'] == 'gzip'
+        assert 'Content-Encoding' not in responses['follower'].headers
+        assert json.loads(responses['follower'].body)['name'] == 'Dave'
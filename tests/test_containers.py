@@ -188,6 +188,36 @@ class TestApiContainer(object):
             UrlPath.parse('d/e'): Operation(mock_callback, 'd/e', (Method.POST, Method.PATCH)),
         }
 
+    def test_revision(self):
+        child = containers.ApiContainer(MockResourceApi())
+        target = containers.ApiContainer(child)
+
+        revision = target.revision
+        assert target.revision == revision
+
+        child.changed()
+        assert target.revision > revision
+
+        revision = target.revision
+        child.operation('f')(mock_callback)
+        assert target.revision > revision
+
+        revision = target.revision
+        target.containers.append(MockResourceApi())
+        target.changed()
+        assert target.revision > revision
+
+    def test_revision__replace_container(self):
+        child = containers.ApiContainer(MockResourceApi())
+        child.changed()
+        target = containers.ApiContainer(child)
+
+        revision = target.revision
+        target.containers.remove(child)
+        target.containers.append(containers.ApiContainer(MockResourceApi()))
+        target.changed()
+        assert target.revision > revision
+
 
 class TestApiCollection(object):
     """
@@ -387,6 +417,172 @@ class TestApiInterfaceBase(object):
         assert actual.body == 'eek'
         assert actual.status == 200
 
+    def test_dispatch__operation_middleware_order(self):
+        calls = []
+
+        class Middleware(object):
+            def __init__(self, name, priority):
+                self.name = name
+                self.priority = priority
+
+            def pre_dispatch(self, request, path_args):
+                calls.append(('pre_dispatch', self.name))
+
+            def post_dispatch(self, request, response):
+                calls.append(('post_dispatch', self.name))
+                return response
+
+        def callback(request):
+            calls.append('callback')
+            return 'boo'
+
+        target = containers.ApiInterfaceBase(middleware=[Middleware('global', 1)])
+        operation = Operation(callback, middleware=[Middleware('operation', 2)])
+        actual = target.dispatch(operation, MockRequest())
+
+        assert actual.status == 200
+        assert calls == [
+            ('pre_dispatch', 'global'), ('pre_dispatch', 'operation'),
+            'callback',
+            ('post_dispatch', 'operation'), ('post_dispatch', 'global'),
+        ]
+
+    def test_dispatch__method_not_allowed(self):
+        target = containers.ApiInterfaceBase()
+        operation = Operation(mock_callback, methods=(Method.POST, Method.PUT))
+        actual = target.dispatch(operation, MockRequest(method=Method.GET))
+
+        assert actual.status == 405
+        assert actual.headers['Allow'] == 'POST,PUT'
+
+    @pytest.mark.parametrize('method_name', ('_dispatch', 'dispatch_operation'))
+    def test_dispatch__overridden(self, method_name):
+        calls = []
+
+        class Middleware(object):
+            def pre_request(self, request, path_args):
+                calls.append('pre_request')
+
+            def post_request(self, request, response):
+                calls.append('post_request')
+                return response
+
+        def override(self, operation, request, path_args):
+            calls.append(method_name)
+            return getattr(super(Interface, self), method_name)(operation, request, path_args)
+
+        Interface = type('Interface', (containers.ApiInterfaceBase, ), {method_name: override})
+
+        def callback(request):
+            calls.append('callback')
+            return 'boo'
+
+        target = Interface(middleware=[Middleware()])
+        actual = target.dispatch(Operation(callback), MockRequest())
+
+        assert actual.status == 200
+        assert actual.body == '"boo"'
+        assert calls == ['pre_request', method_name, 'callback', 'post_request']
+
+    def test_codec_cache(self, mocker):
+        target = containers.ApiInterfaceBase()
+        resolve_codecs = mocker.spy(target, '_resolve_codecs')
+
+        for _ in range(3):
+            request = MockRequest(headers={'content-type': 'application/json', 'accepts': 'application/json'})
+            assert target.resolve_codecs(request) is None
+            assert request.request_codec is containers.json_codec
+            assert request.response_codec is containers.json_codec
+
+        request = MockRequest(headers={'content-type': 'application/json', 'accepts': 'text/html'})
+        for _ in range(2):
+            actual = target.resolve_codecs(request)
+            assert actual.status == 406
+
+        assert resolve_codecs.call_count == 2
+        assert len(target.codec_cache) == 2
+
+    @pytest.mark.parametrize('accept, status, response_type', (
+        ('application/yaml;q=0.5, application/json;q=0.9', None, 'json'),
+        ('application/json;q=0.5, application/x-yaml', None, 'yaml'),
+        ('text/html, application/xhtml+xml, */*;q=0.8', None, 'json'),
+        ('text/html, */*;q=0', 406, None),
+    ))
+    def test_resolve_codecs__negotiation(self, accept, status, response_type):
+        target = containers.ApiInterfaceBase()
+        target.registered_codecs = {'application/json': 'json', 'application/yaml': 'yaml'}
+        target.remap_codecs = {'application/x-yaml': 'application/yaml'}
+
+        request = MockRequest(headers={'content-type': 'application/json', 'accept': accept})
+        actual = target.resolve_codecs(request)
+
+        if status:
+            assert actual.status == status
+        else:
+            assert actual is None
+            assert request.response_codec == response_type
+
+    def test_codec_cache__not_cacheable(self):
+        class Interface(containers.ApiInterfaceBase):
+            request_type_resolvers = containers.ApiInterfaceBase.request_type_resolvers + [
+                lambda request: request.query.get('format')
+            ]
+
+        target = Interface()
+
+        assert target.codec_cache is None
+        assert target.resolve_codecs(MockRequest()) is None
+
+    def test_compile(self):
+        target = containers.ApiInterfaceBase(UserApi())
+
+        target.compile()
+
+        assert len(target._pipelines) == 3
+        for _, operation in target.op_paths():
+            assert target.get_pipeline(operation) is target._pipelines[id(operation)][1]
+        assert len(target._pipelines) == 3
+
+    def test_get_pipeline__other_operation(self):
+        target = containers.ApiInterfaceBase()
+        operation = Operation(mock_callback)
+        pipeline = target.get_pipeline(operation)
+
+        # Simulate an operation reusing the id of a collected operation
+        other = Operation(lambda request: 'other')
+        target._pipelines[id(other)] = target._pipelines.pop(id(operation))
+
+        assert target.get_pipeline(other) is not pipeline
+        assert target.dispatch(other, MockRequest()).body == '"other"'
+
+    def test_changed__container_added(self):
+        target = containers.ApiInterfaceBase(UserApi())
+        with pytest.raises(api.HttpError):
+            target.router.resolve(Method.GET, '/api/a/b')
+
+        target.containers.append(MockResourceApi())
+        target.changed()
+
+        operation, _ = target.router.resolve(Method.GET, '/api/a/b')
+        assert operation == Operation(mock_callback, UrlPath.parse('a/b'), Method.GET)
+
+    def test_changed__middleware_added(self):
+        calls = []
+
+        class Middleware(object):
+            def pre_request(self, request, path_args):
+                calls.append('pre_request')
+
+        target = containers.ApiInterfaceBase()
+        operation = Operation(mock_callback)
+        target.dispatch(operation, MockRequest())
+
+        target.middleware.append(Middleware())
+        target.changed()
+        target.dispatch(operation, MockRequest())
+
+        assert calls == ['pre_request']
+
     def test_op_paths(self):
         target = containers.ApiInterfaceBase(MockResourceApi())
 
@@ -4,7 +4,7 @@ import pytest
 import sys
 
 from odinweb.data_structures import HttpResponse, UrlPath, PathParam, _to_swagger, Param, Response, DefaultResponse, \
-    MiddlewareList, DefaultResource, MultiValueDict, MultiValueDictKeyError
+    MiddlewareList, DefaultResource, MultiValueDict, MultiValueDictKeyError, LRUCache
 from odinweb.constants import Type, HTTPStatus, In
 
 from .resources import User
@@ -432,6 +432,12 @@ class MiddlewareC(object):
     def post_request(self):
         pass
 
+    def request_finished(self):
+        pass
+
+    def record_timings(self):
+        pass
+
 
 @pytest.mark.skipif(sys.version_info < (3, 0), reason="requires python3.x")
 class TestMiddlewareList(object):
@@ -472,6 +478,20 @@ class TestMiddlewareList(object):
             count += 1
         assert count == 1
 
+    def test_record_timings(self):
+        count = 0
+        for actual, expected in zip(self.target.record_timings, (MiddlewareC,)):
+            assert actual.__func__.__qualname__ == expected.record_timings.__qualname__
+            count += 1
+        assert count == 1
+
+    def test_request_finished(self):
+        count = 0
+        for actual, expected in zip(self.target.request_finished, (MiddlewareC,)):
+            assert actual.__func__.__qualname__ == expected.request_finished.__qualname__
+            count += 1
+        assert count == 1
+
     def test_post_swagger(self):
         count = 0
         for actual, expected in zip(self.target.post_swagger, (MiddlewareA, MiddlewareB)):
@@ -614,3 +634,44 @@ class TestMultiDict(object):
     def test_key_errors(self, sample_data, attr, args):
         with pytest.raises(MultiValueDictKeyError):
             getattr(sample_data, attr)(*args)
+
+
+class TestLRUCache(object):
+    def test_get_set(self):
+        target = LRUCache(2)
+
+        target['a'] = 1
+        target['b'] = 2
+
+        assert len(target) == 2
+        assert 'a' in target
+        assert target.get('a') == 1
+        assert target.get('c') is None
+        assert target.get('c', 3) == 3
+
+    def test_eviction(self):
+        target = LRUCache(2)
+
+        target['a'] = 1
+        target['b'] = 2
+        target.get('a')  # Make "a" most recently used
+        target['c'] = 3
+
+        assert len(target) == 2
+        assert 'a' in target
+        assert 'b' not in target
+        assert 'c' in target
+
+    def test_pop_clear(self):
+        target = LRUCache()
+        target['a'] = 1
+        target['b'] = 2
+
+        assert target.pop('a') == 1
+        assert target.pop('a') is None
+        target.clear()
+        assert len(target) == 0
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            LRUCache(0)
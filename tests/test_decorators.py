@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 
+import json
 import pytest
 
 from collections import defaultdict
@@ -7,11 +8,12 @@ from odin.exceptions import ValidationError
 
 from odinweb import decorators
 from odinweb.constants import *
-from odinweb.data_structures import NoPath, Param, HttpResponse
+from odinweb.data_structures import NoPath, Param, HttpResponse, UrlPath
 from odinweb.exceptions import HttpError
+from odinweb.resources import Error
 from odinweb.testing import MockRequest
 
-from .resources import User
+from .resources import User, Group
 
 
 class TestOperation(object):
@@ -191,6 +193,20 @@ class TestWrappedListOperation(object):
         assert result.limit == 50
         assert result.total_count == 5
 
+    def test_stream(self):
+        mock_request = MockRequest()
+
+        @decorators.listing(stream=True)
+        def my_func(request, offset, limit):
+            return (i for i in range(3)), 3
+
+        result = my_func(mock_request, {})
+
+        assert result.streaming
+        assert json.loads(''.join(result.body)) == {
+            '$': 'Listing', 'results': [0, 1, 2], 'limit': 50, 'offset': 0, 'total_count': 3
+        }
+
 
 class TestListOperation(object):
     @pytest.mark.parametrize('options, offset, limit', (
@@ -278,6 +294,19 @@ class TestListOperation(object):
         assert result['X-Page-Limit'] == '50'
         assert result['X-Total-Count'] == '5'
 
+    def test_stream(self):
+        mock_request = MockRequest()
+
+        @decorators.listing(use_wrapper=False, stream=True)
+        def my_func(request, offset, limit):
+            return (i for i in range(3)), 3
+
+        result = my_func(mock_request, {})
+
+        assert result.streaming
+        assert ''.join(result.body) == '[0, 1, 2]'
+        assert result['X-Total-Count'] == '3'
+
 
 class TestResourceOperation(object):
     def test_documentation_applied(self):
@@ -307,6 +336,148 @@ class TestResourceOperation(object):
             my_func(request, {})
 
 
+class TestBulkResourceOperation(object):
+    BODY = '[{"id": 1, "name": "Dave"}, {"id": 2}, {"id": 3, "name": "Bob", "role": "owner"}, {"id": 4, "name": "Eve"}]'
+
+    def test_documentation_applied(self):
+        @decorators.bulk_create(resource=User)
+        def my_func(request, users):
+            pass
+
+        assert Param.body() in my_func.parameters
+        assert my_func.url_path == UrlPath.parse('bulk')
+
+    def test_execute(self):
+        @decorators.bulk_create(resource=User)
+        def my_func(request, users):
+            assert all(isinstance(user, User) for user in users)
+            assert [user.name for user in users] == ['Dave', 'Bob']
+            return users
+
+        request = MockRequest(body='[{"id": 1, "name": "Dave"}, {"id": 2, "name": "Bob"}]')
+        result = my_func(request, {})
+
+        assert len(result) == 2
+
+    @pytest.mark.parametrize('decorator, expected', (
+        (decorators.bulk_create, [None, None]),
+        (decorators.bulk_update, [1, 2]),
+    ))
+    def test_execute__key_field(self, decorator, expected):
+        @decorator(resource=Group)
+        def my_func(request, groups):
+            return [group.group_id for group in groups]
+
+        request = MockRequest(body='[{"group_id": 1, "name": "Admin"}, {"group_id": 2, "name": "Users"}]')
+
+        assert my_func(request, {}) == expected
+
+    def test_execute__single(self):
+        @decorators.bulk_update(resource=User)
+        def my_func(request, users):
+            assert [(user.id, user.name) for user in users] == [(1, 'Dave')]
+
+        my_func(MockRequest(body='{"id": 1, "name": "Dave"}'), {})
+
+    def test_execute__atomic_validation_errors(self):
+        calls = []
+
+        @decorators.bulk_update(resource=User)
+        def my_func(request, users):
+            calls.append(users)
+
+        with pytest.raises(ValidationError) as error:
+            my_func(MockRequest(body=self.BODY), {})
+
+        assert not calls
+        assert sorted(error.value.error_messages) == [1, 2]
+        assert 'name' in error.value.error_messages[1]
+        assert 'role' in error.value.error_messages[2]
+
+    def test_execute__multi_status(self):
+        @decorators.bulk_update(resource=User, atomic=False)
+        def my_func(request, users):
+            assert [user.id for user in users] == [1, 4]
+            return [HTTPStatus.CONFLICT]
+
+        result = my_func(MockRequest(body=self.BODY), {})
+
+        assert result.status == 207
+        actual = json.loads(result.body)['results']
+        assert [(r['index'], r['status']) for r in actual] == [(0, 409), (1, 400), (2, 400), (3, 204)]
+        assert 'name' in actual[1]['errors']
+        assert actual[3]['errors'] is None
+
+    def test_execute__multi_status_resources(self):
+        @decorators.bulk_create(resource=User, atomic=False)
+        def my_func(request, users):
+            users[0].id = 10
+            return [users[0], Error.from_status(HTTPStatus.CONFLICT, 0, "Already exists")]
+
+        result = my_func(MockRequest(body=self.BODY), {})
+
+        assert result.status == 207
+        actual = json.loads(result.body)['results']
+        assert [(r['index'], r['status']) for r in actual] == [(0, 201), (1, 400), (2, 400), (3, 409)]
+        assert actual[0]['resource']['id'] == 10
+        assert actual[3]['resource']['message'] == "Already exists"
+
+    def test_execute__multi_status_unsupported_result(self):
+        @decorators.bulk_create(resource=User, atomic=False)
+        def my_func(request, users):
+            return ['created']
+
+        with pytest.raises(TypeError):
+            my_func(MockRequest(body=self.BODY), {})
+
+    def test_execute__multi_status_type_errors(self):
+        @decorators.bulk_update(resource=User, atomic=False)
+        def my_func(request, users):
+            assert [user.id for user in users] == [2]
+
+        body = '[{"id": "one", "name": "Dave"}, {"id": 2, "name": "Bob"}, {"id": "three", "name": "Eve"}]'
+        result = my_func(MockRequest(body=body), {})
+
+        assert result.status == 207
+        actual = json.loads(result.body)['results']
+        assert [(r['index'], r['status']) for r in actual] == [(0, 400), (1, 204), (2, 400)]
+        assert 'id' in actual[0]['errors']
+
+    def test_execute__multi_status_all_invalid(self):
+        calls = []
+
+        @decorators.bulk_update(resource=User, atomic=False)
+        def my_func(request, users):
+            calls.append(users)
+
+        result = my_func(MockRequest(body='[{"id": "one", "name": "Dave"}, {"id": 2}]'), {})
+
+        assert not calls
+        assert result.status == 207
+        actual = json.loads(result.body)['results']
+        assert [(r['index'], r['status']) for r in actual] == [(0, 400), (1, 400)]
+
+    def test_execute__atomic_type_errors(self):
+        @decorators.bulk_update(resource=User)
+        def my_func(request, users):
+            pass
+
+        with pytest.raises(ValidationError) as error:
+            my_func(MockRequest(body='[{"id": 1, "name": "Dave"}, {"id": "two", "name": "Bob"}]'), {})
+
+        assert sorted(error.value.error_messages) == [1]
+
+    def test_execute__max_items(self):
+        @decorators.bulk_create(resource=User, max_items=2)
+        def my_func(request, users):
+            pass
+
+        with pytest.raises(HttpError) as error:
+            my_func(MockRequest(body=self.BODY), {})
+
+        assert error.value.resource.code == 40095
+
+
 @pytest.mark.parametrize('decorator, klass, method', (
     (decorators.listing, decorators.WrappedListOperation, Method.GET),
     (decorators.create, decorators.ResourceOperation, Method.POST),
@@ -314,6 +485,8 @@ class TestResourceOperation(object):
     (decorators.update, decorators.ResourceOperation, Method.PUT),
     (decorators.patch, decorators.ResourceOperation, Method.PATCH),
     (decorators.delete, decorators.Operation, Method.DELETE),
+    (decorators.bulk_create, decorators.BulkResourceOperation, Method.POST),
+    (decorators.bulk_update, decorators.BulkResourceOperation, Method.PUT),
 ))
 def test_endpoint_decorators(decorator, klass, method):
     @decorator
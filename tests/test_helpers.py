@@ -1,14 +1,18 @@
 from __future__ import absolute_import
 
+import io
+import json
 import pytest
 
 from odin.codecs import json_codec
+from odin.exceptions import CodecDecodeError
 
 from odinweb import content_type_resolvers
 from odinweb import helpers
 from odinweb.constants import HTTPStatus
-from odinweb.data_structures import HttpResponse
+from odinweb.data_structures import HttpResponse, StreamingHttpResponse
 from odinweb.exceptions import HttpError
+from odinweb.resources import Listing
 from odinweb.testing import MockRequest
 
 from .resources import User, Group
@@ -26,6 +30,56 @@ def test_parse_content_type(value, expected):
     assert actual == expected
 
 
+def test_generate_etag():
+    actual = helpers.generate_etag(b'abc')
+
+    assert actual == '"a9993e364706816aba3e25717850c26c9cd0d89d"'
+    assert actual != helpers.generate_etag(b'abcd')
+
+
+@pytest.mark.parametrize('etag, if_none_match, expected', (
+    ('"abc"', None, False),
+    ('"abc"', '', False),
+    ('"abc"', '"abc"', True),
+    ('"abc"', '"xyz"', False),
+    ('"abc"', '"xyz", "abc"', True),
+    ('"abc"', 'W/"abc"', True),
+    ('W/"abc"', '"abc"', True),
+    ('"abc"', ' * ', True),
+    ('"abc"', 'abc', False),
+))
+def test_etag_matches(etag, if_none_match, expected):
+    assert helpers.etag_matches(etag, if_none_match) == expected
+
+
+@pytest.mark.parametrize('value, expected', (
+    (None, False),
+    ('gzip', True),
+    ('deflate, GZIP;q=0.5', True),
+    ('gzip;q=0', False),
+    ('br', False),
+    ('*', True),
+    ('*, gzip;q=0', False),
+))
+def test_accepts_encoding(value, expected):
+    assert helpers.accepts_encoding(value, 'gzip') == expected
+
+
+@pytest.mark.parametrize('value, expected', (
+    (None, 'identity'),
+    ('gzip', 'gzip'),
+    ('gzip, deflate, br', 'br'),
+    ('br;q=0.5, gzip', 'gzip'),
+    ('gzip;q=0', 'identity'),
+    ('*', 'br'),
+    ('deflate', 'identity'),
+    ('deflate, identity;q=0', None),
+    ('gzip;q=0, *;q=0', None),
+))
+def test_negotiate_encoding(value, expected):
+    assert helpers.negotiate_encoding(value, ('br', 'gzip', 'identity')) == expected
+
+
 @pytest.mark.parametrize('http_request, expected', (
     (MockRequest(), 'application/json'),
     (MockRequest(headers={'accepts': 'text/html'}), 'text/html'),
@@ -43,6 +97,57 @@ def test_resolve_content_type(http_request, expected):
     assert actual == expected
 
 
+@pytest.mark.parametrize('value, expected', (
+    ('application/json', (('application/json', 1.0),)),
+    ('*', (('*/*', 1.0),)),
+    ('text/*;q=0.5, */*;q=0.1, text/html', (('text/html', 1.0), ('text/*', 0.5), ('*/*', 0.1))),
+    ('*/*, text/*, text/html', (('text/html', 1.0), ('text/*', 1.0), ('*/*', 1.0))),
+    ('application/json;q=0.5, application/msgpack', (('application/msgpack', 1.0), ('application/json', 0.5))),
+    ('a/b;level=1;q=0.2, c/d;q=2, e/f;q=x', (('c/d', 1.0), ('a/b', 0.2), ('e/f', 0.0))),
+    ('Text/HTML, , ', (('text/html', 1.0),)),
+))
+def test_parse_accept_header(value, expected):
+    actual = helpers.parse_accept_header(value)
+
+    assert actual == expected
+    assert helpers.parse_accept_header(value) is actual
+
+
+@pytest.mark.parametrize('value, expected', (
+    ('application/json', 'application/json'),
+    ('application/json; charset=UTF-8', 'application/json'),
+    ('application/msgpack;q=1, application/json;q=0.5', 'application/msgpack'),
+    ('application/msgpack, application/json', 'application/msgpack'),
+    ('application/json, application/msgpack', 'application/json'),
+    ('text/html, application/xhtml+xml, */*;q=0.8', 'application/json'),
+    ('*/*', 'application/json'),
+    ('application/*;q=0.9, application/yaml', 'application/yaml'),
+    ('*/*, application/json;q=0', 'application/msgpack'),
+    ('application/json;q=0', None),
+    ('text/html', None),
+))
+def test_negotiate_content_type(value, expected):
+    actual = helpers.negotiate_content_type(value, ('application/json', 'application/msgpack', 'application/yaml'))
+
+    assert actual == expected
+
+
+@pytest.mark.parametrize('http_request, expected', (
+    (MockRequest(headers={'accept': 'text/html, */*;q=0.8'}), 'application/json'),
+    (MockRequest(headers={'accept': 'application/yaml;q=0.5, application/json;q=0.1'}), 'application/yaml'),
+    (MockRequest(headers={'accept': 'text/html'}), 'text/html'),
+    (MockRequest(headers={'Content-Type': 'application/yaml; charset=UTF-8'}), 'application/yaml'),
+))
+def test_resolve_content_type__negotiated(http_request, expected):
+    actual = helpers.resolve_content_type([
+        content_type_resolvers.accepts_header(),
+        content_type_resolvers.content_type_header(),
+        content_type_resolvers.specific_default('application/json'),
+    ], http_request, ('application/json', 'application/yaml'))
+
+    assert actual == expected
+
+
 def test_get_resource():
     request = MockRequest(body='{"$": "tests.User", "id":10, "name": "Dave"}')
     request.request_codec = json_codec
@@ -88,6 +193,184 @@ def test_get_resource__codec_exceptions(body, error_code):
     assert exc_info.value.resource.code == error_code
 
 
+class ChunkedStream(io.BytesIO):
+    """
+    Stream that returns a single byte per read to exercise buffer boundaries.
+    """
+    def read(self, size=-1):
+        return super(ChunkedStream, self).read(1)
+
+
+@pytest.mark.parametrize('body, expected', (
+    (b'[]', []),
+    (b' [ 1 , 22.5, -333 ] ', [1, 22.5, -333]),
+    (b'[{"a": [1, {"b": "]"}]}, "\xe2\x9c\x93", null, true]', [{'a': [1, {'b': ']'}]}, u'\u2713', None, True]),
+    (b'{"a": 1}', [{'a': 1}]),
+    (b'42', [42]),
+    (b'[1e-3, "\\u2713", false] \r\n', [1e-3, u'\u2713', False]),
+    (b'[{"a\\"]": "}\\\\"}, ["[", {}], "\\\\"]', [{'a"]': '}\\'}, ['[', {}], '\\']),
+))
+def test_iterdecode_json(body, expected):
+    assert list(helpers.iterdecode_json(io.BytesIO(body))) == expected
+    assert list(helpers.iterdecode_json(ChunkedStream(body))) == expected
+
+
+@pytest.mark.parametrize('body', (
+    b'',
+    b'[1, 2',
+    b'[1 2]',
+    b'[1, ]',
+    b'[{"a": }]',
+    b'{"a": 1',
+    b'[1]]',
+    b'[1] trailing',
+    b'[1] [2]',
+    b'[1, tru]',
+    b'[1, "a"x]',
+))
+def test_iterdecode_json__invalid(body):
+    with pytest.raises(CodecDecodeError):
+        list(helpers.iterdecode_json(io.BytesIO(body)))
+    with pytest.raises(CodecDecodeError):
+        list(helpers.iterdecode_json(ChunkedStream(body)))
+
+
+@pytest.mark.parametrize('body', (
+    b'[1, x',
+    b'[1, {"a" 1}',
+    b'[1 2',
+    b'[1]]',
+))
+def test_iterdecode_json__fail_fast(body):
+    stream = io.BytesIO(body + b' ' * 100000)
+
+    with pytest.raises(CodecDecodeError):
+        list(helpers.iterdecode_json(stream, chunk_size=64))
+
+    assert stream.tell() <= 128
+
+
+def test_iterdecode_json__incremental():
+    stream = io.BytesIO(b'[' + b', '.join(b'{"id": %d}' % i for i in range(1000)) + b']')
+
+    actual = helpers.iterdecode_json(stream, chunk_size=64)
+
+    assert next(actual) == {'id': 0}
+    assert stream.tell() < 100
+    assert sum(1 for _ in actual) == 999
+
+
+def test_iterdecode_json__large_item():
+    item = {'values': ['x' * 10] * 20000}
+    stream = io.BytesIO(json.dumps([item, 1]).encode())
+
+    assert list(helpers.iterdecode_json(stream, chunk_size=64)) == [item, 1]
+
+
+@pytest.mark.skipif(helpers.msgpack is None, reason="msgpack is not installed")
+@pytest.mark.parametrize('value', (
+    [],
+    [1, 'two', {'three': [3]}],
+    list(range(100)),
+    {'a': 1},
+))
+def test_iterdecode_msgpack(value):
+    body = helpers.msgpack.packb(value, use_bin_type=True)
+
+    assert list(helpers.iterdecode_msgpack(ChunkedStream(body))) == (value if isinstance(value, list) else [value])
+
+
+@pytest.mark.skipif(helpers.msgpack is None, reason="msgpack is not installed")
+@pytest.mark.parametrize('value', (
+    [1, 2],
+    {'a': 1},
+))
+def test_iterdecode_msgpack__trailing_data(value):
+    body = helpers.msgpack.packb(value, use_bin_type=True) + helpers.msgpack.packb(3)
+
+    with pytest.raises(CodecDecodeError):
+        list(helpers.iterdecode_msgpack(io.BytesIO(body)))
+    with pytest.raises(CodecDecodeError):
+        list(helpers.iterdecode_msgpack(ChunkedStream(body)))
+
+
+@pytest.mark.skipif(helpers.msgpack is None, reason="msgpack is not installed")
+def test_iter_resources__msgpack_trailing_data():
+    class Codec(object):
+        CONTENT_TYPE = 'application/x-msgpack'
+
+    body = helpers.msgpack.packb([{'$': 'tests.User', 'id': 10, 'name': 'Dave'}], use_bin_type=True) + b'\x01'
+    request = MockRequest(body=body)
+    request.request_codec = Codec
+
+    with pytest.raises(HttpError) as exc_info:
+        list(helpers.iter_resources(request, User))
+
+    assert exc_info.value.status == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.parametrize('body', (
+    '[{"$": "tests.User", "id": 10, "name": "Dave"}, {"id": 11, "name": "Bob"}]',
+    b'{"$": "tests.User", "id": 10, "name": "Dave"}',
+))
+def test_iter_resources(body):
+    request = MockRequest(body=body)
+    request.request_codec = json_codec
+
+    actual = helpers.get_resource(request, User, allow_multiple=True, stream=True)
+
+    assert not isinstance(actual, list)
+    users = list(actual)
+    assert all(isinstance(user, User) for user in users)
+    assert users[0].id == 10
+    assert users[0].name == 'Dave'
+
+
+def test_iter_resources__errors():
+    request = MockRequest(body='[{"id": "one", "name": "Dave"}, {"id": 2, "name": "Bob"}]')
+    request.request_codec = json_codec
+    errors = {}
+
+    actual = list(helpers.iter_resources(request, User, errors=errors))
+
+    assert actual[0] is None
+    assert actual[1].id == 2
+    assert list(errors) == [0]
+    assert 'id' in errors[0]
+
+
+def test_iter_resources__no_streaming_decoder():
+    class Codec(object):
+        CONTENT_TYPE = 'application/x-custom'
+        loads = staticmethod(json_codec.loads)
+
+    request = MockRequest(body='[{"$": "tests.User", "id": 10, "name": "Dave"}]')
+    request.request_codec = Codec
+
+    users = list(helpers.iter_resources(request, User))
+
+    assert [u.id for u in users] == [10]
+
+
+@pytest.mark.parametrize('body, error_code', (
+    (b'[\xFF]', 40099),  # Invalid UTF-8
+    ('stuff', 40096),
+    ('[{"a":"b,}]', 40096),
+    ('[{"$": "wrong.User", "id":10, "name": "Dave"}]', 40098),
+    ('[{"$": "tests.Group", "group_id":10, "name": "Dave"}]', 40098),
+    ('[[]]', 40098),
+))
+def test_iter_resources__codec_exceptions(body, error_code):
+    request = MockRequest(body=body)
+    request.request_codec = json_codec
+
+    with pytest.raises(HttpError) as exc_info:
+        list(helpers.iter_resources(request, User))
+
+    assert exc_info.value.status == HTTPStatus.BAD_REQUEST
+    assert exc_info.value.resource.code == error_code
+
+
 class TestCreateResponse(object):
     def test_no_body(self):
         request = MockRequest()
@@ -124,3 +407,56 @@ class TestCreateResponse(object):
         assert actual.status == HTTPStatus.CREATED
         assert actual.headers['Content-Type'] == json_codec.CONTENT_TYPE
         assert json_codec.json.loads(actual.body) == {"foo": "bar"}
+
+    def test_stream(self):
+        request = MockRequest()
+
+        actual = helpers.create_response(request, [{"foo": "bar"}], stream=True)
+
+        assert isinstance(actual, StreamingHttpResponse)
+        assert actual.streaming
+        assert actual.status == HTTPStatus.OK
+        assert actual.headers['Content-Type'] == json_codec.CONTENT_TYPE
+        assert json_codec.json.loads(''.join(actual.body)) == [{"foo": "bar"}]
+
+
+@pytest.mark.parametrize('body', (
+    [],
+    [1, 'two', {'three': 3}],
+    (User(1, 'Dave'), User(2, 'Bob')),
+    {'foo': 'bar'},
+    User(1, 'Dave'),
+    Listing([User(1, 'Dave')], 10, 0, 1),
+    Listing(None, 10),
+))
+def test_iterencode_json(body):
+    actual = ''.join(helpers.iterencode_json(body))
+
+    assert json_codec.json.loads(actual) == json_codec.json.loads(json_codec.dumps(body))
+
+
+def test_iterencode_json__generator():
+    actual = ''.join(helpers.iterencode_json(User(i, 'Dave') for i in range(3)))
+
+    assert [u['id'] for u in json_codec.json.loads(actual)] == [0, 1, 2]
+
+
+def test_iterencode__chunked():
+    actual = list(helpers.iterencode(json_codec, list(range(1000)), chunk_size=100))
+
+    assert len(actual) > 1
+    assert all(len(chunk) >= 100 for chunk in actual[:-1])
+    assert json_codec.json.loads(''.join(actual)) == list(range(1000))
+
+
+def test_iterencode__no_streaming_encoder():
+    class Codec(object):
+        CONTENT_TYPE = 'application/x-custom'
+
+        @staticmethod
+        def dumps(body):
+            return repr(body)
+
+    actual = list(helpers.iterencode(Codec, (i for i in range(3))))
+
+    assert actual == ['[0, 1, 2]']
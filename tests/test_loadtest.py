@@ -0,0 +1,69 @@
+import pytest
+
+from benchmarks import loadtest
+
+
+@pytest.fixture
+def spec():
+    return loadtest.LoadSpec.from_dict({
+        'resources': [{'name': 'user', 'fields': 3, 'records': 50}, {'name': 'order', 'fields': 8, 'records': 10}],
+        'mix': {'list': 1, 'detail': 1, 'create': 1, 'patch': 1},
+        'page_size': 5,
+    })
+
+
+class TestLoadSpec(object):
+    def test_generate(self):
+        target = loadtest.LoadSpec.from_dict({'resources': 3, 'fields': 2})
+
+        assert [r.name for r in target.resources] == ['resource0', 'resource1', 'resource2']
+        assert target.resources[0].fields == 2
+        assert target.mix == loadtest.DEFAULT_MIX
+
+    def test_unknown_operation(self):
+        with pytest.raises(ValueError):
+            loadtest.LoadSpec.generate(1, mix={'delete': 1})
+
+    def test_round_trip(self, spec):
+        assert loadtest.LoadSpec.from_dict(spec.to_dict()).to_dict() == spec.to_dict()
+
+
+def test_generate_requests(spec):
+    actual = loadtest.generate_requests(spec, 200, seed=1)
+
+    assert [p.label for p in actual] == [p.label for p in loadtest.generate_requests(spec, 200, seed=1)]
+    assert {p.label for p in actual} == {
+        'user.list', 'user.detail', 'user.create', 'user.patch',
+        'order.list', 'order.detail', 'order.create', 'order.patch',
+    }
+
+
+def test_replay(spec):
+    interface = loadtest.build_interface(spec)
+
+    actual = loadtest.replay(interface, loadtest.generate_requests(spec, 100, seed=1))
+
+    assert len(actual) == 100
+    assert {status for _, status, _ in actual} == {200}
+    assert all(latency > 0 for _, _, latency in actual)
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+
+    assert loadtest.percentile(values, 50) == 50
+    assert loadtest.percentile(values, 99) == 99
+    assert loadtest.percentile(values, 100) == 100
+    assert loadtest.percentile([], 50) == 0.0
+
+
+def test_run(spec):
+    actual = loadtest.run(spec, requests=200, workers=2, seed=1, warmup=10, chunk_size=20)
+
+    assert actual['requests'] == 200
+    operations = actual['operations']
+    assert operations['all']['requests'] == 200
+    assert operations['all']['errors'] == 0
+    assert sum(e['requests'] for label, e in operations.items() if label != 'all') == 200
+    assert operations['user.list']['p50'] <= operations['user.list']['p99'] <= operations['user.list']['max']
+    assert 'user.list' in loadtest.format_report(actual)
@@ -0,0 +1,155 @@
+import json
+
+import pytest
+
+from odinweb import api
+from odinweb.constants import HTTPStatus, Method
+from odinweb.containers import ApiInterfaceBase, TIMING_PHASES
+from odinweb.data_structures import HttpResponse
+from odinweb.metrics import Histogram, Metrics, MetricsApi, OperationMetrics, prometheus_text
+from odinweb.testing import MockRequest
+
+from .resources import User
+
+
+class TestHistogram(object):
+    def test_observe(self):
+        target = Histogram((0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2, 3):
+            target.observe(value)
+
+        actual = target.snapshot()
+
+        assert actual['count'] == 5
+        assert actual['sum'] == pytest.approx(5.65)
+        assert actual['buckets'] == [(0.1, 2), (1, 3)]
+
+
+class TestOperationMetrics(object):
+    def test_record(self):
+        target = OperationMetrics((0.1, 1))
+
+        # Short circuited in pre-request
+        target.record(403, [1.0, 1.05, 0, 0, 0, 0, 0, 0])
+        target.record(200, [1.0, 1.01, 1.02, 1.03, 1.5, 1.51, 1.52, 1.53])
+
+        actual = target.snapshot()
+
+        assert actual['requests'] == 2
+        assert actual['errors'] == 1
+        assert actual['statuses'] == {200: 1, 403: 1}
+        assert actual['duration']['count'] == 2
+        assert actual['duration']['sum'] == pytest.approx(0.58)
+        assert actual['phases']['pre_request']['count'] == 2
+        assert actual['phases']['callback']['buckets'] == [(0.1, 0), (1, 1)]
+        assert actual['phases']['post_request']['count'] == 1
+
+
+class UserApi(api.ResourceApi):
+    resource = User
+
+    @api.listing(use_wrapper=False)
+    def list_users(self, request, offset, limit):
+        return [User(1, 'Dave')]
+
+    @api.detail
+    def get_user(self, request, resource_id):
+        raise api.HttpError(HTTPStatus.NOT_FOUND)
+
+
+class Reject(object):
+    def pre_request(self, request, path_args):
+        if request.headers.get('X_REJECT'):
+            return HttpResponse.from_status(HTTPStatus.FORBIDDEN)
+
+
+class TestMetrics(object):
+    @pytest.fixture
+    def metrics(self):
+        return Metrics()
+
+    @pytest.fixture
+    def target(self, metrics):
+        return ApiInterfaceBase(UserApi(), MetricsApi(metrics), middleware=[metrics, Reject()])
+
+    def dispatch(self, target, path, **headers):
+        operation, path_args = target.router.resolve(Method.GET, path)
+        return target.dispatch(operation, MockRequest(headers=headers), **path_args)
+
+    def test_record(self, target, metrics):
+        self.dispatch(target, '/api/user')
+        self.dispatch(target, '/api/user')
+        self.dispatch(target, '/api/user', X_Reject='1')
+        self.dispatch(target, '/api/user/1')
+
+        actual = metrics.snapshot()
+
+        assert actual['tests.test_metrics.list_users']['statuses'] == {200: 2, 403: 1}
+        assert actual['tests.test_metrics.list_users']['errors'] == 1
+        phases = actual['tests.test_metrics.list_users']['phases']
+        assert [phases[p]['count'] for p in TIMING_PHASES] == [3, 2, 2, 2, 2, 2, 2]
+        assert actual['tests.test_metrics.get_user']['statuses'] == {404: 1}
+
+        metrics.reset()
+        assert metrics.snapshot() == {}
+
+    def test_record__callback_error(self, target, metrics):
+        self.dispatch(target, '/api/user/1')
+
+        phases = metrics.snapshot()['tests.test_metrics.get_user']['phases']
+
+        # Time up to the error is recorded as the callback
+        assert [phases.get(p, {}).get('count', 0) for p in TIMING_PHASES] == [1, 1, 1, 1, 0, 1, 1]
+
+    def test_record__hook_error(self, metrics, caplog):
+        class BrokenTimings(object):
+            def record_timings(self, request, response, marks):
+                raise ValueError('eek')
+
+        target = ApiInterfaceBase(UserApi(), middleware=[BrokenTimings(), metrics])
+
+        actual = self.dispatch(target, '/api/user')
+
+        assert actual.status == 200
+        assert metrics.snapshot()['tests.test_metrics.list_users']['requests'] == 1
+        assert 'Error recording timings' in caplog.text
+
+    def test_metrics_api(self, target):
+        self.dispatch(target, '/api/user')
+
+        actual = self.dispatch(target, '/api/metrics')
+
+        assert actual.status == 200
+        assert json.loads(actual.body)['tests.test_metrics.list_users']['requests'] == 1
+
+    def test_prometheus_api(self, target):
+        self.dispatch(target, '/api/user')
+
+        actual = self.dispatch(target, '/api/metrics/prometheus')
+
+        assert actual.status == 200
+        assert actual['Content-Type'].startswith('text/plain')
+        assert 'odinweb_requests_total{operation="tests.test_metrics.list_users",status="200"} 1\n' in actual.body
+
+    def test_prometheus_disabled(self, metrics):
+        target = ApiInterfaceBase(MetricsApi(metrics, prometheus=False))
+
+        with pytest.raises(api.ImmediateHttpResponse):
+            target.router.resolve(Method.GET, '/api/metrics/prometheus')
+
+
+def test_prometheus_text():
+    metrics = OperationMetrics((0.1,))
+    metrics.record(200, [1.0, 1.0, 1.0, 1.0, 1.05, 1.05, 1.05, 1.05])
+
+    actual = prometheus_text({'a"b': metrics.snapshot()}, prefix='test').splitlines()
+
+    assert actual[:3] == [
+        '# HELP test_requests_total Requests dispatched by operation and response status.',
+        '# TYPE test_requests_total counter',
+        'test_requests_total{operation="a\\"b",status="200"} 1',
+    ]
+    assert 'test_request_duration_seconds_bucket{operation="a\\"b",le="0.1"} 1' in actual
+    assert 'test_request_duration_seconds_bucket{operation="a\\"b",le="+Inf"} 1' in actual
+    assert 'test_request_duration_seconds_count{operation="a\\"b"} 1' in actual
+    assert 'test_phase_duration_seconds_count{operation="a\\"b",phase="callback"} 1' in actual
@@ -0,0 +1,129 @@
+import gzip
+import io
+import zlib
+
+import pytest
+
+from odinweb import api
+from odinweb.containers import ApiInterfaceBase
+from odinweb.cors import CORS, AnyOrigin
+from odinweb.constants import HTTPStatus, Method
+from odinweb.data_structures import HttpResponse, StreamingHttpResponse
+from odinweb.middleware import compression
+from odinweb.testing import MockRequest
+
+from .resources import User
+
+BODY = b'{"results": [' + b', '.join([b'{"id": 1, "name": "Dave"}'] * 100) + b']}'
+
+
+class TestCompress(object):
+    def test_gzip(self):
+        actual = compression.compress(BODY, 'gzip')
+
+        assert gzip.GzipFile(fileobj=io.BytesIO(actual)).read() == BODY
+
+    def test_deflate(self):
+        actual = compression.compress(BODY, 'deflate')
+
+        assert zlib.decompress(actual) == BODY
+
+
+@pytest.mark.parametrize('vary, expected', (
+    (None, 'Accept-Encoding'),
+    ('Origin', 'Origin, Accept-Encoding'),
+    ('origin, accept-encoding', 'origin, accept-encoding'),
+))
+def test_add_vary(vary, expected):
+    response = HttpResponse(None, headers={'Vary': vary} if vary else None)
+
+    compression.add_vary(response, 'Accept-Encoding')
+
+    assert response['Vary'] == expected
+
+
+class TestCompression(object):
+    @pytest.mark.parametrize('accept_encoding, expected', (
+        (None, None),
+        ('gzip', 'gzip'),
+        ('deflate', 'deflate'),
+        ('deflate, gzip', 'gzip'),
+        ('gzip;q=0.5, deflate', 'deflate'),
+        ('br, identity', None),
+        ('*', 'gzip'),
+    ))
+    def test_post_request(self, accept_encoding, expected):
+        target = compression.Compression()
+        headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+        response = HttpResponse(BODY.decode('UTF-8'), headers={'Content-Type': 'application/json'})
+
+        actual = target.post_request(MockRequest(headers=headers), response)
+
+        assert actual.headers.get('Content-Encoding') == expected
+        assert actual['Vary'] == 'Accept-Encoding'
+        if expected == 'gzip':
+            assert gzip.GzipFile(fileobj=io.BytesIO(actual.body)).read() == BODY
+        elif expected == 'deflate':
+            assert zlib.decompress(actual.body) == BODY
+
+    @pytest.mark.parametrize('response', (
+        HttpResponse(BODY[:100]),
+        HttpResponse(None, HTTPStatus.NO_CONTENT),
+        HttpResponse(BODY, HTTPStatus.NOT_MODIFIED),
+        HttpResponse(BODY, headers={'Content-Encoding': 'br'}),
+        HttpResponse(BODY, headers={'Cache-Control': 'public, no-transform'}),
+        HttpResponse(BODY, headers={'Content-Type': 'image/png'}),
+        StreamingHttpResponse([BODY]),
+    ))
+    def test_post_request__not_compressed(self, response):
+        target = compression.Compression(min_size=200, content_types=['application/json', 'image/svg+xml'])
+        response.headers.setdefault('Content-Type', 'application/json; charset=utf-8')
+        body = response.body
+
+        actual = target.post_request(MockRequest(headers={'Accept-Encoding': 'gzip'}), response)
+
+        assert 'Content-Encoding' not in actual.headers or actual['Content-Encoding'] == 'br'
+        assert actual.body is body
+
+    def test_post_request__weak_etag(self):
+        target = compression.Compression()
+        response = HttpResponse(BODY, headers={'ETag': '"abc"'})
+
+        actual = target.post_request(MockRequest(headers={'Accept-Encoding': 'gzip'}), response)
+
+        assert actual['ETag'] == 'W/"abc"'
+
+    def test_post_request__cached(self, mocker):
+        target = compression.Compression(cache_size=2)
+        mocker.spy(compression, 'compress')
+
+        bodies = []
+        for accept_encoding in ('gzip', 'gzip', 'deflate', 'gzip'):
+            response = target.post_request(
+                MockRequest(headers={'Accept-Encoding': accept_encoding}), HttpResponse(BODY)
+            )
+            bodies.append(response.body)
+
+        assert compression.compress.call_count == 2
+        assert bodies[0] is bodies[1] is bodies[3]
+        assert zlib.decompress(bodies[2]) == BODY
+
+    def test_priority(self):
+        class UserApi(api.ResourceApi):
+            resource = User
+
+            @api.listing(use_wrapper=False)
+            def list_users(self, request, offset, limit):
+                return [User(i, 'Dave') for i in range(100)]
+
+        target = ApiInterfaceBase(UserApi())
+        target.middleware.append(compression.Compression())
+        CORS(target, origins=AnyOrigin)
+        request = MockRequest(headers={'Accept-Encoding': 'gzip', 'Origin': 'http://example.com'})
+
+        operation, path_args = target.router.resolve(Method.GET, '/api/user')
+        actual = target.dispatch(operation, request, **path_args)
+
+        assert actual['Content-Encoding'] == 'gzip'
+        assert actual['Access-Control-Allow-Origin'] == '*'
+        assert gzip.GzipFile(fileobj=io.BytesIO(actual.body)).read().startswith(b'[{')
@@ -0,0 +1,168 @@
+import threading
+import time
+
+import pytest
+
+from odinweb import api
+from odinweb.constants import HTTPStatus, Method
+from odinweb.containers import ApiInterfaceBase
+from odinweb.data_structures import HttpResponse
+from odinweb.middleware.concurrency import concurrency_limit, ConcurrencyLimit, LoadShedding
+from odinweb.testing import MockRequest
+
+from .resources import User
+
+
+class TestConcurrencyLimit(object):
+    def test_acquire_release(self):
+        target = ConcurrencyLimit(2)
+
+        assert target.acquire()
+        assert target.acquire()
+        assert not target.acquire()
+        assert (target.active, target.shed, target.timeouts) == (2, 1, 0)
+
+        target.release()
+        assert target.acquire()
+        assert target.active == 2
+
+    def test_unlimited(self):
+        target = ConcurrencyLimit()
+
+        assert all(target.acquire() for _ in range(100))
+        assert target.active == 100
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            ConcurrencyLimit(0)
+
+    def test_queue(self):
+        target = ConcurrencyLimit(1, queue_size=1, timeout=5)
+        target.acquire()
+        results = []
+
+        waiter = threading.Thread(target=lambda: results.append(target.acquire()))
+        waiter.start()
+        time.sleep(0.05)
+
+        # Queue is full
+        assert target.waiting == 1
+        assert not target.acquire()
+
+        target.release()
+        waiter.join()
+
+        assert results == [True]
+        assert (target.active, target.waiting, target.shed) == (1, 0, 1)
+
+    def test_queue__timeout(self):
+        target = ConcurrencyLimit(1, queue_size=1, timeout=0.05)
+        target.acquire()
+
+        assert not target.acquire()
+        assert (target.active, target.waiting, target.shed, target.timeouts) == (1, 0, 1, 1)
+
+
+class UserApi(api.ResourceApi):
+    resource = User
+    release = threading.Event()
+
+    @api.listing(use_wrapper=False)
+    def list_users(self, request, offset, limit):
+        self.release.wait()
+        return [User(1, 'Dave')]
+
+    @concurrency_limit(1)
+    @api.detail
+    def get_user(self, request, resource_id):
+        self.release.wait()
+        if resource_id == 0:
+            raise ValueError("eek")
+        return User(resource_id, 'Dave')
+
+
+class Reject(object):
+    priority = 5
+
+    def pre_request(self, request, path_args):
+        if request.headers.get('X_REJECT'):
+            return HttpResponse.from_status(HTTPStatus.FORBIDDEN)
+
+
+class TestLoadShedding(object):
+    @pytest.fixture
+    def target(self):
+        UserApi.release.clear()
+        UserApi.get_user.concurrency_limit = ConcurrencyLimit(1)
+        target = ApiInterfaceBase(UserApi())
+        target.middleware.append(LoadShedding(max_concurrency=2))
+        target.middleware.append(Reject())
+        return target
+
+    @property
+    def get_user_limit(self):
+        return UserApi.get_user.concurrency_limit
+
+    def dispatch(self, target, path, **headers):
+        operation, path_args = target.router.resolve(Method.GET, path)
+        return target.dispatch(operation, MockRequest(headers=headers), **path_args)
+
+    def dispatch_concurrently(self, target, paths):
+        responses = {}
+
+        def call(path):
+            responses[path] = self.dispatch(target, path)
+
+        threads = [threading.Thread(target=call, args=(path,)) for path in paths]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        return threads, responses
+
+    def test_shed(self, target):
+        shedding = target.middleware[0]
+        threads, responses = self.dispatch_concurrently(target, ('/api/user', '/api/user/1'))
+
+        assert shedding.active == 2
+
+        # Interface limit
+        actual = self.dispatch(target, '/api/user')
+        assert actual.status == 503
+        assert actual['Retry-After'] == '1'
+        assert shedding.shed == 1
+
+        UserApi.release.set()
+        for thread in threads:
+            thread.join()
+
+        assert [r.status for r in responses.values()] == [200, 200]
+        assert shedding.active == 0
+        assert self.get_user_limit.active == 0
+
+    def test_operation_limit(self, target):
+        shedding = target.middleware[0]
+        threads, _ = self.dispatch_concurrently(target, ('/api/user/1',))
+
+        actual = self.dispatch(target, '/api/user/2')
+        assert actual.status == 503
+        assert self.get_user_limit.shed == 1
+        # Interface limit is not used by requests rejected by an operation
+        assert shedding.active == 1
+        assert shedding.shed == 0
+
+        UserApi.release.set()
+        for thread in threads:
+            thread.join()
+
+        assert self.dispatch(target, '/api/user/2').status == 200
+
+    def test_released(self, target):
+        UserApi.release.set()
+
+        # Short circuited by a later pre-request hook
+        assert self.dispatch(target, '/api/user/1', X_Reject='1').status == 403
+        # Error in operation
+        assert self.dispatch(target, '/api/user/0').status == 500
+
+        assert target.middleware[0].active == 0
+        assert self.get_user_limit.active == 0
@@ -0,0 +1,160 @@
+import datetime
+
+import pytest
+
+from odinweb import api
+from odinweb.constants import HTTPStatus, Method
+from odinweb.containers import ApiInterfaceBase
+from odinweb.data_structures import HttpResponse, StreamingHttpResponse
+from odinweb.middleware import conditional
+from odinweb.middleware.compression import Compression
+from odinweb.testing import MockRequest
+
+from .resources import User
+
+LAST_MODIFIED = datetime.datetime(2017, 7, 10, 23, 31, 55)
+
+
+class UserApi(api.ResourceApi):
+    resource = User
+    calls = []
+
+    def user_version(self, request, resource_id):
+        return 3 if resource_id == 1 else None
+
+    def user_last_modified(self, request, resource_id):
+        return LAST_MODIFIED
+
+    @api.listing(use_wrapper=False)
+    def list_users(self, request, offset, limit):
+        self.calls.append('list_users')
+        return [User(1, 'Dave'), User(2, 'Bob')]
+
+    @conditional.conditional(etag=user_version)
+    @api.detail
+    def get_user(self, request, resource_id):
+        self.calls.append('get_user')
+        return User(resource_id, 'Dave')
+
+    @conditional.conditional(last_modified=user_last_modified)
+    @api.action(path='{resource_id}/profile')
+    def get_profile(self, request, resource_id):
+        self.calls.append('get_profile')
+        return User(resource_id, 'Dave')
+
+
+@pytest.fixture
+def user_api():
+    UserApi.calls = []
+    return UserApi()
+
+
+@pytest.fixture
+def target(user_api):
+    target = ApiInterfaceBase(user_api)
+    target.middleware.append(conditional.ConditionalGet())
+    return target
+
+
+def dispatch(target, path, method=Method.GET, **headers):
+    operation, path_args = target.router.resolve(method, path)
+    return target.dispatch(operation, MockRequest(method=method, headers=headers), **path_args)
+
+
+def test_http_date():
+    assert conditional.http_date(LAST_MODIFIED) == 'Mon, 10 Jul 2017 23:31:55 GMT'
+    assert conditional.parse_http_date('Mon, 10 Jul 2017 23:31:55 GMT') == 1499729515
+    assert conditional.parse_http_date('eek') is None
+
+
+class TestConditionalGet(object):
+    def test_body_hash(self, target, user_api):
+        actual = dispatch(target, '/api/user')
+
+        assert actual.status == 200
+        etag = actual['ETag']
+
+        actual = dispatch(target, '/api/user', If_None_Match=etag)
+
+        assert actual.status == 304
+        assert actual.body is None
+        assert actual['ETag'] == etag
+        assert 'Content-Type' not in actual.headers
+        assert user_api.calls == ['list_users', 'list_users']
+
+    def test_body_hash__modified(self, target):
+        actual = dispatch(target, '/api/user', If_None_Match='"abc", W/"def"')
+
+        assert actual.status == 200
+        assert actual.body
+
+    def test_version(self, target, user_api):
+        actual = dispatch(target, '/api/user/1')
+
+        assert actual.status == 200
+        etag = actual['ETag']
+
+        actual = dispatch(target, '/api/user/1', If_None_Match=etag)
+
+        assert actual.status == 304
+        assert actual['ETag'] == etag
+        # Operation was not executed
+        assert user_api.calls == ['get_user']
+
+    def test_version__unknown(self, target, user_api):
+        actual = dispatch(target, '/api/user/2')
+        etag = actual['ETag']
+
+        actual = dispatch(target, '/api/user/2', If_None_Match=etag)
+
+        assert actual.status == 304
+        # Fallback to hashing the body
+        assert user_api.calls == ['get_user', 'get_user']
+
+    @pytest.mark.parametrize('if_modified_since, status', (
+        ('Mon, 10 Jul 2017 23:31:55 GMT', 304),
+        ('Tue, 11 Jul 2017 01:00:00 GMT', 304),
+        ('Mon, 10 Jul 2017 23:00:00 GMT', 200),
+        ('eek', 200),
+    ))
+    def test_last_modified(self, target, user_api, if_modified_since, status):
+        actual = dispatch(target, '/api/user/1/profile', If_Modified_Since=if_modified_since)
+
+        assert actual.status == status
+        assert actual['Last-Modified'] == 'Mon, 10 Jul 2017 23:31:55 GMT'
+        assert len(user_api.calls) == (0 if status == 304 else 1)
+
+    def test_not_get(self, target):
+        operation, path_args = target.router.resolve(Method.GET, '/api/user/1')
+        request = MockRequest(method=Method.POST, headers={'If-None-Match': '*'})
+
+        actual = target.dispatch(operation, request, **path_args)
+
+        assert actual.status == 405
+
+    def test_with_compression(self, target):
+        target.middleware.append(Compression(min_size=1))
+
+        actual = dispatch(target, '/api/user', Accept_Encoding='gzip')
+        assert actual['Content-Encoding'] == 'gzip'
+        assert actual['ETag'].startswith('W/')
+
+        actual = dispatch(target, '/api/user', Accept_Encoding='gzip', If_None_Match=actual['ETag'])
+        assert actual.status == 304
+
+    @pytest.mark.parametrize('response', (
+        HttpResponse('{}', HTTPStatus.CREATED),
+        StreamingHttpResponse(['{}']),
+        HttpResponse({}),
+    ))
+    def test_post_request__ignored(self, response):
+        actual = conditional.ConditionalGet().post_request(MockRequest(), response)
+
+        assert 'ETag' not in actual.headers
+
+    def test_post_request__no_hash(self):
+        response = HttpResponse('{}')
+
+        actual = conditional.ConditionalGet(hash_body=False).post_request(MockRequest(), response)
+
+        assert 'ETag' not in actual.headers
@@ -0,0 +1,228 @@
+import json
+import threading
+
+import pytest
+
+from odinweb import api
+from odinweb.constants import Method
+from odinweb.asgi import AsgiRequest
+from odinweb.containers import ApiInterfaceBase
+from odinweb.middleware.ratelimit import (
+    client_address, rate_limit, Limit, MemoryRateLimitStore, RateLimit, RateLimitStore
+)
+from odinweb.openapi import OpenApiSpec
+from odinweb.swagger import SwaggerSpec
+from odinweb.testing import MockRequest
+
+from .resources import User
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def store(clock):
+    store = MemoryRateLimitStore(shards=2)
+    store.timer = clock
+    return store
+
+
+class UserApi(api.ResourceApi):
+    resource = User
+
+    @api.listing(use_wrapper=False)
+    def list_users(self, request, offset, limit):
+        return [User(1, 'Dave')]
+
+    @rate_limit(2, per=10)
+    @api.detail
+    def get_user(self, request, resource_id):
+        return User(resource_id, 'Dave')
+
+    @api.action(path='{resource_id}/profile')
+    @rate_limit(1, per=1, identity=lambda r: r.headers.get('X_API_KEY'))
+    def get_profile(self, request, resource_id):
+        return User(resource_id, 'Dave')
+
+
+def dispatch(target, path, address='127.0.0.1', **headers):
+    operation, path_args = target.router.resolve(Method.GET, path)
+    request = MockRequest(headers=headers, environ={'REMOTE_ADDR': address})
+    return target.dispatch(operation, request, **path_args)
+
+
+@pytest.mark.parametrize('request_, expected', (
+    (MockRequest(environ={'REMOTE_ADDR': '10.0.0.1'}), '10.0.0.1'),
+    (AsgiRequest({'client': ('10.0.0.2', 1234)}), '10.0.0.2'),
+    (MockRequest(), None),
+))
+def test_client_address(request_, expected):
+    assert client_address(request_) == expected
+
+
+class TestLimit(object):
+    def test_defaults(self):
+        target = Limit(10, per=2)
+
+        assert target.capacity == 10
+        assert target.rate == 5.0
+
+    @pytest.mark.parametrize('count, per', (
+        (0, 1),
+        (1, 0),
+    ))
+    def test_invalid(self, count, per):
+        with pytest.raises(ValueError):
+            Limit(count, per)
+
+
+class TestMemoryRateLimitStore(object):
+    def test_consume(self, store, clock):
+        assert store.consume('a', 1.0, 2) == (True, 1, 0.0)
+        assert store.consume('a', 1.0, 2) == (True, 0, 0.0)
+        assert store.consume('a', 1.0, 2) == (False, 0, 1.0)
+        # Separate bucket
+        assert store.consume('b', 1.0, 2) == (True, 1, 0.0)
+
+        clock.now += 1.5
+        assert store.consume('a', 1.0, 2) == (True, 0.5, 0.0)
+        assert store.consume('a', 1.0, 2) == (False, 0.5, 0.5)
+
+        # Tokens do not exceed capacity
+        clock.now += 100
+        assert store.consume('a', 1.0, 2) == (True, 1, 0.0)
+
+    def test_evict(self, clock):
+        target = MemoryRateLimitStore(shards=1, max_buckets=2)
+        target.timer = clock
+        target.consume('a', 1.0, 2)
+        target.consume('b', 1.0, 2)
+        # Use a so b is the least recently used bucket
+        target.consume('a', 1.0, 2)
+
+        target.consume('c', 1.0, 2)
+        assert len(target) == 2
+
+        # Bucket a is retained (no tokens are left), b was evicted (a new bucket is full)
+        assert target.consume('a', 1.0, 2) == (False, 0, 1.0)
+        assert target.consume('b', 1.0, 2) == (True, 1, 0.0)
+        assert len(target) == 2
+
+    def test_interface(self):
+        with pytest.raises(TypeError):
+            RateLimitStore()
+
+    def test_threads(self):
+        target = MemoryRateLimitStore()
+        results = []
+
+        def consume():
+            for _ in range(50):
+                results.append(target.consume('a', 0.001, 100)[0])
+
+        threads = [threading.Thread(target=consume) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results.count(True) == 100
+
+
+class TestRateLimit(object):
+    @pytest.fixture
+    def target(self, store):
+        target = ApiInterfaceBase(UserApi())
+        target.middleware.append(RateLimit(store=store))
+        return target
+
+    def test_operation_limit(self, target, clock):
+        first = dispatch(target, '/api/user/1')
+        second = dispatch(target, '/api/user/2')
+        limited = dispatch(target, '/api/user/1')
+        other_client = dispatch(target, '/api/user/1', address='10.0.0.1')
+
+        assert first.status == 200
+        assert first['X-RateLimit-Limit'] == '2'
+        assert first['X-RateLimit-Remaining'] == '1'
+        assert first['X-RateLimit-Reset'] == '5'
+        assert second.status == 200
+        assert second['X-RateLimit-Remaining'] == '0'
+        assert limited.status == 429
+        assert limited['Retry-After'] == '5'
+        assert limited['X-RateLimit-Remaining'] == '0'
+        assert other_client.status == 200
+
+        clock.now += 5
+        assert dispatch(target, '/api/user/1').status == 200
+
+    def test_burst_headers(self, store):
+        target = ApiInterfaceBase(UserApi())
+        target.middleware.append(RateLimit(default=Limit(2, per=10, burst=5), store=store))
+
+        actual = dispatch(target, '/api/user')
+
+        assert actual['X-RateLimit-Limit'] == '2'
+        assert actual['X-RateLimit-Remaining'] == '4'
+        assert actual['X-RateLimit-Reset'] == '5'
+
+    def test_no_limit(self, target):
+        for _ in range(5):
+            actual = dispatch(target, '/api/user')
+            assert actual.status == 200
+            assert 'X-RateLimit-Limit' not in actual.headers
+
+    def test_default_limit(self, store):
+        target = ApiInterfaceBase(UserApi())
+        target.middleware.append(RateLimit(default=Limit(1), store=store))
+
+        assert dispatch(target, '/api/user').status == 200
+        assert dispatch(target, '/api/user').status == 429
+        # Operations with a limit use a separate bucket
+        assert dispatch(target, '/api/user/1').status == 200
+
+    def test_identity(self, target):
+        assert dispatch(target, '/api/user/1/profile', X_Api_Key='a').status == 200
+        assert dispatch(target, '/api/user/1/profile', X_Api_Key='a').status == 429
+        assert dispatch(target, '/api/user/1/profile', X_Api_Key='b').status == 200
+        # Requests without an identity are not limited
+        assert dispatch(target, '/api/user/1/profile').status == 200
+        assert dispatch(target, '/api/user/1/profile').status == 200
+
+    def test_headers_disabled(self, store):
+        target = ApiInterfaceBase(UserApi())
+        target.middleware.append(RateLimit(store=store, headers=False))
+
+        assert 'X-RateLimit-Limit' not in dispatch(target, '/api/user/1').headers
+        dispatch(target, '/api/user/1')
+        actual = dispatch(target, '/api/user/1')
+
+        assert actual.status == 429
+        assert actual.headers == {'Retry-After': '5'}
+
+    @pytest.mark.parametrize('spec_type, header', (
+        (SwaggerSpec, {'type': 'integer', 'description': "Number of seconds until a request can be made."}),
+        (OpenApiSpec, {'schema': {'type': 'integer'},
+                       'description': "Number of seconds until a request can be made."}),
+    ))
+    def test_documentation(self, spec_type, header):
+        target = ApiInterfaceBase(UserApi(), spec_type('Test'))
+        target.middleware.append(RateLimit())
+
+        operation, path_args = target.router.resolve(Method.GET, '/api/' + spec_type.api_name)
+        paths = json.loads(target.dispatch(operation, MockRequest()).body)['paths']
+
+        operation_spec = paths['/api/user/{resource_id}']['get']
+        assert operation_spec['x-rateLimit'] == {'limit': 2, 'period': 10, 'burst': 2}
+        assert operation_spec['responses']['429']['headers']['Retry-After'] == header
+        assert '429' not in paths['/api/user']['get']['responses']
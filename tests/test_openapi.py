@@ -0,0 +1,184 @@
+import gc
+import json
+
+import odin
+import pytest
+
+from odin import registration
+
+from odinweb import openapi, swagger
+from odinweb.constants import Method
+from odinweb.containers import ApiInterfaceBase, ApiVersion
+from odinweb.decorators import Operation
+from odinweb.testing import MockRequest
+
+from .resources import User
+
+
+class TestConvertOperation(object):
+    def test_convert_parameter(self):
+        actual = openapi.convert_parameter({
+            'name': 'ids', 'in': 'query', 'type': 'array', 'items': {'type': 'integer'},
+            'collectionFormat': 'csv', 'required': True,
+        })
+
+        assert actual == {
+            'name': 'ids', 'in': 'query', 'required': True,
+            'schema': {'type': 'array', 'items': {'type': 'integer'}},
+        }
+
+    def test_convert_operation(self):
+        actual = openapi.convert_operation({
+            'operationId': 'create',
+            'parameters': [
+                {'name': 'body', 'in': 'body', 'required': True, 'schema': {'$ref': '#/definitions/tests.User'}},
+                {'name': 'dry_run', 'in': 'query', 'type': 'boolean'},
+            ],
+            'responses': {
+                201: {'description': 'Created', 'schema': {'$ref': '#/definitions/tests.User'}},
+                204: {},
+            },
+        }, ['application/json'], ['application/json', 'application/x-yaml'])
+
+        assert actual == {
+            'operationId': 'create',
+            'parameters': [{'name': 'dry_run', 'in': 'query', 'schema': {'type': 'boolean'}}],
+            'requestBody': {
+                'required': True,
+                'content': {'application/json': {'schema': {'$ref': '#/components/schemas/tests.User'}}},
+            },
+            'responses': {
+                '201': {
+                    'description': 'Created',
+                    'content': {
+                        'application/json': {'schema': {'$ref': '#/components/schemas/tests.User'}},
+                        'application/x-yaml': {'schema': {'$ref': '#/components/schemas/tests.User'}},
+                    }
+                },
+                '204': {'description': ''},
+            }
+        }
+
+    def test_convert_operation__form_data(self):
+        actual = openapi.convert_operation({
+            'consumes': ['multipart/form-data'],
+            'parameters': [
+                {'name': 'name', 'in': 'formData', 'type': 'string', 'required': True},
+                {'name': 'age', 'in': 'formData', 'type': 'integer'},
+            ],
+        }, ['application/json'], ['application/json'])
+
+        assert actual == {
+            'requestBody': {'content': {'application/x-www-form-urlencoded': {'schema': {
+                'type': 'object',
+                'properties': {'name': {'type': 'string'}, 'age': {'type': 'integer'}},
+                'required': ['name'],
+            }}}},
+            'responses': {'default': {'description': ''}},
+        }
+
+
+class TestConvertSecurityScheme(object):
+    @pytest.mark.parametrize('definition, expected', (
+        ({'type': 'basic', 'description': 'Basic auth'},
+         {'type': 'http', 'scheme': 'basic', 'description': 'Basic auth'}),
+        ({'type': 'apiKey', 'in': 'header', 'name': 'X-API-Key'},
+         {'type': 'apiKey', 'in': 'header', 'name': 'X-API-Key'}),
+        ({'type': 'http', 'scheme': 'bearer'},
+         {'type': 'http', 'scheme': 'bearer'}),
+    ))
+    def test_convert(self, definition, expected):
+        assert openapi.convert_security_scheme(definition) == expected
+
+    @pytest.mark.parametrize('definition, expected', (
+        ({'type': 'oauth2', 'flow': 'implicit', 'authorizationUrl': 'https://example.com/auth',
+          'scopes': {'read': 'Read access'}},
+         {'implicit': {'authorizationUrl': 'https://example.com/auth', 'scopes': {'read': 'Read access'}}}),
+        ({'type': 'oauth2', 'flow': 'password', 'tokenUrl': 'https://example.com/token'},
+         {'password': {'tokenUrl': 'https://example.com/token', 'scopes': {}}}),
+        ({'type': 'oauth2', 'flow': 'application', 'tokenUrl': 'https://example.com/token', 'scopes': {}},
+         {'clientCredentials': {'tokenUrl': 'https://example.com/token', 'scopes': {}}}),
+        ({'type': 'oauth2', 'flow': 'accessCode', 'authorizationUrl': 'https://example.com/auth',
+          'tokenUrl': 'https://example.com/token', 'scopes': {'write': 'Write access'}},
+         {'authorizationCode': {'authorizationUrl': 'https://example.com/auth', 'tokenUrl': 'https://example.com/token',
+                                'scopes': {'write': 'Write access'}}}),
+    ))
+    def test_convert__oauth2(self, definition, expected):
+        assert openapi.convert_security_scheme(definition) == {'type': 'oauth2', 'flows': expected}
+
+
+class TestOpenApiSpec(object):
+    def test_get_swagger(self):
+        @Operation(path="a/{b:Integer}", methods=Method.POST, resource=User)
+        def my_func(request, b):
+            pass
+
+        target = openapi.OpenApiSpec("Example", schemes='http')
+        ApiInterfaceBase(ApiVersion(target, my_func))
+
+        actual = target.get_swagger(MockRequest())
+
+        assert actual['openapi'] == '3.0.3'
+        assert actual['servers'] == [{'url': 'http://127.0.0.1/api/v1'}]
+        assert actual['paths']['/a/{b}']['parameters'] == [
+            {'in': 'path', 'name': 'b', 'required': True, 'schema': {'type': 'integer'}}
+        ]
+        assert actual['paths']['/a/{b}']['post']['responses']['default']['content']['application/json'] == {
+            'schema': {'$ref': '#/components/schemas/Error'}
+        }
+        assert 'tests.User' in actual['components']['schemas']
+        assert '#/definitions/' not in json.dumps(actual)
+
+    def test_get_swagger__security_schemes(self):
+        class SecureSpec(openapi.OpenApiSpec):
+            def security_definitions(self):
+                return {
+                    'basic': {'type': 'basic'},
+                    'key': {'type': 'apiKey', 'in': 'query', 'name': 'api_key'},
+                    'oauth': {'type': 'oauth2', 'flow': 'password', 'tokenUrl': '/token', 'scopes': {}},
+                }
+
+        target = SecureSpec("Example")
+        ApiInterfaceBase(ApiVersion(target))
+
+        actual = target.get_swagger(MockRequest())['components']['securitySchemes']
+
+        assert actual == {
+            'basic': {'type': 'http', 'scheme': 'basic'},
+            'key': {'type': 'apiKey', 'in': 'query', 'name': 'api_key'},
+            'oauth': {'type': 'oauth2', 'flows': {'password': {'tokenUrl': '/token', 'scopes': {}}}},
+        }
+
+    def test_dispatch(self):
+        target = ApiInterfaceBase(ApiVersion(openapi.OpenApiSpec("Example")))
+        operation, path_args = target.router.resolve(Method.GET, '/api/v1/openapi')
+
+        response = target.dispatch(operation, MockRequest())
+
+        assert response.status == 200
+        assert json.loads(response.body)['info']['title'] == "Example"
+
+
+class TestDefinitionCache(object):
+    def test_shared_definition(self):
+        assert swagger.resource_definition(User) is swagger.resource_definition(User)
+
+    def test_definition_released_with_resource(self):
+        class Temporary(odin.Resource):
+            class Meta:
+                namespace = 'tests'
+
+            name = odin.StringField()
+
+        swagger.resource_definition(Temporary)
+        assert Temporary in swagger._definition_cache
+        size = len(swagger._definition_cache)
+
+        # Resources are also held by the odin registry
+        resources = registration.cache.resources
+        for name in [k for k, v in resources.items() if v is Temporary]:
+            del resources[name]
+        del Temporary
+        gc.collect()
+
+        assert len(swagger._definition_cache) == size - 1
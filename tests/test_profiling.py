@@ -0,0 +1,200 @@
+import json
+import sys
+import time
+
+import pytest
+
+from odinweb import api
+from odinweb.constants import Method
+from odinweb.containers import ApiInterfaceBase
+from odinweb.profiling import (
+    profile_threshold, DirectoryStore, Profile, ProfilesApi, ProfileStore, RingBufferStore, SamplingProfiler,
+    StackSampler
+)
+from odinweb.testing import MockRequest
+
+from .resources import User
+
+
+def busy(duration):
+    end = time.time() + duration
+    while time.time() < end:
+        pass
+
+
+class TestProfile(object):
+    def test_collapsed(self):
+        target = Profile('a.b', 0.5, {'x:main;y:work': 3, 'x:main': 1})
+
+        actual = target.collapsed()
+
+        assert actual == 'x:main 1\nx:main;y:work 3\n'
+        assert Profile.parse_collapsed(actual) == target.samples
+
+    def test_summary(self):
+        target = Profile('a.b', 0.5, {'x:main': 2, 'x:other': 1}, started=10.0, profile_id='abc')
+
+        assert target.summary() == {
+            'id': 'abc', 'operation_id': 'a.b', 'duration': 0.5, 'started': 10.0, 'samples': 3
+        }
+
+
+class TestStackSampler(object):
+    def test_sample(self):
+        target = StackSampler(interval=0.001)
+        previous = sys.getprofile()
+
+        target.start()
+        busy(0.05)
+        duration = target.stop()
+
+        assert sys.getprofile() is previous
+        assert duration >= 0.05
+        assert any(stack.endswith('tests.test_profiling:busy') for stack in target.samples)
+
+    def test_sample__blocking_call(self):
+        target = StackSampler(interval=0.001)
+
+        target.start()
+        time.sleep(0.05)
+        target.stop()
+
+        # Time in the blocking call is attributed to it (weighted by the time passed)
+        sleep_samples = sum(c for s, c in target.samples.items() if s.endswith(';sleep'))
+        assert sleep_samples >= 40
+
+    def test_overlapping(self):
+        first = StackSampler()
+        second = StackSampler()
+
+        assert first.start()
+        assert not second.start()
+        first.stop()
+
+        assert sys.getprofile() is None
+
+    def test_stop__replaced(self):
+        def other(frame, event, arg):
+            pass
+
+        target = StackSampler()
+        target.start()
+        sys.setprofile(other)
+        try:
+            target.stop()
+            assert sys.getprofile() is other
+        finally:
+            sys.setprofile(None)
+
+
+@pytest.fixture(params=('ring', 'directory'))
+def store(request, tmpdir):
+    if request.param == 'ring':
+        return RingBufferStore(size=2)
+    return DirectoryStore(str(tmpdir.join('profiles')), max_profiles=2)
+
+
+class TestStore(object):
+    def test_add_list_get(self, store):
+        for idx in range(3):
+            store.add(Profile('a.b_c', 0.1 * (idx + 1), {'x:main': idx + 1}, started=1000.0 + idx))
+
+        actual = store.list()
+
+        # Only most recent profiles are kept
+        assert [p.started for p in actual] == [1002.0, 1001.0]
+        assert [p.operation_id for p in actual] == ['a.b_c', 'a.b_c']
+        assert actual[0].duration == pytest.approx(0.3)
+
+        profile = store.get(actual[0].profile_id)
+        assert profile.samples == {'x:main': 3}
+        assert store.get('unknown') is None
+
+    def test_directory_traversal(self, tmpdir):
+        target = DirectoryStore(str(tmpdir.join('profiles')))
+        tmpdir.join('secret.collapsed').write('x:main 1\n')
+
+        assert target.get('../secret') is None
+
+    def test_interface(self):
+        with pytest.raises(TypeError):
+            ProfileStore()
+
+
+class UserApi(api.ResourceApi):
+    resource = User
+
+    @api.listing(use_wrapper=False)
+    def list_users(self, request, offset, limit):
+        busy(0.03)
+        return [User(1, 'Dave')]
+
+    @profile_threshold(10)
+    @api.detail
+    def get_user(self, request, resource_id):
+        busy(0.03)
+        return User(resource_id, 'Dave')
+
+
+class TestSamplingProfiler(object):
+    @pytest.fixture
+    def profiler(self):
+        profiler = SamplingProfiler(sample_rate=0.5, threshold=0.01, interval=0.001)
+        profiler.random = lambda: 0.1
+        return profiler
+
+    @pytest.fixture
+    def target(self, profiler):
+        return ApiInterfaceBase(UserApi(), ProfilesApi(profiler.store), middleware=[profiler])
+
+    def dispatch(self, target, path):
+        operation, path_args = target.router.resolve(Method.GET, path)
+        return target.dispatch(operation, MockRequest(), **path_args)
+
+    def test_slow_request(self, target, profiler):
+        self.dispatch(target, '/api/user')
+
+        profiles = profiler.store.list()
+        assert len(profiles) == 1
+        assert profiles[0].operation_id == 'tests.test_profiling.list_users'
+        assert profiles[0].duration >= 0.03
+        assert any('tests.test_profiling:list_users' in stack for stack in profiles[0].samples)
+        assert sys.getprofile() is None
+
+    def test_operation_threshold(self, target, profiler):
+        self.dispatch(target, '/api/user/1')
+
+        assert len(profiler.store) == 0
+
+    def test_overlapping_requests(self, profiler):
+        first, second = MockRequest(), MockRequest()
+        first.current_operation = second.current_operation = UserApi.list_users
+
+        # Requests dispatched by the ASGI interface share a thread
+        profiler.pre_request(first, {})
+        profiler.pre_request(second, {})
+        profiler.request_finished(first)
+        profiler.request_finished(second)
+
+        assert second.profiler is None
+        assert sys.getprofile() is None
+
+    def test_not_sampled(self, target, profiler):
+        profiler.random = lambda: 0.9
+        self.dispatch(target, '/api/user')
+
+        assert len(profiler.store) == 0
+
+    def test_profiles_api(self, target, profiler):
+        self.dispatch(target, '/api/user')
+        profile = profiler.store.list()[0]
+
+        actual = json.loads(self.dispatch(target, '/api/profiles').body)
+        assert actual == [profile.summary()]
+
+        actual = self.dispatch(target, '/api/profiles/' + profile.profile_id)
+        assert actual.status == 200
+        assert actual['Content-Type'].startswith('text/plain')
+        assert actual.body == profile.collapsed()
+
+        assert self.dispatch(target, '/api/profiles/unknown').status == 404
@@ -0,0 +1,113 @@
+from __future__ import absolute_import
+
+import datetime
+import pytest
+
+from odinweb import api
+from odinweb.constants import Method, HTTPStatus
+from odinweb.containers import ApiInterfaceBase
+from odinweb.data_structures import UrlPath
+from odinweb.decorators import Operation
+from odinweb.exceptions import HttpError
+from odinweb.router import Router
+
+from .resources import User
+
+
+def mock_callback(request, **path_args):
+    pass
+
+
+class UserApi(api.ResourceApi):
+    resource = User
+
+    @api.listing
+    def list_users(self, request, offset, limit):
+        pass
+
+    @api.create
+    def create_user(self, request, user):
+        pass
+
+    @api.detail
+    def get_user(self, request, resource_id):
+        pass
+
+    @api.action(path='{resource_id}/start', methods=Method.POST)
+    def start_user(self, request, resource_id):
+        pass
+
+    @api.collection_action(path='me')
+    def current_user(self, request):
+        pass
+
+
+@pytest.fixture
+def target():
+    return Router([
+        (UrlPath.parse('/api/a/b'), Operation(mock_callback, 'a/b', Method.GET)),
+        (UrlPath.parse('/api/a/b'), Operation(mock_callback, 'a/b', Method.POST)),
+        (UrlPath.parse('/api/a/{id:Integer}'), Operation(mock_callback, 'a/{id:Integer}', (Method.GET, Method.PUT))),
+        (UrlPath.parse('/api/a/{slug:String}'), Operation(mock_callback, 'a/{slug:String}', Method.GET)),
+        (UrlPath.parse('/api/c/{code:Regex:[A-Z][A-Z]+}'), Operation(mock_callback, 'c/{code:Regex:[A-Z][A-Z]+}')),
+        (UrlPath.parse('/api/d/{on:Date}/e'), Operation(mock_callback, 'd/{on:Date}/e')),
+        (UrlPath.parse('/'), Operation(mock_callback, '/')),
+    ])
+
+
+class TestRouter(object):
+    @pytest.mark.parametrize('method, path, expected_path, expected_args', (
+        (Method.GET, '/api/a/b', 'a/b', {}),
+        ('POST', '/api/a/b/', 'a/b', {}),
+        ('get', '/api/a/123', 'a/{id:Integer}', {'id': 123}),
+        (Method.PUT, '/api/a/-1', 'a/{id:Integer}', {'id': -1}),
+        (Method.GET, '/api/a/abc', 'a/{slug:String}', {'slug': 'abc'}),
+        (Method.GET, '/api/c/ABC', 'c/{code:Regex:[A-Z][A-Z]+}', {'code': 'ABC'}),
+        (Method.GET, '/api/d/2017-02-01/e', 'd/{on:Date}/e', {'on': datetime.date(2017, 2, 1)}),
+        (Method.GET, '/', '/', {}),
+    ))
+    def test_resolve(self, target, method, path, expected_path, expected_args):
+        operation, path_args = target.resolve(method, path)
+
+        assert operation.url_path == UrlPath.parse(expected_path)
+        assert path_args == expected_args
+
+    @pytest.mark.parametrize('method, path', (
+        (Method.GET, '/api'),
+        (Method.GET, '/api/x'),
+        (Method.GET, '/api/a/b/c'),
+        (Method.GET, '/api/c/A'),
+        (Method.GET, '/api/d/yesterday/e'),
+    ))
+    def test_resolve__not_found(self, target, method, path):
+        with pytest.raises(HttpError) as result:
+            target.resolve(method, path)
+
+        assert result.value.status == HTTPStatus.NOT_FOUND
+
+    @pytest.mark.parametrize('method, path, allow', (
+        (Method.DELETE, '/api/a/b', {'GET', 'POST'}),
+        ('BREW', '/api/a/b', {'GET', 'POST'}),
+        (Method.POST, '/api/a/1', {'GET', 'PUT'}),
+    ))
+    def test_resolve__method_not_allowed(self, target, method, path, allow):
+        with pytest.raises(HttpError) as result:
+            target.resolve(method, path)
+
+        assert result.value.status == HTTPStatus.METHOD_NOT_ALLOWED
+        assert set(result.value.headers['Allow'].split(',')) == allow
+
+    @pytest.mark.parametrize('method, path, callback, expected_args', (
+        (Method.GET, '/api/v1/user', 'list_users', {}),
+        (Method.POST, '/api/v1/user', 'create_user', {}),
+        (Method.GET, '/api/v1/user/me', 'current_user', {}),
+        (Method.GET, '/api/v1/user/42', 'get_user', {'resource_id': 42}),
+        (Method.POST, '/api/v1/user/42/start', 'start_user', {'resource_id': 42}),
+    ))
+    def test_api_interface_router(self, method, path, callback, expected_args):
+        api_interface = ApiInterfaceBase(api.ApiVersion(UserApi()))
+
+        operation, path_args = api_interface.router.resolve(method, path)
+
+        assert operation.base_callback.__name__ == callback
+        assert path_args == expected_args
@@ -1,3 +1,7 @@
+import gzip
+import io
+import json
+import os
 import pytest
 
 from odinweb import swagger, _compat
@@ -159,8 +163,7 @@ class TestSwaggerSpec(object):
             ),
         )
 
-        base.registered_codecs.clear()
-        base.registered_codecs['application/yaml'] = None  # Only the keys are used.
+        base.registered_codecs = {'application/yaml': None}  # Only the keys are used.
 
         actual = target.get_swagger(request)
         expected = {
@@ -224,6 +227,73 @@ class TestSwaggerSpec(object):
         }
         assert actual == expected
 
+    def test_get_swagger__operation_id(self):
+        target = swagger.SwaggerSpec("Example")
+
+        assert target._operations[0].operation_id == 'odinweb.swagger.get_swagger'
+
+    def test_spec_response__cached(self, mocker):
+        @Operation(path="a/{b:String}", methods=Method.POST, resource=User)
+        def my_func(request, b):
+            pass
+
+        target = swagger.SwaggerSpec("Example")
+        version = ApiVersion(target, my_func)
+        ApiInterfaceBase(version)
+        parse_operations = mocker.spy(target, 'parse_operations')
+
+        first = target.spec_response(MockRequest())
+        second = target.spec_response(MockRequest())
+
+        assert first.status == HTTPStatus.OK
+        assert first['Content-Type'] == 'application/json'
+        assert list(json.loads(first.body.decode('UTF-8'))['paths']) == ['/a/{b}']
+        assert second.body is first.body
+        assert second['ETag'] == first['ETag']
+        assert parse_operations.call_count == 1
+
+        # Different hosts generate different specs
+        other = target.spec_response(MockRequest(host='example.com'))
+        assert other['ETag'] != first['ETag']
+        assert parse_operations.call_count == 1
+
+        # Changing the API structure invalidates the cache
+        version.operation('c', methods=Method.GET)(lambda request: None)
+        changed = target.spec_response(MockRequest())
+        assert changed['ETag'] != first['ETag']
+        assert '/c' in json.loads(changed.body.decode('UTF-8'))['paths']
+        assert parse_operations.call_count == 2
+
+    @pytest.mark.parametrize('if_none_match, status', (
+        (None, 200),
+        ('"abc"', 200),
+        ('{etag}', 304),
+        ('"abc", W/{etag}', 304),
+        ('*', 304),
+    ))
+    def test_spec_response__if_none_match(self, if_none_match, status):
+        target = swagger.SwaggerSpec("Example")
+        ApiInterfaceBase(ApiVersion(target))
+        etag = target.spec_response(MockRequest())['ETag']
+
+        headers = {'If-None-Match': if_none_match.format(etag=etag)} if if_none_match else None
+        actual = target.spec_response(MockRequest(headers=headers))
+
+        assert actual.status == status
+        assert actual['ETag'] == etag
+        if status == 304:
+            assert actual.body is None
+
+    def test_dispatch(self):
+        target = swagger.SwaggerSpec("Example", enable_ui=True)
+        api_interface = ApiInterfaceBase(ApiVersion(target))
+
+        operation, path_args = api_interface.router.resolve(Method.GET, '/api/v1/swagger')
+        actual = api_interface.dispatch(operation, MockRequest(), **path_args)
+
+        assert actual.status == HTTPStatus.OK
+        assert json.loads(actual.body.decode('UTF-8'))['basePath'] == '/api/v1'
+
     def test_load_static(self):
         target = swagger.SwaggerSpec("", enable_ui=True)
 
@@ -252,11 +322,12 @@ class TestSwaggerSpec(object):
     def test_get_ui(self):
         target = swagger.SwaggerSpec("")
 
-        actual = target.get_ui(None)
+        actual = target.get_ui(MockRequest())
 
-        assert actual.body.startswith("<!DOCTYPE html>")
+        assert actual.body.startswith(b"<!DOCTYPE html>")
         assert actual.status == HTTPStatus.OK
         assert actual['Content-Type'] == 'text/html'
+        assert 'Content-Encoding' not in actual.headers
 
     @pytest.mark.parametrize('file_name, content_type', (
         ("ui.css", 'text/css'),
@@ -265,17 +336,184 @@ class TestSwaggerSpec(object):
     def test_get_static(self, file_name, content_type):
         target = swagger.SwaggerSpec("")
 
-        actual = target.get_static(None, file_name)
+        actual = target.get_static(MockRequest(headers={'Accept-Encoding': 'gzip'}), file_name)
 
-        # Can't check the body as it is pre-gzipped
         assert actual.status == HTTPStatus.OK
         assert actual['Content-Type'] == content_type
         assert actual['Content-Encoding'] == 'gzip'
+        assert actual['Vary'] == 'Accept-Encoding'
+        with open(os.path.join(target.static_path, file_name), 'rb') as f:
+            assert actual.body == f.read()
+
+    def test_get_static__identity(self):
+        target = swagger.SwaggerSpec("")
+
+        actual = target.get_static(MockRequest(headers={'Accept-Encoding': 'gzip;q=0'}), 'ui.css')
+
+        assert actual.status == HTTPStatus.OK
+        assert 'Content-Encoding' not in actual.headers
+        assert actual.body.startswith(b'.swagger-ui')
+
+    def test_get_static__brotli(self, monkeypatch):
+        class FakeBrotli(object):
+            @staticmethod
+            def compress(content):
+                return b'br:' + content[:10]
+
+        monkeypatch.setattr(swagger, 'brotli', FakeBrotli)
+        asset = swagger.StaticAsset(b'body { color: red; }', 'text/css')
+
+        actual = asset.response(MockRequest(headers={'Accept-Encoding': 'gzip, deflate, br'}))
+        assert actual['Content-Encoding'] == 'br'
+        assert actual.body == b'br:body { col'
+
+        actual = asset.response(MockRequest(headers={'Accept-Encoding': 'gzip, deflate'}))
+        assert actual['Content-Encoding'] == 'gzip'
+
+    def test_get_static__is_cached(self):
+        target_a = swagger.SwaggerSpec("")
+        target_b = swagger.SwaggerSpec("")
+
+        assert target_a.static_assets['ui.css'] is target_b.static_assets['ui.css']
+
+    @pytest.mark.parametrize('method_name, args', (
+        ('get_ui', ()),
+        ('get_static', ('bundle.js',)),
+    ))
+    def test_get_static__if_none_match(self, method_name, args):
+        target = swagger.SwaggerSpec("")
+        method = getattr(target, method_name)
+        headers = {'Accept-Encoding': 'gzip'}
+
+        actual = method(MockRequest(headers=headers), *args)
+        etag = actual['ETag']
+        assert etag.startswith('"')
+
+        headers['If-None-Match'] = etag
+        actual = method(MockRequest(headers=headers), *args)
+        assert actual.status == HTTPStatus.NOT_MODIFIED
+        assert actual.body is None
 
-    def test_get_static__not_found_if_unknown_content_type(self):
+        # Entity tags differ between content codings
+        actual = method(MockRequest(headers={'If-None-Match': etag}), *args)
+        assert actual.status == HTTPStatus.OK
+        assert actual['ETag'] != etag
+
+    @pytest.mark.parametrize('file_name', ('ui.html', 'eek.js', '../swagger.py'))
+    def test_get_static__not_found_if_unknown_content_type(self, file_name):
         target = swagger.SwaggerSpec("")
 
         with pytest.raises(HttpError) as ex:
-            target.get_static(None, 'ui.html')
+            target.get_static(MockRequest(), file_name)
 
         assert ex.value.status == HTTPStatus.NOT_FOUND
+
+
+class TestBuild(object):
+    @pytest.fixture
+    def api_interface(self):
+        @Operation(path="a/{b:String}", methods=Method.POST, resource=User)
+        def my_func(request, b):
+            pass
+
+        return ApiInterfaceBase(ApiVersion(swagger.SwaggerSpec("Example"), my_func))
+
+    def test_build(self, api_interface, tmpdir):
+        output = str(tmpdir.join('swagger.json'))
+
+        actual = swagger.build(api_interface, output, host='example.com')
+
+        assert actual == [output, output + '.gz']
+        with open(output, 'rb') as f:
+            content = f.read()
+        with gzip.open(output + '.gz', 'rb') as f:
+            assert f.read() == content
+        assert b' ' not in content.split(b'"paths"')[0]
+        document = json.loads(content.decode('UTF-8'))
+        assert document['host'] == 'example.com'
+        assert list(document['paths']) == ['/a/{b}']
+
+    def test_build__no_spec(self, tmpdir):
+        with pytest.raises(ValueError):
+            swagger.build(ApiInterfaceBase(ApiVersion()), str(tmpdir.join('swagger.json')))
+
+    def test_main(self, api_interface, tmpdir, monkeypatch):
+        monkeypatch.setattr(swagger, 'import_api', lambda path: api_interface)
+        output = str(tmpdir.join('swagger.json'))
+
+        assert swagger.main(['build', 'my_app:api', '-o', output, '--no-gzip']) == 0
+
+        assert tmpdir.join('swagger.json').check()
+        assert not tmpdir.join('swagger.json.gz').check()
+
+    @pytest.mark.parametrize('api_path', ('my_app', 'odinweb.swagger:missing', 'odinweb.missing:api'))
+    def test_main__invalid_api(self, api_path):
+        with pytest.raises(SystemExit):
+            swagger.main(['build', api_path])
+
+    @pytest.mark.parametrize('headers, content_encoding', (
+        ({}, None),
+        ({'Accept-Encoding': 'gzip, deflate'}, 'gzip'),
+        ({'Accept-Encoding': 'gzip;q=0, identity'}, None),
+    ))
+    def test_spec_file(self, api_interface, tmpdir, headers, content_encoding):
+        output = str(tmpdir.join('swagger.json'))
+        swagger.build(api_interface, output)
+        target = swagger.SwaggerSpec("Example", spec_file=output)
+
+        actual = target.spec_response(MockRequest(headers=headers))
+
+        assert actual.status == HTTPStatus.OK
+        assert actual['Content-Type'] == 'application/json'
+        assert actual['Vary'] == 'Accept-Encoding'
+        assert actual.headers.get('Content-Encoding') == content_encoding
+        body = gzip.GzipFile(fileobj=io.BytesIO(actual.body)).read() if content_encoding else actual.body
+        with open(output, 'rb') as f:
+            assert body == f.read()
+
+        headers = dict(headers, **{'If-None-Match': actual['ETag']})
+        not_modified = target.spec_response(MockRequest(headers=headers))
+        assert not_modified.status == HTTPStatus.NOT_MODIFIED
+        assert not_modified['ETag'] == actual['ETag']
+
+    def test_spec_file__etag_per_encoding(self, api_interface, tmpdir):
+        output = str(tmpdir.join('swagger.json'))
+        swagger.build(api_interface, output)
+        target = swagger.SwaggerSpec("Example", spec_file=output)
+
+        gzipped = target.spec_response(MockRequest(headers={'Accept-Encoding': 'gzip'}))
+        identity = target.spec_response(MockRequest())
+
+        assert gzipped['ETag'] != identity['ETag']
+        # The validator of the gzip copy does not match the identity copy
+        actual = target.spec_response(MockRequest(headers={'If-None-Match': gzipped['ETag']}))
+        assert actual.status == HTTPStatus.OK
+        assert 'Content-Encoding' not in actual.headers
+        assert actual['ETag'] == identity['ETag']
+
+    def test_spec_file__read_once(self, api_interface, tmpdir):
+        output = str(tmpdir.join('swagger.json'))
+        swagger.build(api_interface, output, compress=False)
+        target = swagger.SwaggerSpec("Example", spec_file=output)
+
+        first = target.spec_response(MockRequest())
+        second = target.spec_response(MockRequest())
+
+        assert first.body is second.body
+        assert 'Vary' not in first.headers
+
+    @pytest.mark.parametrize('file_name, content_type', (
+        ('swagger.json', 'application/json'),
+        ('swagger.yaml', 'application/x-yaml'),
+        ('swagger.YML', 'application/x-yaml'),
+        ('swagger', 'application/json'),
+    ))
+    def test_spec_file__content_type(self, tmpdir, file_name, content_type):
+        output = tmpdir.join(file_name)
+        output.write_binary(b'swagger: "2.0"')
+        target = swagger.SwaggerSpec("Example", spec_file=str(output))
+
+        actual = target.spec_response(MockRequest())
+
+        assert actual['Content-Type'] == content_type
+        assert actual.body == b'swagger: "2.0"'
@@ -0,0 +1,176 @@
+import asyncio
+
+import pytest
+
+from odinweb import api
+from odinweb.asgi import AsgiApiInterface, AsgiRequest
+from odinweb.constants import HTTPStatus, Method
+from odinweb.containers import ApiInterfaceBase
+from odinweb.testing import MockRequest
+from odinweb.tracing import (
+    format_traceparent, parse_traceparent, InMemoryTracer, SpanContext, Tracer, NOOP_SPAN
+)
+
+from .resources import User
+
+TRACEPARENT = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+
+
+@pytest.mark.parametrize('value, expected', (
+    (TRACEPARENT, SpanContext('0af7651916cd43dd8448eb211c80319c', 'b7ad6b7169203331', True)),
+    (TRACEPARENT[:-1] + '0', SpanContext('0af7651916cd43dd8448eb211c80319c', 'b7ad6b7169203331', False)),
+    ('00-00000000000000000000000000000000-b7ad6b7169203331-01', None),
+    ('01-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01', None),
+    ('eek', None),
+    (None, None),
+))
+def test_parse_traceparent(value, expected):
+    assert parse_traceparent(value) == expected
+
+
+def test_format_traceparent():
+    assert format_traceparent(parse_traceparent(TRACEPARENT)) == TRACEPARENT
+
+
+class TestTracer(object):
+    def test_noop(self):
+        target = Tracer()
+
+        assert not target.enabled
+        with target.start_span('a') as span:
+            assert span is NOOP_SPAN
+            assert span.child('b') is NOOP_SPAN
+
+    def test_inject(self):
+        target = InMemoryTracer()
+        span = target.start_span('a', parse_traceparent(TRACEPARENT))
+        headers = {}
+
+        target.inject(span, headers)
+
+        assert headers['traceparent'].startswith('00-0af7651916cd43dd8448eb211c80319c-')
+        assert headers['traceparent'] != TRACEPARENT
+
+
+class UserApi(api.ResourceApi):
+    resource = User
+
+    @api.create
+    def create_user(self, request, user):
+        return user
+
+    @api.detail
+    def get_user(self, request, resource_id):
+        if resource_id == 0:
+            raise ValueError("eek")
+        return User(resource_id, 'Dave')
+
+
+def spans_by_name(tracer):
+    return {span.name: span for span in tracer.spans}
+
+
+class TestTracing(object):
+    @pytest.fixture
+    def tracer(self):
+        return InMemoryTracer()
+
+    @pytest.fixture
+    def target(self, tracer):
+        return ApiInterfaceBase(UserApi(), tracer=tracer)
+
+    def dispatch(self, target, path, method=Method.GET, **kwargs):
+        operation, path_args = target.router.resolve(method, path)
+        return target.dispatch(operation, MockRequest(method=method, **kwargs), **path_args)
+
+    def test_disabled(self):
+        target = ApiInterfaceBase(UserApi())
+
+        assert self.dispatch(target, '/api/user/1').status == 200
+        assert not target.tracer.enabled
+
+    def test_spans(self, target, tracer):
+        body = '{"$": "tests.User", "id": 1, "name": "Dave"}'
+        actual = self.dispatch(target, '/api/user', Method.POST, body=body,
+                               headers={'Content-Type': 'application/json', 'traceparent': TRACEPARENT})
+
+        assert actual.status == 200
+        spans = spans_by_name(tracer)
+        assert set(spans) == {'odinweb.dispatch', 'odinweb.operation', 'odinweb.decode', 'odinweb.encode'}
+
+        dispatch = spans['odinweb.dispatch']
+        assert dispatch.context.trace_id == '0af7651916cd43dd8448eb211c80319c'
+        assert dispatch.parent_id == 'b7ad6b7169203331'
+        assert dispatch.attributes['operation_id'] == 'tests.test_tracing.create_user'
+        assert dispatch.attributes['http.method'] == 'POST'
+        assert dispatch.attributes['http.status_code'] == 200
+        assert dispatch.attributes['body_size'] == len(actual.body)
+
+        # Decoding is part of the operation, encoding happens after
+        assert spans['odinweb.operation'].parent_id == dispatch.context.span_id
+        assert spans['odinweb.decode'].parent_id == spans['odinweb.operation'].context.span_id
+        assert spans['odinweb.decode'].attributes == {'content_type': 'application/json', 'body_size': len(body)}
+        assert spans['odinweb.encode'].parent_id == dispatch.context.span_id
+        assert spans['odinweb.encode'].attributes == {
+            'content_type': 'application/json',
+            'body_size': len(actual.body),
+            'http.status_code': 200,
+        }
+        assert all(span.duration >= 0 for span in tracer.spans)
+
+    def test_new_trace(self, target, tracer):
+        self.dispatch(target, '/api/user/1')
+
+        dispatch = tracer.find('odinweb.dispatch')[0]
+        assert dispatch.parent_id is None
+        assert tracer.find('odinweb.operation')[0].context.trace_id == dispatch.context.trace_id
+
+    def test_error(self, target, tracer):
+        actual = self.dispatch(target, '/api/user/0')
+
+        assert actual.status == 500
+        spans = spans_by_name(tracer)
+        assert isinstance(spans['odinweb.operation'].error, ValueError)
+        assert spans['odinweb.dispatch'].attributes['http.status_code'] == 500
+        # Error response is encoded within the dispatch span
+        assert spans['odinweb.encode'].parent_id == spans['odinweb.dispatch'].context.span_id
+
+    @pytest.mark.parametrize('method_name', ('_dispatch', 'dispatch_operation'))
+    def test_dispatch__overridden(self, tracer, method_name):
+        def overridden(self, *args):
+            return getattr(ApiInterfaceBase, method_name)(self, *args)
+
+        target = type('Interface', (ApiInterfaceBase, ), {method_name: overridden})(UserApi(), tracer=tracer)
+
+        actual = self.dispatch(target, '/api/user/1', headers={'traceparent': TRACEPARENT})
+
+        assert actual.status == 200
+        spans = spans_by_name(tracer)
+        assert set(spans) == {'odinweb.dispatch', 'odinweb.operation', 'odinweb.encode'}
+        assert spans['odinweb.dispatch'].parent_id == 'b7ad6b7169203331'
+        assert spans['odinweb.operation'].parent_id == spans['odinweb.dispatch'].context.span_id
+        assert spans['odinweb.operation'].attributes['operation_id'] == 'tests.test_tracing.get_user'
+
+
+class TestAsgiTracing(object):
+    def test_spans(self):
+        tracer = InMemoryTracer()
+        target = AsgiApiInterface(UserApi(), tracer=tracer)
+        operation, path_args = target.router.resolve(Method.GET, '/api/user/1')
+        request = AsgiRequest({
+            'type': 'http', 'method': 'GET', 'path': '/api/user/1', 'query_string': b'',
+            'headers': [(b'traceparent', TRACEPARENT.encode())],
+        })
+
+        loop = asyncio.new_event_loop()
+        try:
+            actual = loop.run_until_complete(target.dispatch_async(operation, request, **path_args))
+        finally:
+            loop.close()
+
+        assert actual.status == 200
+        spans = spans_by_name(tracer)
+        assert set(spans) == {'odinweb.dispatch', 'odinweb.operation', 'odinweb.encode'}
+        assert spans['odinweb.dispatch'].parent_id == 'b7ad6b7169203331'
+        assert spans['odinweb.operation'].parent_id == spans['odinweb.dispatch'].context.span_id
+        assert spans['odinweb.dispatch'].attributes['http.status_code'] == HTTPStatus.OK.value
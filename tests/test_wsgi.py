@@ -0,0 +1,305 @@
+from __future__ import absolute_import
+
+import io
+import json
+import pytest
+
+from wsgiref.util import setup_testing_defaults
+
+from odinweb import api
+from odinweb.constants import Method
+from odinweb.wsgi import WsgiApiInterface, WsgiRequest, status_line
+
+from .resources import User
+
+
+class UserApi(api.ResourceApi):
+    resource = User
+
+    @api.listing
+    def list_users(self, request, offset, limit):
+        return [User(1, 'Dave'), User(2, 'Bob')]
+
+    @api.listing(path='stream', stream=True)
+    def stream_users(self, request, offset, limit):
+        return (User(i, 'User {}'.format(i)) for i in range(offset, offset + limit)), 1000
+
+    @api.listing(path='broken', stream=True, use_wrapper=False)
+    def broken_users(self, request, offset, limit):
+        def generate():
+            for i in range(offset, offset + limit):
+                if i == 100:
+                    raise ValueError("eek")
+                yield User(i, 'User {}'.format(i))
+        return generate()
+
+    @api.create
+    def create_user(self, request, user):
+        user.id = 3
+        return user
+
+    @api.detail
+    def get_user(self, request, resource_id):
+        if resource_id == 1:
+            return User(1, 'Dave')
+        raise api.HttpError(api.HTTPStatus.NOT_FOUND)
+
+
+def make_environ(method='GET', path='/', query='', body=b'', **extra):
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'wsgi.input': io.BytesIO(body),
+    }
+    if body:
+        environ['CONTENT_LENGTH'] = str(len(body))
+    environ.update(extra)
+    setup_testing_defaults(environ)
+    return environ
+
+
+def call_app(app, environ):
+    captured = {}
+
+    def start_response(status, headers):
+        captured['status'] = status
+        captured['headers'] = dict(headers)
+
+    body = b''.join(app(environ, start_response))
+    return captured['status'], captured['headers'], body
+
+
+class TestWsgiRequest(object):
+    def test_properties(self):
+        target = WsgiRequest(make_environ(
+            'POST', '/user', 'a=1&a=2&b=',
+            body=b'{"name": "Dave"}',
+            CONTENT_TYPE='application/json',
+            HTTP_ACCEPT='application/json',
+            HTTP_X_CUSTOM='foo',
+            HTTP_COOKIE='session=abc; theme=dark',
+            HTTP_ORIGIN='http://example.com',
+            SCRIPT_NAME='/app',
+        ))
+
+        assert target.method == Method.POST
+        assert target.scheme == 'http'
+        assert target.host == '127.0.0.1'
+        assert target.path == '/app/user'
+        assert target.path_info == '/user'
+        assert target.query.getlist('a') == ['1', '2']
+        assert target.query['b'] == ''
+        assert target.headers['X_CUSTOM'] == 'foo'
+        assert target.headers['CONTENT_TYPE'] == 'application/json'
+        assert target.accepts == 'application/json'
+        assert target.content_type == 'application/json'
+        assert target.origin == 'http://example.com'
+        assert target.cookies['session'] == 'abc'
+        assert target.cookies['theme'] == 'dark'
+        assert target.body == b'{"name": "Dave"}'
+        assert target.form == {}
+        assert target.session == {}
+
+    def test_lazy_parsing(self):
+        target = WsgiRequest(make_environ(HTTP_X_CUSTOM='foo'))
+
+        assert 'headers' not in target.__dict__
+        assert 'query' not in target.__dict__
+        assert 'cookies' not in target.__dict__
+        assert 'body' not in target.__dict__
+
+    def test_form(self):
+        target = WsgiRequest(make_environ(
+            'POST', body=b'name=Dave&role=admin',
+            CONTENT_TYPE='application/x-www-form-urlencoded; charset=UTF-8'
+        ))
+
+        assert target.form['name'] == 'Dave'
+        assert target.form['role'] == 'admin'
+
+    def test_stream(self):
+        body = b'[{"id": 1}, {"id": 2}]'
+        environ = make_environ('POST', body=body + b'trailing data')
+        environ['CONTENT_LENGTH'] = str(len(body))
+        target = WsgiRequest(environ)
+
+        stream = target.stream
+
+        assert stream.read(5) == body[:5]
+        assert stream.read() == body[5:]
+        assert stream.read() == b''
+        assert 'body' not in target.__dict__
+
+    def test_stream__body_read(self):
+        target = WsgiRequest(make_environ('POST', body=b'[1, 2]'))
+
+        assert target.body == b'[1, 2]'
+        assert target.stream.read() == b'[1, 2]'
+
+    @pytest.mark.parametrize('environ, expected', (
+        ({'HTTP_HOST': 'example.com'}, 'example.com'),
+        ({'SERVER_NAME': 'example.com', 'SERVER_PORT': '80'}, 'example.com'),
+        ({'SERVER_NAME': 'example.com', 'SERVER_PORT': '8080'}, 'example.com:8080'),
+        ({'SERVER_NAME': 'example.com', 'SERVER_PORT': '443', 'wsgi.url_scheme': 'https'}, 'example.com'),
+    ))
+    def test_host(self, environ, expected):
+        environ.update({'REQUEST_METHOD': 'GET', 'wsgi.input': io.BytesIO()})
+        target = WsgiRequest(environ)
+
+        assert target.host == expected
+
+
+@pytest.mark.parametrize('status, expected', (
+    (200, '200 OK'),
+    (404, '404 Not Found'),
+    (299, '299 Unknown'),
+))
+def test_status_line(status, expected):
+    assert status_line(status) == expected
+
+
+class TestWsgiApiInterface(object):
+    @pytest.fixture
+    def target(self):
+        return WsgiApiInterface(api.ApiVersion(UserApi()))
+
+    def test_listing(self, target):
+        status, headers, body = call_app(target, make_environ(path='/api/v1/user', query='bare=1'))
+
+        assert status == '200 OK'
+        assert headers['Content-Type'] == 'application/json'
+        assert headers['Content-Length'] == str(len(body))
+        assert [u['name'] for u in json.loads(body.decode())] == ['Dave', 'Bob']
+
+    def test_detail(self, target):
+        status, _, body = call_app(target, make_environ(path='/api/v1/user/1'))
+
+        assert status == '200 OK'
+        assert json.loads(body.decode())['name'] == 'Dave'
+
+    def test_create(self, target):
+        status, _, body = call_app(target, make_environ(
+            'POST', '/api/v1/user', body=b'{"id": 1, "name": "Eve"}', CONTENT_TYPE='application/json'
+        ))
+
+        assert status == '200 OK'
+        assert json.loads(body.decode())['id'] == 3
+
+    def test_http_error(self, target):
+        status, _, body = call_app(target, make_environ(path='/api/v1/user/2'))
+
+        assert status == '404 Not Found'
+        assert json.loads(body.decode())['status'] == 404
+
+    def test_route_not_found(self, target):
+        status, _, _ = call_app(target, make_environ(path='/api/v1/group'))
+
+        assert status == '404 Not Found'
+
+    def test_method_not_allowed(self, target):
+        status, headers, _ = call_app(target, make_environ('DELETE', '/api/v1/user'))
+
+        assert status == '405 Method Not Allowed'
+        assert set(headers['Allow'].split(',')) == {'GET', 'POST'}
+
+    def test_route_error__middleware(self):
+        calls = []
+
+        class Middleware(object):
+            def pre_request(self, request, path_args):
+                calls.append(('pre_request', request.current_operation.operation_id))
+
+            def post_request(self, request, response):
+                calls.append(('post_request', response.status))
+                response['X-Custom'] = 'yes'
+                return response
+
+        target = WsgiApiInterface(api.ApiVersion(UserApi()), middleware=[Middleware()])
+
+        status, headers, body = call_app(target, make_environ(path='/api/v1/group'))
+
+        assert status == '404 Not Found'
+        assert headers['X-Custom'] == 'yes'
+        assert json.loads(body.decode())['status'] == 404
+        assert calls == [('pre_request', 'odinweb.route_error'), ('post_request', 404)]
+
+    def test_route_error__options(self, target):
+        status, headers, body = call_app(target, make_environ('OPTIONS', '/api/v1/user'))
+
+        assert status == '204 No Content'
+        assert set(headers['Allow'].split(',')) == {'GET', 'POST', 'OPTIONS'}
+        assert body == b''
+
+    def test_route_error__options_disabled(self):
+        target = WsgiApiInterface(api.ApiVersion(UserApi()), options=False)
+
+        status, headers, _ = call_app(target, make_environ('OPTIONS', '/api/v1/user'))
+
+        assert status == '405 Method Not Allowed'
+        assert set(headers['Allow'].split(',')) == {'GET', 'POST'}
+
+    def test_route_error__unknown_method(self, target):
+        status, headers, _ = call_app(target, make_environ('PROPFIND', '/api/v1/user'))
+
+        assert status == '405 Method Not Allowed'
+        assert set(headers['Allow'].split(',')) == {'GET', 'POST'}
+
+    def test_streaming(self, target):
+        captured = {}
+
+        def start_response(status, headers):
+            captured['status'] = status
+            captured['headers'] = dict(headers)
+
+        result = target(make_environ(path='/api/v1/user/stream', query='limit=500'), start_response)
+
+        assert captured['status'] == '200 OK'
+        assert 'Content-Length' not in captured['headers']
+        chunks = list(result)
+        assert len(chunks) > 1
+        assert all(isinstance(chunk, bytes) for chunk in chunks)
+        actual = json.loads(b''.join(chunks).decode())
+        assert len(actual['results']) == 500
+        assert actual['total_count'] == 1000
+
+    def test_streaming__finished(self):
+        calls = []
+
+        class Middleware(object):
+            def handle_500(self, request, exception):
+                calls.append(('handle_500', str(exception)))
+
+            def request_finished(self, request):
+                calls.append('request_finished')
+
+        target = WsgiApiInterface(api.ApiVersion(UserApi()), middleware=[Middleware()])
+
+        result = target(make_environ(path='/api/v1/user/stream', query='limit=500'), lambda s, h: None)
+        # Request is finished once the body has been sent
+        assert calls == []
+        list(result)
+        assert calls == ['request_finished']
+
+        del calls[:]
+        result = target(make_environ(path='/api/v1/user/stream', query='limit=500'), lambda s, h: None)
+        next(result)
+        result.close()  # Closed by the server (eg the client disconnected)
+        assert calls == ['request_finished']
+
+    def test_streaming__error(self):
+        calls = []
+
+        class Middleware(object):
+            def handle_500(self, request, exception):
+                calls.append(('handle_500', str(exception)))
+
+            def request_finished(self, request):
+                calls.append('request_finished')
+
+        target = WsgiApiInterface(api.ApiVersion(UserApi()), middleware=[Middleware()])
+
+        result = target(make_environ(path='/api/v1/user/broken', query='limit=500'), lambda s, h: None)
+        with pytest.raises(ValueError):
+            list(result)
+        assert calls == [('handle_500', 'eek'), 'request_finished']